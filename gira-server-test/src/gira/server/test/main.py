@@ -1,14 +1,29 @@
+"""Latency and throughput probe of a Gira Home Server.
+
+It measures the metadata endpoint (page fetch latency, pages per second and the
+time to refresh the whole fleet) and the web socket (connect and subscribe time,
+snapshot size, sustained push rate and inter-arrival jitter), then writes the
+results as JSON to stdout and optionally to a file.
+The server and its credentials are read from 'CONNECTOR_SOURCE_API_URL',
+'SOURCE_API_WS_URL', 'SOURCE_API_USERNAME' and 'SOURCE_API_PASSWORD'.
+
+Usage:
+    python main.py [--metadata-rounds 3] [--window 60] [--output results.json]
+"""
+
+import argparse
 import base64
 import json
 import os
 import ssl
+import statistics
+import sys
 from logging import config, getLogger
-from time import sleep
-from typing import List
+from time import monotonic, perf_counter, sleep, time
+from typing import Dict, List, Optional
 
 import requests
-from requests.auth import HTTPBasicAuth
-from websocket import WebSocketException, create_connection
+from websocket import WebSocketException, WebSocketTimeoutException, create_connection
 
 # Logging Configurations
 LOGGING_LEVEL = "INFO"
@@ -23,12 +38,13 @@ LOGGING_CONFIGURATION = {
             "class": "logging.StreamHandler",
             "level": LOGGING_LEVEL,
             "formatter": "simple",
-            "stream": "ext://sys.stdout",
+            "stream": "ext://sys.stderr",
         }
     },
     "root": {"level": LOGGING_LEVEL, "handlers": ["console"]},
 }
 SLEEP_TIME = 5
+PAGE_SIZE = 1000
 INITIAL_SUBSCRIPTION_PAYLOAD = {
     "type": "subscribe",
     "param": {"keys": ["CO@*"], "context": "iotics-connector-cev"},
@@ -38,164 +54,243 @@ config.dictConfig(LOGGING_CONFIGURATION)
 log = getLogger(__name__)
 
 
-def test_server_metadata():
-    def get_sensor_metadata(endpoint: str) -> List[dict]:
-        log.info("Calling endpoint %s...", endpoint)
-        source_api_username: str = os.getenv("SOURCE_API_USERNAME")
-        source_api_password: str = os.getenv("SOURCE_API_PASSWORD")
-        credentials = f"{source_api_username}:{source_api_password}"
-        encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode(
-            "utf-8"
-        )
-        headers = {"Authorization": f"Basic {encoded_credentials}"}
-        endpoint_response = requests.get(endpoint, headers=headers, verify=False)
-        endpoint_response_dict = {}
-        try:
-            endpoint_response_dict: dict = endpoint_response.json()
-        except json.decoder.JSONDecodeError as ex:
-            log.info("Error decoding %s: %s", endpoint_response_dict, ex)
-            endpoint_response_dict = {}
-
-        sensor_info_data: dict = endpoint_response_dict.get("data", {})
-        sensor_info_items: List[dict] = sensor_info_data.get("items", [])
+def get_headers() -> Dict[str, str]:
+    """Returns the basic authentication headers of the Gira Home Server."""
 
-        log.info(
-            "Returned %d sensor info from sensor metadata endpoint",
-            len(sensor_info_items),
-        )
+    source_api_username: str = os.getenv("SOURCE_API_USERNAME")
+    source_api_password: str = os.getenv("SOURCE_API_PASSWORD")
+    credentials = f"{source_api_username}:{source_api_password}"
+    encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode("utf-8")
 
-        return sensor_info_items
+    return {"Authorization": f"Basic {encoded_credentials}"}
 
-    sensor_info_endpoint = os.getenv("CONNECTOR_SOURCE_API_URL")
 
-    successful = False
-    for _ in range(2):
-        from_param = 0
+def percentile(sorted_values: List[float], ratio: float) -> Optional[float]:
+    """Returns the nearest-rank percentile of sorted values, None if there are none."""
 
-        while True:
-            log.info("Getting new sensor info from server...")
-            inner_url = sensor_info_endpoint + "&from=" + str(from_param)
-            sensor_info_items = get_sensor_metadata(endpoint=inner_url)
+    if not sorted_values:
+        return None
 
-            # If response is empty, we've got all sensors, and need to break the loop
-            if not sensor_info_items:
-                log.info("No more sensor info items")
-                break
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
 
-            for sensor_info in sensor_info_items:
-                log.info("Received sensor info: %s", sensor_info)
-                successful = True
 
-            from_param += 1000
+def summarise(values: List[float], scale: float = 1.0, digits: int = 3) -> dict:
+    """Summarises a distribution with its mean, percentiles and maximum.
 
-        log.info("Cache updated. Next iteration in %ds", SLEEP_TIME)
-        sleep(SLEEP_TIME)
+    Args:
+        values (List[float]): the measured values.
+        scale (float): the factor applied to every value, e.g. 1000 for milliseconds.
+        digits (int): the decimal digits kept.
 
-    return successful
+    Returns:
+        dict: the count, mean, p50, p90, p99 and max of the values.
+    """
 
+    sorted_values = sorted(value * scale for value in values)
+    if not sorted_values:
+        return {"count": 0}
 
-def test_server_data():
-    def process_websocket_msg(msg_dict: dict):
-        log.info("Received message %s", msg_dict)
+    return {
+        "count": len(sorted_values),
+        "mean": round(statistics.fmean(sorted_values), digits),
+        "p50": round(percentile(sorted_values, 0.50), digits),
+        "p90": round(percentile(sorted_values, 0.90), digits),
+        "p99": round(percentile(sorted_values, 0.99), digits),
+        "max": round(sorted_values[-1], digits),
+    }
 
-        sensor_key: str = msg_dict.get("subscription", {}).get("key")
-        sensor_value = msg_dict.get("data", {}).get("value")
 
-        if not (sensor_key and sensor_value):
-            log.info(
-                "Bad format of Sensor Key '%s' and/or Sensor Value '%s'",
-                sensor_key,
-                sensor_value,
-            )
+def probe_metadata(endpoint: str, headers: Dict[str, str], rounds: int) -> dict:
+    """Fetches all the sensor metadata pages several times, timing every page.
 
-            return False
+    Args:
+        endpoint (str): the metadata endpoint, ready for the '&from=' page parameter.
+        headers (Dict[str, str]): the authentication headers.
+        rounds (int): the number of full refreshes.
 
-        return True
+    Returns:
+        dict: the page latency, pages per second, refresh time and fleet size.
+    """
 
-    source_api_username: str = os.getenv("SOURCE_API_USERNAME")
-    source_api_password: str = os.getenv("SOURCE_API_PASSWORD")
-    source_api_ws_url: str = os.getenv("SOURCE_API_WS_URL")
+    page_latencies = []
+    page_bytes = []
+    refresh_seconds = []
+    sensors = 0
 
-    auth = HTTPBasicAuth(source_api_username, source_api_password)
+    for round_number in range(rounds):
+        if round_number:
+            sleep(SLEEP_TIME)
 
-    successful = False
-    for _ in range(3):
-        if successful:
-            break
+        from_param = 0
+        round_sensors = 0
+        refresh_started_at = perf_counter()
 
-        try:
-            log.info("Connecting to WebSocket...")
-            credentials = f"{source_api_username}:{source_api_password}"
-            encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode(
-                "utf-8"
+        while True:
+            page_started_at = perf_counter()
+            response = requests.get(
+                endpoint + "&from=" + str(from_param), headers=headers, verify=False
             )
-            headers = {"Authorization": f"Basic {encoded_credentials}"}
+            page_latencies.append(perf_counter() - page_started_at)
+            page_bytes.append(len(response.content))
 
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False  # Disable hostname verification
-            ssl_context.verify_mode = ssl.CERT_NONE  # Disable certificate verification
+            try:
+                sensor_info_items = response.json().get("data", {}).get("items", [])
+            except ValueError as ex:
+                log.warning("Error decoding page from %d: %s", from_param, ex)
+                sensor_info_items = []
 
-            ws = create_connection(
-                source_api_ws_url,
-                header=headers,
-                sslopt={"context": ssl_context},
-            )
-            log.info("WebSocket connected")
-
-            # Send the subscription message
-            ws.send(json.dumps(INITIAL_SUBSCRIPTION_PAYLOAD))
-            log.info("WebSocket subscribed")
-
-            # The first message contains the last shared value for all sensors
-            subscription_response = json.loads(ws.recv())
-            log.info("WebSocket subscription response: %s", subscription_response)
-
-            log.info("Waiting for incoming messages...")
-            counter = 0
-            # Inner loop polls for messages
-            for _ in range(10):
-                try:
-                    msg = ws.recv()
-                    if not (msg and isinstance(msg, str)):
-                        log.warning("Received unknown message type: %s", msg)
-                        continue
-
-                    msg_dict = json.loads(msg)
-                    successful = process_websocket_msg(msg_dict)
-
-                    if successful:
-                        counter += 1
-
-                    if counter > 10:
-                        return True
-                except json.JSONDecodeError as ex:
-                    log.warning("Failed to decode JSON from WebSocket message: %s", ex)
-                    continue
-                except Exception as ex:
-                    log.warning("Exception while processing message: %s", ex)
-                    break
-        except (ConnectionError, WebSocketException) as ex:
-            # For connection or client errors, reconnect
-            log.warning(
-                "Reconnecting to %s in 5 seconds due to %s", source_api_ws_url, ex
-            )
-            sleep(5)
+            # If response is empty, we've got all sensors
+            if not sensor_info_items:
+                break
+
+            round_sensors += len(sensor_info_items)
+            from_param += PAGE_SIZE
+
+        refresh_seconds.append(perf_counter() - refresh_started_at)
+        sensors = max(sensors, round_sensors)
+        log.info(
+            "Metadata refresh %d: %d sensors in %.3fs",
+            round_number + 1,
+            round_sensors,
+            refresh_seconds[-1],
+        )
 
-    return False
+    return {
+        "rounds": rounds,
+        "sensors": sensors,
+        "pages": len(page_latencies),
+        "page_latency_ms": summarise(page_latencies, scale=1000),
+        "page_bytes": summarise(page_bytes, digits=0),
+        "pages_per_second": round(len(page_latencies) / sum(page_latencies), 3),
+        "full_refresh_seconds": summarise(refresh_seconds),
+    }
+
+
+def probe_websocket(ws_url: str, headers: Dict[str, str], window: float) -> dict:
+    """Connects and subscribes to the web socket, then listens for the pushed
+    readings during a window.
+
+    Args:
+        ws_url (str): the web socket URL.
+        headers (Dict[str, str]): the authentication headers.
+        window (float): the seconds spent listening to the pushed readings.
+
+    Returns:
+        dict: the connect and subscribe time, snapshot size, push rate and jitter.
+    """
+
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False  # Disable hostname verification
+    ssl_context.verify_mode = ssl.CERT_NONE  # Disable certificate verification
+
+    connect_started_at = perf_counter()
+    ws = create_connection(
+        ws_url, header=headers, sslopt={"context": ssl_context}, timeout=window
+    )
+    connect_seconds = perf_counter() - connect_started_at
+
+    try:
+        subscribe_started_at = perf_counter()
+        ws.send(json.dumps(INITIAL_SUBSCRIPTION_PAYLOAD))
+        # The first message contains the last shared value for all sensors
+        subscription_response = ws.recv()
+        subscribe_seconds = perf_counter() - subscribe_started_at
+
+        arrivals = []
+        sensor_keys = set()
+        bad_messages = 0
+        listen_started_at = monotonic()
+        listen_deadline = listen_started_at + window
+
+        while True:
+            remaining = listen_deadline - monotonic()
+            if remaining <= 0:
+                break
+
+            ws.settimeout(remaining)
+            try:
+                msg = ws.recv()
+            except WebSocketTimeoutException:
+                break
+            arrivals.append(monotonic())
+
+            try:
+                msg_dict = json.loads(msg)
+                sensor_key = msg_dict["subscription"]["key"]
+                float(msg_dict["data"]["value"])
+            except (KeyError, TypeError, ValueError):
+                bad_messages += 1
+            else:
+                sensor_keys.add(sensor_key)
+    finally:
+        ws.close()
+
+    listened_seconds = monotonic() - listen_started_at
+    inter_arrivals = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+
+    return {
+        "connect_ms": round(connect_seconds * 1000, 3),
+        "subscribe_ms": round(subscribe_seconds * 1000, 3),
+        "snapshot_bytes": len(subscription_response),
+        "window_seconds": round(listened_seconds, 3),
+        "messages": len(arrivals),
+        "bad_messages": bad_messages,
+        "sensors": len(sensor_keys),
+        "push_rate_per_second": round(len(arrivals) / listened_seconds, 3),
+        "inter_arrival_ms": summarise(inter_arrivals, scale=1000),
+        "jitter_ms": (
+            round(statistics.pstdev(inter_arrivals) * 1000, 3)
+            if inter_arrivals
+            else None
+        ),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--metadata-rounds",
+        type=int,
+        default=3,
+        help="full metadata refreshes to time",
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=60,
+        help="seconds spent measuring the pushed readings",
+    )
+    parser.add_argument("--output", help="file where the JSON results are written")
+
+    return parser.parse_args()
 
 
 def main():
-    log.info("Starting test_server_metadata...")
-    meta_successful = test_server_metadata()
-    if meta_successful:
-        log.info("TEST SERVER METADATA SUCCESSFUL !!!")
+    args = parse_args()
+    headers = get_headers()
+    results = {"started_at": time()}
+
+    try:
+        log.info("Probing the metadata endpoint...")
+        results["metadata"] = probe_metadata(
+            os.getenv("CONNECTOR_SOURCE_API_URL"), headers, args.metadata_rounds
+        )
+
+        log.info("Probing the web socket for %ss...", args.window)
+        results["websocket"] = probe_websocket(
+            os.getenv("SOURCE_API_WS_URL"), headers, args.window
+        )
+    except (requests.RequestException, OSError, WebSocketException) as ex:
+        log.error("Probe failed: %s", ex)
+        sys.exit(1)
 
-    log.info("Starting test_server_data...")
-    data_successful = test_server_data()
-    if data_successful:
-        log.info("TEST SERVER DATA SUCCESSFUL !!!")
+    results_json = json.dumps(results, indent=2)
+    print(results_json)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(results_json + "\n")
 
-    log.info("Test completed")
+    log.info("Probe completed")
 
 
 if __name__ == "__main__":
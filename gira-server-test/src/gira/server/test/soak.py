@@ -0,0 +1,293 @@
+"""Soak test of the Sensor Publisher and Sensor Cache.
+
+It runs both services in this process against a local stand-in of the Gira Home
+Server for hours, pushing readings at a steady rate. At every interval it samples
+the resident memory, the top growing allocators (tracemalloc), the queue depths
+and the thread count. It fails if the resident memory grows faster than the
+configured slope after the warm-up.
+
+It needs the local Redis and Kafka broker, started with `make soak-run`, or:
+
+    docker compose -f docker/docker-compose.yaml --profile bench up -d redis kafka
+
+Usage:
+    python gira-server-test/src/gira/server/test/soak.py \
+        [--hours 4] [--rate 200] [--sensors 2000] [--max-rss-slope 5]
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from logging import config, getLogger
+from time import monotonic, sleep
+from typing import List, Optional
+
+from stand_in import GiraStandIn
+
+# The repository root, five levels above this module
+ROOT_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), *[os.pardir] * 5)
+)
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "ngn-sensor-publisher", "src", "ngn", "sensor", "publisher"),
+    os.path.join(ROOT_DIR, "ngn-sensor-cache", "src", "ngn", "sensor", "cache"),
+    os.path.join(ROOT_DIR, "ngn-sensor-common", "src", "ngn", "sensor", "common"),
+]
+
+SOAK_SOURCE_NAME = "soak"
+
+LOGGING_CONFIGURATION = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "[%(asctime)s] [%(module)s] %(levelname)s: %(message)s"}
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "level": "INFO",
+            "formatter": "simple",
+            "stream": "ext://sys.stdout",
+        }
+    },
+    "root": {"level": "WARNING", "handlers": ["console"]},
+    "loggers": {__name__: {"level": "INFO"}, "__main__": {"level": "INFO"}},
+}
+
+config.dictConfig(LOGGING_CONFIGURATION)
+log = getLogger(__name__)
+
+
+def resident_memory_mb() -> float:
+    """Returns the resident memory of this process, in MB."""
+
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current memory, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+def memory_slope(samples: List[dict]) -> Optional[float]:
+    """Fits a line through the resident memory samples by least squares.
+
+    Args:
+        samples (List[dict]): the samples, with 'elapsed_seconds' and 'rss_mb'.
+
+    Returns:
+        Optional[float]: the memory growth in MB per hour, None with less than 3 samples.
+    """
+
+    if len(samples) < 3:
+        return None
+
+    hours = [sample["elapsed_seconds"] / 3600 for sample in samples]
+    rss = [sample["rss_mb"] for sample in samples]
+    mean_hours = sum(hours) / len(hours)
+    mean_rss = sum(rss) / len(rss)
+    variance = sum((hour - mean_hours) ** 2 for hour in hours)
+    if not variance:
+        return None
+
+    return (
+        sum((hour - mean_hours) * (mb - mean_rss) for hour, mb in zip(hours, rss))
+        / variance
+    )
+
+
+def configure_environment(stand_in: GiraStandIn, args: argparse.Namespace):
+    """Points the services to the stand-in, the local Redis and the local broker.
+    Variables already set are kept, e.g. to soak a specific producer profile.
+    """
+
+    os.environ["GIRA_SOURCES"] = json.dumps(
+        [
+            {
+                "name": SOAK_SOURCE_NAME,
+                "ws_url": stand_in.ws_url,
+                "api_url": stand_in.api_url,
+                "username": "soak",
+                "password": "soak",
+            }
+        ]
+    )
+    for name, value in {
+        "REDIS_HOST": "localhost",
+        "KAFKA_BROKER_ADDRESS": args.bootstrap_server.rsplit(":", 1)[0],
+        "KAFKA_BROKER_SASL_PORT": args.bootstrap_server.rsplit(":", 1)[-1],
+        "KAFKA_PRODUCER_OVERRIDES": "security.protocol=PLAINTEXT",
+        "CACHE_TTL": "3600",
+        "METRICS_REPORT_INTERVAL": str(args.sample_interval),
+        "PARK_UNKNOWN_READINGS": "true",
+        "DEAD_LETTER_TOPIC": "soak_dead_letters",
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+def start_services():
+    """Starts the Sensor Cache and the Sensor Publisher on background threads.
+
+    Returns:
+        Tuple[SensorCache, SensorPublisher]: the running services.
+    """
+
+    # Imported once the environment is set, as the constants read it on import
+    from sensor_cache import SensorCache
+    from sensor_publisher import SensorPublisher
+
+    sensor_cache = SensorCache()
+    sensor_cache.initialise()
+    threading.Thread(target=sensor_cache.start, daemon=True).start()
+
+    sensor_publisher = SensorPublisher()
+    sensor_publisher.initialise()
+    threading.Thread(target=sensor_publisher.start, daemon=True).start()
+
+    return sensor_cache, sensor_publisher
+
+
+def take_sample(
+    started_at: float, stand_in: GiraStandIn, sensor_cache, sensor_publisher
+) -> dict:
+    """Samples the memory, queue depths and thread count of the services."""
+
+    parked_readings = sensor_publisher._parked_readings
+
+    return {
+        "elapsed_seconds": round(monotonic() - started_at, 1),
+        "rss_mb": round(resident_memory_mb(), 2),
+        "threads": threading.active_count(),
+        "gc_objects": len(gc.get_objects()),
+        "messages_pushed": stand_in.messages_pushed,
+        "websocket_connections": stand_in.connections,
+        "publish_queue": sensor_publisher._sensor_data_queue.qsize(),
+        "caching_queue": sensor_cache._caching_queue.qsize(),
+        "dead_letters": len(sensor_publisher._dead_letters),
+        "negative_cache": len(sensor_publisher._unknown_sensors),
+        "parked_readings": len(parked_readings) if parked_readings is not None else 0,
+        "topic_names": len(sensor_publisher._topic_names),
+        "refresh_deadlines": len(sensor_cache._refresh_deadlines),
+        "sensor_name_parser": len(sensor_cache._sensor_name_parser),
+    }
+
+
+def log_top_allocators(baseline: tracemalloc.Snapshot, top: int):
+    """Logs the allocation sites that grew the most since the baseline."""
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+    for statistic in snapshot.compare_to(baseline, "lineno")[:top]:
+        log.info("  %s", statistic)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=4, help="soak duration")
+    parser.add_argument(
+        "--rate", type=float, default=200, help="readings pushed per second"
+    )
+    parser.add_argument("--sensors", type=int, default=2000, help="sensors served")
+    parser.add_argument("--bad-ratio", type=float, default=0.01)
+    parser.add_argument("--unknown-ratio", type=float, default=0.01)
+    parser.add_argument(
+        "--sample-interval", type=int, default=60, help="seconds between samples"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=600, help="seconds ignored by the slope check"
+    )
+    parser.add_argument(
+        "--max-rss-slope",
+        type=float,
+        default=5,
+        help="maximum resident memory growth, in MB per hour",
+    )
+    parser.add_argument("--tracemalloc-top", type=int, default=10)
+    parser.add_argument(
+        "--no-tracemalloc",
+        action="store_true",
+        help="skip the allocator tracking and its overhead",
+    )
+    parser.add_argument("--bootstrap-server", default="localhost:9092")
+    parser.add_argument("--output", help="JSON lines file of the samples")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+
+    stand_in = GiraStandIn(
+        sensor_count=args.sensors,
+        rate=args.rate,
+        bad_ratio=args.bad_ratio,
+        unknown_ratio=args.unknown_ratio,
+    )
+    stand_in.start()
+    configure_environment(stand_in, args)
+    sensor_cache, sensor_publisher = start_services()
+
+    started_at = monotonic()
+    deadline = started_at + args.hours * 3600
+    baseline: Optional[tracemalloc.Snapshot] = None
+    samples: List[dict] = []
+    output_file = open(args.output, "w") if args.output else None
+
+    try:
+        while monotonic() < deadline:
+            sleep(args.sample_interval)
+            sample = take_sample(started_at, stand_in, sensor_cache, sensor_publisher)
+            log.info("Sample: %s", sample)
+            if output_file is not None:
+                output_file.write(json.dumps(sample) + "\n")
+                output_file.flush()
+
+            if sample["elapsed_seconds"] < args.warmup:
+                continue
+
+            samples.append(sample)
+            if args.no_tracemalloc:
+                continue
+
+            if baseline is None:
+                baseline = tracemalloc.take_snapshot()
+                log.info("Allocation baseline taken after the warm-up")
+            else:
+                log.info("Top growing allocators since the warm-up:")
+                log_top_allocators(baseline, args.tracemalloc_top)
+    except KeyboardInterrupt:
+        log.info("Soak interrupted")
+    finally:
+        if output_file is not None:
+            output_file.close()
+        stand_in.stop()
+
+    slope = memory_slope(samples)
+    if slope is None:
+        log.error("Not enough samples after the warm-up to measure memory growth")
+        sys.exit(1)
+
+    log.info(
+        "Resident memory growth: %.2f MB/hour over %d samples (limit %.2f)",
+        slope,
+        len(samples),
+        args.max_rss_slope,
+    )
+    if slope > args.max_rss_slope:
+        log.error("SOAK FAILED: memory grows faster than the limit")
+        sys.exit(1)
+
+    log.info("SOAK SUCCESSFUL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from time import monotonic, sleep
+from typing import List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+log = getLogger(__name__)
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+WILDCARD_KEY = "CO@*"
+PAGE_SIZE = 1000
+# Seconds between two bursts of pushed messages
+PUSH_TICK = 0.1
+
+SENSOR_DESCRIPTIONS = [
+    "Floor1_Kitchen_Heating_Temp",
+    "Floor1_Living_Electric_Socket_Power",
+    "Floor2_Bedroom1_Heating_Valve_Position",
+    "Floor2_Bathroom_Water_ShowerMIX_Temp",
+    "Floor_Global_Water_Meter_Flow",
+]
+
+
+def build_sensor_info(sensor_count: int) -> List[dict]:
+    """Builds the metadata items of synthetic sensors spread across the houses,
+    in the format of the Gira Home Server values endpoint.
+
+    Args:
+        sensor_count (int): the number of sensors.
+
+    Returns:
+        List[dict]: the sensor info items.
+    """
+
+    sensor_info_items = []
+    for sensor_number in range(sensor_count):
+        house_number = sensor_number % 9 + 1
+        description = (
+            f"House {house_number}_"
+            f"{SENSOR_DESCRIPTIONS[sensor_number % len(SENSOR_DESCRIPTIONS)]}"
+        )
+        sensor_key = f"CO@{house_number}_9_{sensor_number}"
+        sensor_info_items.append(
+            {
+                "caption": description,
+                "code": 0,
+                "meta": {"description": description, "keys": [sensor_key]},
+                "key": sensor_key,
+            }
+        )
+
+    return sensor_info_items
+
+
+class GiraStandIn:
+    def __init__(
+        self,
+        sensor_count: int = 2000,
+        rate: float = 200,
+        bad_ratio: float = 0.01,
+        unknown_ratio: float = 0.01,
+        host: str = "127.0.0.1",
+    ):
+        """Local stand-in of a Gira Home Server: an HTTP endpoint serving the sensor
+        metadata in pages, and a web socket pushing readings of the subscribed
+        sensors at a steady rate.
+
+        Args:
+            sensor_count (int): the number of sensors served.
+            rate (float): the messages pushed per second to each connection.
+            bad_ratio (float): the share of pushed messages with a non-numeric value.
+            unknown_ratio (float): the share of pushed messages of sensors missing
+                from the metadata endpoint.
+            host (str): the address to listen on.
+        """
+
+        self.sensor_info_items = build_sensor_info(sensor_count)
+        self.sensor_keys = [item["key"] for item in self.sensor_info_items]
+        self.rate = rate
+        self.bad_ratio = bad_ratio
+        self.unknown_ratio = unknown_ratio
+        self.messages_pushed = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+        self._http_server = ThreadingHTTPServer((host, 0), self._http_handler())
+        self._ws_server = ThreadingTCPServer((host, 0), self._ws_handler())
+        self._ws_server.daemon_threads = True
+
+    @property
+    def api_url(self) -> str:
+        """The URL of the metadata endpoint, ready for the '&from=' page parameter."""
+
+        host, port = self._http_server.server_address[:2]
+        return f"http://{host}:{port}/api/v2/values?meta=true"
+
+    @property
+    def ws_url(self) -> str:
+        """The URL of the web socket."""
+
+        host, port = self._ws_server.server_address[:2]
+        return f"ws://{host}:{port}/endpoints/ws"
+
+    def start(self):
+        """Serves the HTTP endpoint and the web socket from background threads."""
+
+        for server in (self._http_server, self._ws_server):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        log.info("Gira stand-in serving %s and %s", self.api_url, self.ws_url)
+
+    def stop(self):
+        for server in (self._http_server, self._ws_server):
+            server.shutdown()
+            server.server_close()
+
+    def _http_handler(self):
+        stand_in = self
+
+        class MetadataHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                from_param = int(query.get("from", ["0"])[0])
+                body = json.dumps(
+                    {
+                        "data": {
+                            "items": stand_in.sensor_info_items[
+                                from_param : from_param + PAGE_SIZE
+                            ]
+                        }
+                    }
+                ).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return MetadataHandler
+
+    def _ws_handler(self):
+        stand_in = self
+
+        class WebSocketHandler(StreamRequestHandler):
+            def handle(self):
+                if not self._handshake():
+                    return
+
+                with stand_in._lock:
+                    stand_in.connections += 1
+
+                self.subscribed_keys: Set[str] = set()
+                self.subscriptions_lock = threading.Lock()
+                self.write_lock = threading.Lock()
+                self.closed = threading.Event()
+                threading.Thread(target=self._push_readings, daemon=True).start()
+
+                try:
+                    self._read_frames()
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    self.closed.set()
+
+            def _handshake(self) -> bool:
+                headers = {}
+                self.rfile.readline()
+                while True:
+                    line = self.rfile.readline().decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                websocket_key = headers.get("sec-websocket-key")
+                if not websocket_key:
+                    return False
+
+                accept = base64.b64encode(
+                    hashlib.sha1((websocket_key + WEBSOCKET_GUID).encode()).digest()
+                ).decode()
+                self.wfile.write(
+                    (
+                        "HTTP/1.1 101 Switching Protocols\r\n"
+                        "Upgrade: websocket\r\n"
+                        "Connection: Upgrade\r\n"
+                        f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+                    ).encode()
+                )
+                return True
+
+            def _send_frame(self, opcode: int, payload: bytes):
+                header = bytes([0x80 | opcode])
+                if len(payload) < 126:
+                    header += bytes([len(payload)])
+                elif len(payload) < 1 << 16:
+                    header += bytes([126]) + struct.pack("!H", len(payload))
+                else:
+                    header += bytes([127]) + struct.pack("!Q", len(payload))
+
+                with self.write_lock:
+                    self.wfile.write(header + payload)
+
+            def _recv_frame(self):
+                first_byte, second_byte = self.rfile.read(2)
+                opcode = first_byte & 0x0F
+                length = second_byte & 0x7F
+                if length == 126:
+                    (length,) = struct.unpack("!H", self.rfile.read(2))
+                elif length == 127:
+                    (length,) = struct.unpack("!Q", self.rfile.read(8))
+
+                # Client frames are always masked
+                mask = self.rfile.read(4) if second_byte & 0x80 else b"\x00" * 4
+                payload = bytes(
+                    byte ^ mask[position % 4]
+                    for position, byte in enumerate(self.rfile.read(length))
+                )
+                return opcode, payload
+
+            def _read_frames(self):
+                while True:
+                    opcode, payload = self._recv_frame()
+                    if opcode == OPCODE_CLOSE:
+                        self._send_frame(OPCODE_CLOSE, payload[:2])
+                        return
+                    if opcode == OPCODE_PING:
+                        self._send_frame(OPCODE_PONG, payload)
+                        continue
+                    if opcode != OPCODE_TEXT:
+                        continue
+
+                    request = json.loads(payload)
+                    keys = request.get("param", {}).get("keys", [])
+                    with self.subscriptions_lock:
+                        if request.get("type") == "subscribe":
+                            self.subscribed_keys.update(keys)
+                        elif request.get("type") == "unsubscribe":
+                            self.subscribed_keys.difference_update(keys)
+                    self._send_frame(
+                        OPCODE_TEXT,
+                        json.dumps({"type": "response", "code": 0}).encode(),
+                    )
+
+            def _push_readings(self):
+                messages_per_tick = stand_in.rate * PUSH_TICK
+                pending_messages = 0.0
+                next_tick = monotonic()
+
+                while not self.closed.is_set():
+                    pending_messages += messages_per_tick
+                    subscribed_keys = self._subscribed_sensor_keys()
+                    try:
+                        while pending_messages >= 1 and subscribed_keys:
+                            pending_messages -= 1
+                            self._send_frame(
+                                OPCODE_TEXT,
+                                json.dumps(
+                                    stand_in._push_msg(subscribed_keys)
+                                ).encode(),
+                            )
+                            with stand_in._lock:
+                                stand_in.messages_pushed += 1
+                    except OSError:
+                        return
+
+                    next_tick += PUSH_TICK
+                    sleep(max(0.0, next_tick - monotonic()))
+
+            def _subscribed_sensor_keys(self) -> List[str]:
+                with self.subscriptions_lock:
+                    if WILDCARD_KEY in self.subscribed_keys:
+                        return stand_in.sensor_keys
+
+                    return list(self.subscribed_keys)
+
+        return WebSocketHandler
+
+    def _push_msg(self, subscribed_keys: List[str]) -> dict:
+        """Builds a pushed message of a random subscribed sensor, or of an unknown
+        sensor or with a bad value, in the configured shares.
+
+        Args:
+            subscribed_keys (List[str]): the keys of the subscribed sensors.
+
+        Returns:
+            dict: the message.
+        """
+
+        sensor_key = random.choice(subscribed_keys)
+        sensor_value: Optional[object] = round(random.uniform(0, 100), 3)
+
+        draw = random.random()
+        if draw < self.unknown_ratio:
+            # Not listed by the metadata endpoint, e.g. a sensor added after the poll
+            sensor_key = f"CO@99_9_{random.randrange(1000)}"
+        elif draw < self.unknown_ratio + self.bad_ratio:
+            sensor_value = "n/a"
+
+        return {
+            "type": "push",
+            "code": 0,
+            "subscription": {"key": sensor_key},
+            "data": {"value": sensor_value},
+        }
@@ -0,0 +1,103 @@
+"""Micro-benchmark of the sensor name parser.
+
+It builds one page of Gira sensor info items from the sensor metadata CSV and
+measures the cost of parsing the whole fleet once per cycle, without and with
+memoisation.
+
+Usage:
+    python ngn-sensor-cache/benchmarks/bench_sensor_name_parser.py [--cycles N]
+"""
+
+import argparse
+import csv
+import os
+import sys
+from time import perf_counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_DIR = os.path.join(ROOT_DIR, "ngn-sensor-cache", "src", "ngn", "sensor", "cache")
+COMMON_DIR = os.path.join(
+    ROOT_DIR, "ngn-sensor-common", "src", "ngn", "sensor", "common"
+)
+sys.path[:0] = [CACHE_DIR, COMMON_DIR]
+
+import constants as cnt  # noqa: E402
+from sensor_name_parser import SensorNameParser  # noqa: E402
+
+
+def load_sensor_info_items() -> list:
+    house_numbers = {
+        building_name: house_number
+        for house_number, building_name in cnt.BUILDING_NAMES.items()
+    }
+
+    sensor_info_items = []
+    with open(
+        os.path.join(CACHE_DIR, cnt.SENSOR_METADATA_CSV), "r", encoding="utf-8-sig"
+    ) as csv_file:
+        for row in csv.DictReader(csv_file):
+            house_number = house_numbers.get(row.get(cnt.BUILDING_NAME))
+            if not (row.get(cnt.SENSOR_KEY) and house_number):
+                continue
+
+            tokens = [house_number] + [
+                row[field]
+                for field in (
+                    cnt.FLOOR_NAME,
+                    cnt.ROOM_NAME,
+                    cnt.SERVICE_TYPE,
+                    cnt.OBJECT_NAME,
+                    cnt.MEASUREMENT_TYPE,
+                )
+                if row.get(field)
+            ]
+            sensor_info_items.append(
+                {"key": row[cnt.SENSOR_KEY], "meta": {"description": "_".join(tokens)}}
+            )
+
+    return sensor_info_items
+
+
+def bench_uncached(sensor_info_items: list, cycles: int) -> float:
+    start = perf_counter()
+    for _ in range(cycles):
+        for sensor_info in sensor_info_items:
+            try:
+                SensorNameParser.parse_description(
+                    sensor_info["key"], sensor_info["meta"]["description"]
+                )
+            except (KeyError, IndexError):
+                pass
+
+    return (perf_counter() - start) / cycles
+
+
+def bench_cached(sensor_info_items: list, cycles: int) -> float:
+    sensor_name_parser = SensorNameParser()
+    # The first cycle populates the cache
+    sensor_name_parser.parse_batch(sensor_info_items)
+
+    start = perf_counter()
+    for _ in range(cycles):
+        sensor_name_parser.parse_batch(sensor_info_items)
+
+    return (perf_counter() - start) / cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=200)
+    args = parser.parse_args()
+
+    sensor_info_items = load_sensor_info_items()
+    uncached = bench_uncached(sensor_info_items, args.cycles)
+    cached = bench_cached(sensor_info_items, args.cycles)
+
+    print(f"Sensors per cycle:        {len(sensor_info_items)}")
+    print(f"Uncached parse per cycle: {uncached * 1e3:.3f} ms")
+    print(f"Cached parse per cycle:   {cached * 1e3:.3f} ms")
+    print(f"Speed-up:                 {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
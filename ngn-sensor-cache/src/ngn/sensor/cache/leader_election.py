@@ -0,0 +1,99 @@
+import logging
+from threading import Event
+from time import sleep
+
+import constants as cnt
+from redis_connector import RedisConnector
+from supervisor import WorkerHandle
+
+log = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        redis_connector: RedisConnector,
+        candidate_id: str,
+        service_name: str,
+        lease_ttl: float = cnt.LEADER_LEASE_TTL,
+    ):
+        """Elects a single active instance of a service through a lease in Redis.
+        The leader renews the lease three times per lease TTL, while the standby
+        instances keep trying to acquire it, so that one of them takes over
+        at most a lease TTL after the leader dies.
+
+        Args:
+            redis_connector (RedisConnector): the connector holding the lease.
+            candidate_id (str): the identifier of this instance, unique in the service.
+            service_name (str): the service name, used to namespace the lease.
+            lease_ttl (float): seconds after which the lease of a dead leader expires.
+        """
+
+        self.candidate_id = candidate_id
+        self.lease_ttl = lease_ttl
+        self._redis_connector = redis_connector
+        self._lease_key = f"{cnt.CLUSTER_KEY_PREFIX}:{service_name}:leader"
+        self._leading = Event()
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this instance currently holds the lease."""
+
+        return self._leading.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Waits until this instance becomes the leader.
+
+        Args:
+            timeout (float): the maximum number of seconds to wait.
+
+        Returns:
+            bool: whether this instance is the leader.
+        """
+
+        return self._leading.wait(timeout)
+
+    def refresh(self) -> bool:
+        """Renews the lease if held, otherwise tries to acquire it.
+
+        Returns:
+            bool: whether the leadership of this instance has changed.
+        """
+
+        leading = self._redis_connector.renew_lease(
+            self._lease_key, self.candidate_id, self.lease_ttl
+        ) or self._redis_connector.acquire_lease(
+            self._lease_key, self.candidate_id, self.lease_ttl
+        )
+        if leading == self.is_leader:
+            return False
+
+        if leading:
+            log.info("Instance %s is now the leader", self.candidate_id)
+            self._leading.set()
+        else:
+            log.warning("Instance %s lost the leadership", self.candidate_id)
+            self._leading.clear()
+
+        return True
+
+    def release(self):
+        """Hands the leadership over straight away, e.g. on shutdown."""
+
+        if self.is_leader:
+            self._leading.clear()
+            self._redis_connector.release_lease(self._lease_key, self.candidate_id)
+
+    def run(self, worker: WorkerHandle):
+        """Thread refreshing the lease: three times per lease TTL while leading,
+        so that a single late renewal never loses it, and more often on standby,
+        so that an expired lease is taken over quickly.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        while True:
+            worker.beat()
+            self.refresh()
+            sleep(self.lease_ttl / (3 if self.is_leader else 6))
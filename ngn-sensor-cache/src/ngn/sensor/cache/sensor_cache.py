@@ -1,17 +1,28 @@
-import base64
+import atexit
 import csv
 import json
 import logging
 import os
-import sys
-from queue import Queue
-from threading import Thread
-from time import sleep
-from typing import List
+import socket
+from collections import defaultdict
+from functools import partial
+from queue import Empty, Queue
+from threading import Lock
+from time import monotonic, sleep, time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import constants as cnt
 import requests
+from env_config import get_bool_env, get_float_env, get_int_env
+from leader_election import LeaderElection
+from metadata_snapshot import write_metadata_snapshot
+from metrics import MetricsRegistry
 from redis_connector import RedisConnector
+from sensor_index import prune_known_sensor_keys, prune_sensor_indexes
+from sensor_name_parser import SensorNameParser
+from sensor_types import SensorMetadata
+from sources import Source, load_sources, split_sensor_key
+from supervisor import Supervisor, WorkerHandle
 
 log = logging.getLogger(__name__)
 
@@ -20,9 +31,18 @@ class SensorCache:
     def __init__(self):
         self._redis_connector = RedisConnector()
         self._caching_queue: Queue = Queue()
-        self._sensor_info_endpoint: str = None
+        self._sensor_name_parser = SensorNameParser()
+        self._sources: List[Source] = []
         self._cache_ttl: int = None
-        self._headers: dict = None
+        self._metrics = MetricsRegistry("sensor_cache")
+        # Monotonic time after which the TTL of each cached sensor must be refreshed
+        self._refresh_deadlines: Dict[str, float] = {}
+        # Deadlines are scheduled, followed and pruned by different threads
+        self._refresh_lock = Lock()
+        self._worker_stall_timeout: int = cnt.WORKER_STALL_TIMEOUT
+        self._leader_election: Optional[LeaderElection] = None
+        self._metadata_snapshot_path: Optional[str] = None
+        self._metadata_snapshot_interval: float = cnt.METADATA_SNAPSHOT_INTERVAL
 
     def _populate_cache_with_csv(self):
         """Populate the Cache with initial values.
@@ -67,20 +87,25 @@ class SensorCache:
                 if measurement_type:
                     sensor_name += measurement_type
 
-                sensor_info_dict = {
-                    cnt.SENSOR_KEY: sensor_key,
-                    cnt.SENSOR_NAME: sensor_name,
-                    cnt.BUILDING_NAME: building_name,
-                    cnt.ROOM_NAME: room_name or "",
-                    cnt.FLOOR_NAME: floor_name or "",
-                    cnt.SERVICE_TYPE: service_type or "",
-                    cnt.OBJECT_NAME: object_name or "",
-                    cnt.MEASUREMENT_TYPE: measurement_type or "",
-                    cnt.UNIT_OF_MEASURE: unit_of_measure or "",
-                }
-
-                log.debug("Storing sensor info %s...", sensor_info_dict)
-                self._redis_connector.store(key=sensor_key, value=sensor_info_dict)
+                sensor_metadata = SensorMetadata(
+                    sensor_key=sensor_key,
+                    sensor_name=sensor_name,
+                    building_name=building_name,
+                    floor_name=floor_name,
+                    room_name=room_name,
+                    service_type=service_type,
+                    object_name=object_name,
+                    measurement_type=measurement_type,
+                    unit_of_measure=unit_of_measure,
+                )
+
+                log.debug("Storing sensor info %s...", sensor_metadata)
+                if self._redis_connector.store_sensor_metadata(
+                    sensor_metadata,
+                    ex=self._cache_ttl,
+                    previous=self._redis_connector.get_sensor_metadata(sensor_key),
+                ):
+                    self._schedule_refresh(sensor_key)
 
         log.info("Cache populated successfully")
 
@@ -88,28 +113,33 @@ class SensorCache:
         """Initialise this object's variables and populate the cache with initial values."""
 
         log.info("Initialising Sensor Cache...")
-        self._sensor_info_endpoint = os.getenv("CONNECTOR_SOURCE_API_URL")
-        source_api_username = os.getenv("SOURCE_API_USERNAME")
-        source_api_password = os.getenv("SOURCE_API_PASSWORD")
+        self._sources = load_sources()
+
+        self._cache_ttl = get_int_env("CACHE_TTL", cnt.CACHE_TTL)
 
-        credentials = f"{source_api_username}:{source_api_password}"
-        encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode(
-            "utf-8"
+        self._worker_stall_timeout = get_int_env(
+            "WORKER_STALL_TIMEOUT", cnt.WORKER_STALL_TIMEOUT
         )
-        self._headers = {"Authorization": f"Basic {encoded_credentials}"}
 
-        cache_ttl_str = os.getenv("CACHE_TTL")
-        try:
-            cache_ttl = int(cache_ttl_str)
-        except ValueError:
-            log.error(
-                "Environment variable 'CACHE_TTL' is not an integer: %s", cache_ttl_str
+        if get_bool_env("CACHE_LEADER_ELECTION"):
+            self._leader_election = LeaderElection(
+                self._redis_connector,
+                candidate_id=os.getenv("CACHE_INSTANCE_ID")
+                or f"{socket.gethostname()}-{os.getpid()}",
+                service_name="sensor_cache",
+                lease_ttl=get_float_env("CACHE_LEADER_LEASE_TTL", cnt.LEADER_LEASE_TTL),
             )
-            sys.exit(1)
-        else:
-            self._cache_ttl = cache_ttl
 
-        self._populate_cache_with_csv()
+        self._metadata_snapshot_path = (
+            os.getenv("METADATA_SNAPSHOT_PATH", "").strip() or None
+        )
+        self._metadata_snapshot_interval = get_float_env(
+            "METADATA_SNAPSHOT_INTERVAL", cnt.METADATA_SNAPSHOT_INTERVAL
+        )
+
+        # The CSV describes the sensors of the default source only
+        if any(source.is_default for source in self._sources):
+            self._populate_cache_with_csv()
         log.info("Sensor Cache initialised")
 
     @staticmethod
@@ -128,7 +158,12 @@ class SensorCache:
         log.debug("Calling endpoint %s...", endpoint)
 
         try:
-            endpoint_response = requests.get(endpoint, headers=headers, verify=False)
+            endpoint_response = requests.get(
+                endpoint,
+                headers=headers,
+                verify=False,
+                timeout=cnt.GIRA_REQUEST_TIMEOUT,
+            )
         except Exception as ex:
             log.exception("Got an exception in get_sensor_metadata: %s", ex)
             return {}
@@ -162,145 +197,624 @@ class SensorCache:
             dict: the sensor metadata in a dictionary format.
         """
 
-        if not sensor_name.lower().startswith("house"):
-            log.debug(
-                "Bad format of Sensor Key '%s' and/or Sensor Name '%s'",
-                sensor_key,
-                sensor_name,
+        return SensorNameParser.parse_description(sensor_key, sensor_name)
+
+    def _schedule_refresh(self, sensor_key: str):
+        """Schedules the refresh of the TTL of a sensor just written to the cache.
+
+        Args:
+            sensor_key (str): the sensor key.
+        """
+
+        with self._refresh_lock:
+            self._refresh_deadlines[sensor_key] = (
+                monotonic() + self._cache_ttl * cnt.CACHE_REFRESH_AHEAD_RATIO
             )
-            return {}
 
-        description_list = sensor_name.split("_")
+    def _keys_due_for_refresh(self, sensor_keys: Iterable[str]) -> List[str]:
+        """Returns the sensors whose TTL must be refreshed ahead of expiry,
+        and schedules their next refresh.
+        Sensors never written by this process are refreshed straight away.
+
+        Args:
+            sensor_keys (Iterable[str]): the keys of the sensors still seen by the server.
+
+        Returns:
+            List[str]: the keys of the sensors whose TTL must be refreshed.
+        """
+
+        now = monotonic()
+        deadline = now + self._cache_ttl * cnt.CACHE_REFRESH_AHEAD_RATIO
+        with self._refresh_lock:
+            due_sensor_keys = [
+                sensor_key
+                for sensor_key in sensor_keys
+                if self._refresh_deadlines.get(sensor_key, 0) <= now
+            ]
+            for sensor_key in due_sensor_keys:
+                self._refresh_deadlines[sensor_key] = deadline
+
+        return due_sensor_keys
+
+    def _store_sensor_metadata(self, sensor_metadata: SensorMetadata) -> bool:
+        """Stores the parsed metadata of a sensor into the cache.
 
-        floor_name = room_name = service_type = object_name = ""
+        Args:
+            sensor_metadata (SensorMetadata): the parsed sensor metadata.
+
+        Returns:
+            bool: whether the sensor metadata has been stored or updated.
+        """
+
+        # Check if this sensor is already stored in cache
+        existing_sensor_metadata = self._redis_connector.get_sensor_metadata(
+            key=sensor_metadata.sensor_key
+        )
+        if existing_sensor_metadata:
+            # The unit of measure is only known from the CSV, keep it
+            sensor_metadata = sensor_metadata.replace(
+                unit_of_measure=existing_sensor_metadata.unit_of_measure
+            )
+            if sensor_metadata == existing_sensor_metadata:
+                return False
 
-        if description_list[1].startswith("Floor"):
-            floor_name = description_list[1]
-            service_type = description_list[3]
-            room_name = description_list[2] if len(description_list) > 4 else ""
-            object_name = description_list[4] if len(description_list) > 4 else ""
+            # Update the cache entry with updated data
+            log.debug("Updating Sensor Info with updated values...")
         else:
-            room_name = description_list[1] if len(description_list) > 4 else ""
-            service_type = (
-                description_list[2]
-                if len(description_list) > 4
-                else description_list[1]
+            # Store the sensor info in cache for the first time
+            log.debug("Storing sensor info for the first time: %s", sensor_metadata)
+
+        stored = self._redis_connector.store_sensor_metadata(
+            sensor_metadata, ex=self._cache_ttl, previous=existing_sensor_metadata
+        )
+        if stored:
+            self._schedule_refresh(sensor_metadata.sensor_key)
+            self._metrics.increment("sensor_metadata_stored")
+            log.debug("Sensor Info stored to cache")
+
+        return stored
+
+    def _store_sensor_info_items(
+        self, sensor_info_items: List[dict], key_prefix: str = ""
+    ) -> Set[str]:
+        """Parses a page of sensor info items and stores their metadata into the cache.
+
+        Args:
+            sensor_info_items (List[dict]): raw sensor info items.
+            key_prefix (str): the prefix namespacing the sensor keys of their source.
+
+        Returns:
+            Set[str]: the keys of the sensors stored or updated.
+        """
+
+        stored_sensor_keys = set()
+        unchanged_sensors_metadata: Dict[str, SensorMetadata] = {}
+        for sensor_metadata in self._sensor_name_parser.parse_batch(
+            sensor_info_items, key_prefix
+        ):
+            if self._store_sensor_metadata(sensor_metadata):
+                stored_sensor_keys.add(sensor_metadata.sensor_key)
+            else:
+                unchanged_sensors_metadata[sensor_metadata.sensor_key] = sensor_metadata
+
+        # Sensors still seen by the server get their TTL refreshed ahead of expiry
+        due_sensor_keys = self._keys_due_for_refresh(unchanged_sensors_metadata)
+        if due_sensor_keys:
+            # Also backfills the indexes and the set of known sensors
+            # of the sensors cached before they existed
+            self._redis_connector.refresh_sensor_metadata(
+                [unchanged_sensors_metadata[key] for key in due_sensor_keys],
+                ex=self._cache_ttl,
             )
-            object_name = (
-                description_list[3]
-                if len(description_list) > 4
-                else description_list[2]
+            self._metrics.increment("sensor_ttl_refreshed", len(due_sensor_keys))
+            self._announce_refreshed_sensors(due_sensor_keys)
+
+        return stored_sensor_keys
+
+    def _announce_stored_sensors(self, sensor_keys: Set[str]):
+        """Announces the sensor keys stored into the cache, so that the publisher
+        can release the readings waiting for their metadata.
+
+        Args:
+            sensor_keys (Set[str]): the keys of the stored sensors.
+        """
+
+        if not sensor_keys:
+            return
+
+        self._redis_connector.publish(
+            cnt.METADATA_UPDATES_CHANNEL, {cnt.UPDATED_SENSOR_KEYS: sorted(sensor_keys)}
+        )
+
+    def _announce_removed_sensors(self, sensor_keys: List[str]):
+        """Announces the sensor keys expired from the cache, so that the publisher
+        can unsubscribe from them.
+
+        Args:
+            sensor_keys (List[str]): the keys of the removed sensors.
+        """
+
+        if not sensor_keys:
+            return
+
+        self._redis_connector.publish(
+            cnt.METADATA_UPDATES_CHANNEL, {cnt.REMOVED_SENSOR_KEYS: sorted(sensor_keys)}
+        )
+
+    def _announce_refreshed_sensors(self, sensor_keys: List[str]):
+        """Announces the sensor keys whose TTL has been refreshed, so that the standby
+        instances know when the refresh is due again if they take over.
+
+        Args:
+            sensor_keys (List[str]): the keys of the refreshed sensors.
+        """
+
+        if not sensor_keys or self._leader_election is None:
+            return
+
+        self._redis_connector.publish(
+            cnt.METADATA_UPDATES_CHANNEL, {cnt.REFRESHED_SENSOR_KEYS: sensor_keys}
+        )
+
+    def _is_leader(self) -> bool:
+        """Whether this instance polls the Gira Home Servers: always,
+        unless in active-standby mode.
+        """
+
+        return self._leader_election is None or self._leader_election.is_leader
+
+    def _wait_for_leadership(self, worker: WorkerHandle):
+        """Blocks while this instance is on standby.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        while not self._is_leader():
+            worker.beat()
+            self._leader_election.wait(timeout=1)
+
+    def _warm_up(self, sensor_keys: Iterable[str], schedule_refresh: bool = False):
+        """Parses the descriptions of sensors stored by the leader, so that the
+        parser cache of a standby instance is already warm when it takes over.
+
+        Args:
+            sensor_keys (Iterable[str]): the keys of the stored sensors.
+            schedule_refresh (bool): whether the sensors have just been written,
+                so that their TTL refresh can be scheduled.
+        """
+
+        sensor_keys = list(sensor_keys)
+        for start in range(0, len(sensor_keys), cnt.WARM_UP_BATCH_SIZE):
+            batch = sensor_keys[start : start + cnt.WARM_UP_BATCH_SIZE]
+            for sensor_key, sensor_info in zip(
+                batch, self._redis_connector.get_many(batch)
+            ):
+                if not sensor_info or not sensor_info.get(cnt.SENSOR_NAME):
+                    continue
+
+                try:
+                    self._sensor_name_parser.parse(
+                        sensor_key,
+                        sensor_info[cnt.SENSOR_NAME],
+                        sensor_info.get(cnt.MIN_VALUE),
+                        sensor_info.get(cnt.MAX_VALUE),
+                    )
+                except (KeyError, IndexError):
+                    # Badly formatted descriptions are skipped, as when polling
+                    continue
+
+                # Sensors already scheduled keep their deadline, which may be earlier
+                if schedule_refresh:
+                    with self._refresh_lock:
+                        self._refresh_deadlines.setdefault(
+                            sensor_key,
+                            monotonic()
+                            + self._cache_ttl * cnt.CACHE_REFRESH_AHEAD_RATIO,
+                        )
+
+            self._metrics.increment("standby_sensors_warmed", len(batch))
+
+    def _follow_leader_update(self, update: dict):
+        """Applies a change announced by the leader to the state of a standby instance.
+
+        Args:
+            update (dict): the sensor keys stored, refreshed or removed by the leader.
+        """
+
+        self._warm_up(update.get(cnt.UPDATED_SENSOR_KEYS, []), schedule_refresh=True)
+        for sensor_key in update.get(cnt.REFRESHED_SENSOR_KEYS, []):
+            self._schedule_refresh(sensor_key)
+        with self._refresh_lock:
+            for sensor_key in update.get(cnt.REMOVED_SENSOR_KEYS, []):
+                self._refresh_deadlines.pop(sensor_key, None)
+
+    def _follow_leader(self, worker: WorkerHandle):
+        """Thread keeping a standby instance warm: it parses the sensors already
+        cached, then follows the changes announced by the leader, so that the first
+        poll after a takeover only stores and refreshes what actually changed.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        if not self._is_leader():
+            self._warm_up(self._redis_connector.members(cnt.KNOWN_SENSOR_KEYS))
+            log.info(
+                "Standby warmed up with %d parsed sensors",
+                len(self._sensor_name_parser),
             )
 
-        if description_list[-1] == object_name:
-            object_name = ""
+        while True:
+            try:
+                for update in self._redis_connector.listen(
+                    cnt.METADATA_UPDATES_CHANNEL
+                ):
+                    worker.beat()
+                    # The leader state is already up to date
+                    if not self._is_leader():
+                        self._follow_leader_update(update)
+            except Exception as ex:
+                log.warning(
+                    "Exception while following the leader: %s. "
+                    "Listening again in 5 seconds",
+                    ex,
+                )
+                sleep(5)
 
-        if "weather" in sensor_name.lower():
-            building_name = cnt.WEATHER_STATION_HOUSE_NUMBER
-        else:
-            building_name = description_list[0]
-
-        sensor_info_dict = {
-            cnt.SENSOR_KEY: sensor_key,
-            cnt.SENSOR_NAME: sensor_name,
-            cnt.BUILDING_NAME: building_name,
-            cnt.ROOM_NAME: room_name,
-            cnt.FLOOR_NAME: floor_name,
-            cnt.SERVICE_TYPE: service_type,
-            cnt.OBJECT_NAME: object_name,
-            cnt.MEASUREMENT_TYPE: description_list[-1],
-        }
-
-        return sensor_info_dict
-
-    def _cache_sensor_info_store(self):
-        """Thread continuously waiting for sensor info from a queue.
+    def _cache_sensor_info_store(self, worker: WorkerHandle):
+        """Thread continuously waiting for pages of sensor info from a queue,
+        fed by the pollers of all the sources.
         It parses and stores the sensor metadata into the cache.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
         """
 
         while True:
-            sensor_info: dict = self._caching_queue.get()
-            log.debug("Received new sensor info from queue: %s", sensor_info)
-
-            sensor_key: str = sensor_info.get("key")
-            if not sensor_key:
-                log.debug("Missing Sensor Key. Skipping sensor")
+            worker.beat()
+            try:
+                key_prefix, sensor_info_items = self._caching_queue.get(timeout=1)
+            except Empty:
                 continue
+            log.debug("Received %d new sensor info from queue", len(sensor_info_items))
 
-            sensor_meta: dict = sensor_info.get("meta", {})
-            sensor_name: str = sensor_meta.get("description")
+            stored_sensor_keys = self._store_sensor_info_items(
+                sensor_info_items, key_prefix
+            )
+            self._announce_stored_sensors(stored_sensor_keys)
+
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    "Sensor name parser cache: %d entries, %d hits, %d misses",
+                    len(self._sensor_name_parser),
+                    self._sensor_name_parser.hits,
+                    self._sensor_name_parser.misses,
+                )
+
+    def _iter_sensor_info_pages(
+        self,
+        source: Source,
+        worker: Optional[WorkerHandle] = None,
+        page_ttl: float = 0,
+    ) -> Iterator[List[dict]]:
+        """Fetches all the sensor info from a Gira Home Server, one page at a time.
+
+        Args:
+            source (Source): the Gira Home Server.
+            worker (Optional[WorkerHandle]): the handle to report progress of each page.
+            page_ttl (float): seconds the pages are shared through the cache,
+                0 to always fetch them from the server.
+
+        Yields:
+            List[dict]: a page of sensor info items.
+        """
 
-            sensor_metadata = {}
+        from_param = 0
+
+        while True:
+            if worker is not None:
+                worker.beat()
+            log.debug("Getting new sensor info from server %s...", source.name)
+            inner_url = source.api_url + "&from=" + str(from_param)
+            fetch_page = partial(
+                self.get_sensor_metadata, endpoint=inner_url, headers=source.headers
+            )
             try:
-                sensor_metadata = self._parse_sensor_name(sensor_key, sensor_name)
-            except KeyError as e:
-                log.exception(
-                    "Sensor name '%s' not conform with the expected structure: %s",
-                    sensor_name,
-                    e,
+                if page_ttl:
+                    # Concurrent lookups of the same page hit the server once
+                    sensor_info_items = self._redis_connector.read_through(
+                        f"{cnt.SENSOR_INFO_PAGE_PREFIX}:{source.name}:{from_param}",
+                        fetch_page,
+                        ttl=page_ttl,
+                    )
+                else:
+                    sensor_info_items = fetch_page()
+            except Exception as ex:
+                log.exception("Raised an exception in cache_sensor_info_get: %s", ex)
+                break
+
+            # If response is empty, we've got all sensors, and need to break the loop
+            if not sensor_info_items:
+                break
+
+            from_param += 1000
+
+            yield sensor_info_items
+
+    def _cache_sensor_info_get(self, source: Source, worker: WorkerHandle):
+        """Thread that periodically fetches updated sensor info from a Gira Home Server
+        and adds each page of sensor info in a queue.
+
+        Args:
+            source (Source): the Gira Home Server.
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        while True:
+            self._wait_for_leadership(worker)
+            for sensor_info_items in self._iter_sensor_info_pages(source, worker):
+                # A leader losing its lease stops polling straight away
+                if not self._is_leader():
+                    break
+                self._caching_queue.put((source.key_prefix, sensor_info_items))
+
+            sleep(5)
+
+    def _fetch_source_sensor_info(
+        self,
+        source: Source,
+        gira_sensor_keys: Set[str],
+        worker: Optional[WorkerHandle] = None,
+    ) -> Tuple[Set[str], Set[str]]:
+        """Fetches and stores the metadata of specific sensors of a Gira Home Server.
+        Pages are fetched only until all the requested sensors have been found.
+
+        Args:
+            source (Source): the Gira Home Server.
+            gira_sensor_keys (Set[str]): the sensor keys on the Gira Home Server.
+            worker (Optional[WorkerHandle]): the handle to report progress of each page.
+
+        Returns:
+            Tuple[Set[str], Set[str]]: the keys of the sensors now in cache
+                and the Gira keys of the sensors not found.
+        """
+
+        cached_sensor_keys = set()
+        missing_sensor_keys = set(gira_sensor_keys)
+
+        # Pages fetched for recent requests are reused
+        sensor_info_pages = self._iter_sensor_info_pages(
+            source, worker, page_ttl=cnt.SENSOR_INFO_PAGE_TTL
+        )
+        while missing_sensor_keys:
+            sensor_info_items = next(sensor_info_pages, None)
+            if sensor_info_items is None:
+                break
+
+            requested_items = [
+                sensor_info
+                for sensor_info in sensor_info_items
+                if sensor_info.get("key") in missing_sensor_keys
+            ]
+            cached_sensor_keys |= self._store_sensor_info_items(
+                requested_items, source.key_prefix
+            )
+            missing_sensor_keys -= {
+                sensor_info.get("key") for sensor_info in requested_items
+            }
+
+        return cached_sensor_keys, missing_sensor_keys
+
+    def _fetch_requested_sensor_info(
+        self, sensor_keys: Set[str], worker: Optional[WorkerHandle] = None
+    ) -> Set[str]:
+        """Fetches and stores the metadata of specific sensors from their Gira Home Servers.
+
+        Args:
+            sensor_keys (Set[str]): the keys of the requested sensors.
+            worker (Optional[WorkerHandle]): the handle to report progress of each page.
+
+        Returns:
+            Set[str]: the keys of the requested sensors now in cache.
+        """
+
+        # Sensors may have been stored by the periodic poll in the meantime
+        cached_sensor_keys = set()
+        gira_sensor_keys_by_source: Dict[str, Set[str]] = defaultdict(set)
+        for sensor_key in sensor_keys:
+            if self._redis_connector.exists(sensor_key):
+                cached_sensor_keys.add(sensor_key)
+            else:
+                source_name, gira_sensor_key = split_sensor_key(sensor_key)
+                gira_sensor_keys_by_source[source_name].add(gira_sensor_key)
+
+        sources = {source.name: source for source in self._sources}
+        for source_name, gira_sensor_keys in gira_sensor_keys_by_source.items():
+            source = sources.get(source_name)
+            if source is None:
+                log.info(
+                    "Requested sensors of unknown source '%s': %s",
+                    source_name,
+                    sorted(gira_sensor_keys),
                 )
                 continue
 
-            if not sensor_metadata:
+            source_cached_sensor_keys, missing_sensor_keys = (
+                self._fetch_source_sensor_info(source, gira_sensor_keys, worker)
+            )
+            cached_sensor_keys |= source_cached_sensor_keys
+            if missing_sensor_keys:
+                log.info(
+                    "Requested sensors not found in the Gira Home Server %s: %s",
+                    source_name,
+                    sorted(missing_sensor_keys),
+                )
+
+        return cached_sensor_keys
+
+    def _process_metadata_requests(self, worker: WorkerHandle):
+        """Thread waiting for metadata requests of sensors missing from the cache.
+        It fetches and stores just the requested sensors, without waiting for the next poll.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        while True:
+            worker.beat()
+            self._wait_for_leadership(worker)
+            requested_sensor_keys = set(
+                self._redis_connector.pop_many(
+                    cnt.METADATA_REQUESTS_KEY,
+                    count=cnt.METADATA_REQUESTS_BATCH_SIZE,
+                    timeout=5,
+                )
+            )
+            if not requested_sensor_keys:
+                sleep(1)
                 continue
 
-            # Check if this sensor is already stored in cache
-            existing_sensor_info = self._redis_connector.get(key=sensor_key)
-            if existing_sensor_info:
-                # Update the cache entry with updated data
-                log.debug("Updating Sensor Info with updated values...")
-                existing_sensor_info.update(sensor_metadata)
-                self._redis_connector.store(key=sensor_key, value=existing_sensor_info)
-            else:
-                # Store the sensor info in cache for the first time
-                log.debug("Storing sensor info for the first time: %s", sensor_metadata)
-                sensor_metadata.update({cnt.UNIT_OF_MEASURE: ""})
-                self._redis_connector.store(key=sensor_key, value=sensor_metadata)
+            log.debug("Received metadata requests for %s", requested_sensor_keys)
+            cached_sensor_keys = self._fetch_requested_sensor_info(
+                requested_sensor_keys, worker
+            )
+            self._announce_stored_sensors(cached_sensor_keys)
 
-            log.debug("Sensor Info stored to cache")
+    def _write_metadata_snapshots(self, worker: WorkerHandle):
+        """Thread periodically writing the metadata of all the cached sensors
+        to a snapshot file, mapped by the Sensor Publishers on the same host.
+        Every instance writes its own host snapshot, the leader or not, and only
+        when the metadata has changed since the previous one.
 
-    def _cache_sensor_info_get(self):
-        """Thread that periodically fetches updated sensor info from the Gira Home Server
-        and adds the info of each sensor in a queue.
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
         """
 
+        previous_sensor_infos = None
+
         while True:
-            from_param = 0
-            sensor_info_items = []
+            worker.beat()
+            # Changes made while reading are newer than the snapshot
+            created_at = time()
+            sensor_keys = sorted(self._redis_connector.members(cnt.KNOWN_SENSOR_KEYS))
+            sensor_infos = []
+            for start in range(0, len(sensor_keys), cnt.WARM_UP_BATCH_SIZE):
+                sensor_infos.extend(
+                    sensor_info
+                    for sensor_info in self._redis_connector.get_many(
+                        sensor_keys[start : start + cnt.WARM_UP_BATCH_SIZE]
+                    )
+                    if sensor_info
+                )
 
-            while True:
-                log.debug("Getting new sensor info from server...")
-                inner_url = self._sensor_info_endpoint + "&from=" + str(from_param)
+            if sensor_infos != previous_sensor_infos:
                 try:
-                    sensor_info_items = self.get_sensor_metadata(
-                        endpoint=inner_url, headers=self._headers
+                    snapshot_size = write_metadata_snapshot(
+                        self._metadata_snapshot_path, sensor_infos, created_at
                     )
-                except Exception as ex:
-                    log.exception(
-                        "Raised an exception in cache_sensor_info_get: %s", ex
+                except OSError as e:
+                    log.error(
+                        "Failed to write metadata snapshot %s: %s",
+                        self._metadata_snapshot_path,
+                        e,
                     )
-                    break
+                else:
+                    previous_sensor_infos = sensor_infos
+                    self._metrics.increment("metadata_snapshots_written")
+                    self._metrics.set_gauge("metadata_snapshot_sensors", snapshot_size)
+                    log.debug("Metadata snapshot of %d sensors written", snapshot_size)
 
-                # If response is empty, we've got all sensors, and need to break the loop
-                if not sensor_info_items:
-                    break
+            sleep(self._metadata_snapshot_interval)
 
-                from_param += 1000
+    def _report_metrics(self, worker: WorkerHandle):
+        """Thread that periodically counts the live sensor keys and reports the metrics.
+        It also removes the expired sensors from the indexes once in a while.
 
-                for sensor_info in sensor_info_items:
-                    self._caching_queue.put(sensor_info)
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
 
-            sleep(5)
+        metrics_report_interval = get_int_env(
+            "METRICS_REPORT_INTERVAL", cnt.METRICS_REPORT_INTERVAL
+        )
+        next_index_prune = monotonic() + cnt.SENSOR_INDEX_PRUNE_INTERVAL
+
+        while True:
+            worker.beat()
+            live_sensor_keys = self._redis_connector.count_keys(cnt.SENSOR_KEYS_PATTERN)
+            if live_sensor_keys is not None:
+                self._metrics.set_gauge("live_sensor_keys", live_sensor_keys)
+            self._metrics.set_gauge(
+                "sensor_name_parser_entries", len(self._sensor_name_parser)
+            )
+
+            # Forget the refresh deadlines of sensors expired from the cache
+            now = monotonic()
+            with self._refresh_lock:
+                expired_sensor_keys = [
+                    sensor_key
+                    for sensor_key, deadline in self._refresh_deadlines.items()
+                    if deadline + self._cache_ttl < now
+                ]
+                for sensor_key in expired_sensor_keys:
+                    self._refresh_deadlines.pop(sensor_key, None)
+
+            if self._leader_election is not None:
+                self._metrics.set_gauge("leader", int(self._is_leader()))
+
+            # Only the leader maintains the indexes and stores the metrics
+            if not self._is_leader():
+                self._metrics.report()
+                sleep(metrics_report_interval)
+                continue
+
+            if monotonic() >= next_index_prune:
+                self._announce_removed_sensors(
+                    prune_known_sensor_keys(self._redis_connector)
+                )
+                self._metrics.increment(
+                    "sensor_index_entries_pruned",
+                    prune_sensor_indexes(self._redis_connector),
+                )
+                next_index_prune = monotonic() + cnt.SENSOR_INDEX_PRUNE_INTERVAL
+
+            self._metrics.report(self._redis_connector)
+            sleep(metrics_report_interval)
 
     def start(self):
-        """Entry point of this class. It starts the thread to receive sensor info from a queue
-        and the loop to periodically fetch new sensor info from the Gira Home Server and add them to the queue.
+        """Entry point of this class. It starts the worker threads that periodically fetch
+        new sensor info from the Gira Home Server and store it into the cache,
+        and supervises them forever.
         """
 
-        log.info("Starting caching store thread...")
-        Thread(
-            target=self._cache_sensor_info_store, name="cache_sensor_info_store"
-        ).start()
-        log.info("Caching store thread started")
-
-        self._cache_sensor_info_get()
+        supervisor = Supervisor("sensor_cache", self._redis_connector)
+        if self._leader_election is not None:
+            # The first instance leads straight away, without waiting for the thread
+            self._leader_election.refresh()
+            atexit.register(self._leader_election.release)
+            supervisor.add_worker("leader_election", self._leader_election.run)
+            supervisor.add_worker("follow_leader", self._follow_leader)
+        supervisor.add_worker(
+            "cache_sensor_info_store",
+            self._cache_sensor_info_store,
+            stall_timeout=self._worker_stall_timeout,
+        )
+        supervisor.add_worker(
+            "process_metadata_requests",
+            self._process_metadata_requests,
+            stall_timeout=self._worker_stall_timeout,
+        )
+        # Every source is polled concurrently, feeding the same caching queue
+        for source in self._sources:
+            supervisor.add_worker(
+                f"cache_sensor_info_get:{source.name}",
+                partial(self._cache_sensor_info_get, source),
+                stall_timeout=self._worker_stall_timeout,
+            )
+        if self._metadata_snapshot_path is not None:
+            supervisor.add_worker(
+                "write_metadata_snapshots", self._write_metadata_snapshots
+            )
+        supervisor.add_worker("report_metrics", self._report_metrics)
+        supervisor.run()
@@ -0,0 +1,250 @@
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+import constants as cnt
+from sensor_types import SensorMetadata
+
+log = logging.getLogger(__name__)
+
+DESCRIPTION_SEPARATOR = "_"
+HOUSE_PREFIX = "house"
+FLOOR_PREFIX = "Floor"
+WEATHER_MARKER = "weather"
+
+# Key of a parsed description: sensor key, description, minimum and maximum value
+CacheKey = Tuple[str, str, Optional[float], Optional[float]]
+
+# Marks descriptions that are not in the parsed descriptions cache
+_MISSING = object()
+
+
+class SensorNameParser:
+    def __init__(self, max_size: int = cnt.SENSOR_NAME_PARSER_CACHE_SIZE):
+        """Parses sensor descriptions into sensor metadata, memoising the results.
+
+        Descriptions almost never change between two polls of the Gira Home Server,
+        so the parsed metadata is cached by sensor key, description and range.
+        The cache is bounded and evicts the least recently used entries.
+
+        Args:
+            max_size (int): maximum number of parsed descriptions to keep.
+        """
+
+        self._max_size = max_size
+        self._parsed_descriptions: "OrderedDict[CacheKey, Optional[SensorMetadata]]" = (
+            OrderedDict()
+        )
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._parsed_descriptions)
+
+    @staticmethod
+    def parse_description(sensor_key: str, sensor_name: str) -> dict:
+        """Parses the sensor name to retrieve specific info about the sensor metadata.
+
+        Args:
+            sensor_key (str): sensor key.
+            sensor_name (str): the long representation of sensor info.
+
+        Returns:
+            dict: the sensor metadata in a dictionary format.
+        """
+
+        lower_sensor_name = sensor_name.lower()
+        if not lower_sensor_name.startswith(HOUSE_PREFIX):
+            log.debug(
+                "Bad format of Sensor Key '%s' and/or Sensor Name '%s'",
+                sensor_key,
+                sensor_name,
+            )
+            return {}
+
+        description_list = sensor_name.split(DESCRIPTION_SEPARATOR)
+        n_tokens = len(description_list)
+
+        floor_name = room_name = service_type = object_name = ""
+
+        if description_list[1].startswith(FLOOR_PREFIX):
+            floor_name = description_list[1]
+            service_type = description_list[3]
+            room_name = description_list[2] if n_tokens > 4 else ""
+            object_name = description_list[4] if n_tokens > 4 else ""
+        elif n_tokens > 4:
+            room_name = description_list[1]
+            service_type = description_list[2]
+            object_name = description_list[3]
+        else:
+            service_type = description_list[1]
+            object_name = description_list[2]
+
+        measurement_type = description_list[-1]
+        if measurement_type == object_name:
+            object_name = ""
+
+        if WEATHER_MARKER in lower_sensor_name:
+            building_name = cnt.WEATHER_STATION_HOUSE_NUMBER
+        else:
+            building_name = description_list[0]
+
+        sensor_info_dict = {
+            cnt.SENSOR_KEY: sensor_key,
+            cnt.SENSOR_NAME: sensor_name,
+            cnt.BUILDING_NAME: building_name,
+            cnt.ROOM_NAME: room_name,
+            cnt.FLOOR_NAME: floor_name,
+            cnt.SERVICE_TYPE: service_type,
+            cnt.OBJECT_NAME: object_name,
+            cnt.MEASUREMENT_TYPE: measurement_type,
+        }
+
+        return sensor_info_dict
+
+    @staticmethod
+    def sensor_range(meta: dict) -> Tuple[Optional[float], Optional[float]]:
+        """Returns the valid range of a sensor from its Gira meta.
+
+        Args:
+            meta (dict): the meta of the sensor info item, with 'minValue' and 'maxValue'.
+
+        Returns:
+            Tuple[Optional[float], Optional[float]]: the minimum and maximum value,
+                None when missing or unbounded.
+        """
+
+        min_value = meta.get("minValue")
+        max_value = meta.get("maxValue")
+        if not isinstance(min_value, (int, float)) or (
+            min_value <= cnt.GIRA_UNBOUNDED_MIN_VALUE
+        ):
+            min_value = None
+        if not isinstance(max_value, (int, float)) or (
+            max_value >= cnt.GIRA_UNBOUNDED_MAX_VALUE
+        ):
+            max_value = None
+
+        return min_value, max_value
+
+    def _cache_parsed_description(
+        self, cache_key: CacheKey
+    ) -> Optional[SensorMetadata]:
+        """Parses a description missing from the cache and caches the result.
+
+        Args:
+            cache_key (CacheKey): the sensor key, its description and range.
+
+        Returns:
+            Optional[SensorMetadata]: the sensor metadata,
+                None if the name is badly formatted.
+        """
+
+        sensor_key, sensor_name, min_value, max_value = cache_key
+        sensor_info = self.parse_description(sensor_key, sensor_name)
+        if sensor_info:
+            sensor_info[cnt.MIN_VALUE] = min_value
+            sensor_info[cnt.MAX_VALUE] = max_value
+        sensor_metadata = SensorMetadata.from_dict(sensor_info) if sensor_info else None
+
+        with self._lock:
+            self.misses += 1
+            self._parsed_descriptions[cache_key] = sensor_metadata
+            if len(self._parsed_descriptions) > self._max_size:
+                self._parsed_descriptions.popitem(last=False)
+
+        return sensor_metadata
+
+    def parse(
+        self,
+        sensor_key: str,
+        sensor_name: str,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+    ) -> Optional[SensorMetadata]:
+        """Returns the sensor metadata of a sensor, parsing its name only on a cache miss.
+
+        Args:
+            sensor_key (str): sensor key.
+            sensor_name (str): the long representation of sensor info.
+            min_value (Optional[float]): the minimum valid value, None if unbounded.
+            max_value (Optional[float]): the maximum valid value, None if unbounded.
+
+        Returns:
+            Optional[SensorMetadata]: the sensor metadata,
+                None if the name is badly formatted.
+        """
+
+        cache_key = (sensor_key, sensor_name, min_value, max_value)
+
+        with self._lock:
+            sensor_metadata = self._parsed_descriptions.get(cache_key, _MISSING)
+            if sensor_metadata is not _MISSING:
+                self._parsed_descriptions.move_to_end(cache_key)
+                self.hits += 1
+                return sensor_metadata
+
+        return self._cache_parsed_description(cache_key)
+
+    def parse_batch(
+        self, sensor_info_items: Iterable[dict], key_prefix: str = ""
+    ) -> List[SensorMetadata]:
+        """Parses a whole page of sensor info items returned by the Gira Home Server.
+        The cache is looked up once for the whole page, so that in steady state
+        only new or renamed sensors are actually parsed.
+
+        Items without a key or description, or whose description doesn't conform with
+        the expected structure, are skipped.
+
+        Args:
+            sensor_info_items (Iterable[dict]): raw sensor info items.
+            key_prefix (str): the prefix namespacing the sensor keys of their source.
+
+        Returns:
+            List[SensorMetadata]: the sensor metadata of every item that could be parsed.
+        """
+
+        parsed_items: List[Optional[SensorMetadata]] = []
+        missing_items: List[Tuple[int, CacheKey]] = []
+
+        with self._lock:
+            parsed_descriptions = self._parsed_descriptions
+            for sensor_info in sensor_info_items:
+                sensor_key: str = sensor_info.get("key")
+                if not sensor_key:
+                    log.debug("Missing Sensor Key. Skipping sensor")
+                    continue
+                sensor_key = key_prefix + sensor_key
+
+                meta: dict = sensor_info.get("meta", {})
+                sensor_name: str = meta.get("description")
+                if not sensor_name:
+                    log.debug("Missing description for Sensor Key '%s'", sensor_key)
+                    continue
+
+                cache_key = (sensor_key, sensor_name, *self.sensor_range(meta))
+                sensor_metadata = parsed_descriptions.get(cache_key, _MISSING)
+                if sensor_metadata is _MISSING:
+                    # Keep the position of the item to preserve the page order
+                    missing_items.append((len(parsed_items), cache_key))
+                    parsed_items.append(None)
+                    continue
+
+                parsed_descriptions.move_to_end(cache_key)
+                parsed_items.append(sensor_metadata)
+
+            self.hits += len(parsed_items) - len(missing_items)
+
+        for position, cache_key in missing_items:
+            try:
+                parsed_items[position] = self._cache_parsed_description(cache_key)
+            except (KeyError, IndexError) as e:
+                log.exception(
+                    "Sensor name '%s' not conform with the expected structure: %s",
+                    cache_key[1],
+                    e,
+                )
+
+        return [sensor_metadata for sensor_metadata in parsed_items if sensor_metadata]
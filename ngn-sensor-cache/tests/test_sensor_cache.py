@@ -1,5 +1,7 @@
 import pytest
+from ngn.sensor.cache.leader_election import LeaderElection
 from ngn.sensor.cache.sensor_cache import SensorCache
+from ngn.sensor.cache.sensor_name_parser import SensorNameParser
 
 SENSOR_KEY = "sensor_key"
 SENSOR_NAME = "sensor_name"
@@ -315,3 +317,179 @@ def test_sensor_info_parsing(sensor_key: str, sensor_name: str, expected_values:
         assert sensor_info.get(MEASUREMENT_TYPE) == expected_values.get(
             MEASUREMENT_TYPE
         )
+
+
+def test_sensor_name_parser_memoisation():
+    sensor_name_parser = SensorNameParser(max_size=2)
+
+    first = sensor_name_parser.parse(
+        "CO@2_0_205", "House 2_Floor1_Kitchen_Electric_Hob_Current"
+    )
+    second = sensor_name_parser.parse(
+        "CO@2_0_205", "House 2_Floor1_Kitchen_Electric_Hob_Current"
+    )
+
+    assert first == second
+    assert first is second
+    assert sensor_name_parser.hits == 1
+    assert sensor_name_parser.misses == 1
+
+    # A changed description is parsed again
+    renamed = sensor_name_parser.parse(
+        "CO@2_0_205", "House 2_Floor1_Kitchen_Electric_Oven_Current"
+    )
+    assert renamed.object_name == "Oven"
+    assert sensor_name_parser.misses == 2
+
+    sensor_name_parser.parse("CO@4_3_148", "House 4_WWHRS_ShowerMIX_Temp")
+    assert len(sensor_name_parser) == 2
+
+
+def test_sensor_name_parser_batch():
+    sensor_name_parser = SensorNameParser()
+    sensor_info_items = SENSOR_INFO + [
+        {"key": None, "meta": {"description": "House 1_Floor1_Kitchen_Water_Temp"}},
+        {"key": "CO@1_0_1", "meta": {}},
+        {"key": "CO@1_0_2", "meta": {"description": "Bad formatted string"}},
+    ]
+
+    parsed_items = sensor_name_parser.parse_batch(sensor_info_items)
+
+    assert [item.sensor_key for item in parsed_items] == [
+        sensor_info.get("key") for sensor_info in SENSOR_INFO
+    ]
+    assert sensor_name_parser.parse_batch(sensor_info_items) == parsed_items
+    assert sensor_name_parser.hits == len(SENSOR_INFO) + 1
+
+
+def test_keys_due_for_refresh(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ngn.sensor.cache.sensor_cache.monotonic", lambda: now[0])
+
+    sensor_cache = SensorCache()
+    sensor_cache._cache_ttl = 100
+    sensor_cache._schedule_refresh("CO@2_0_205")
+
+    # Sensors never written by this process are refreshed straight away
+    assert sensor_cache._keys_due_for_refresh(["CO@2_0_205", "CO@1_3_13"]) == [
+        "CO@1_3_13"
+    ]
+    assert sensor_cache._keys_due_for_refresh(["CO@2_0_205", "CO@1_3_13"]) == []
+
+    now[0] += 100 * 0.5
+    assert sensor_cache._keys_due_for_refresh(["CO@2_0_205", "CO@1_3_13"]) == [
+        "CO@2_0_205",
+        "CO@1_3_13",
+    ]
+
+
+def test_sensor_name_parser_batch_with_key_prefix():
+    sensor_name_parser = SensorNameParser()
+
+    parsed_items = sensor_name_parser.parse_batch(SENSOR_INFO, key_prefix="site_b:")
+    assert [item.sensor_key for item in parsed_items] == [
+        "site_b:" + sensor_info.get("key") for sensor_info in SENSOR_INFO
+    ]
+
+    # The same sensors of another source are cached separately
+    sensor_name_parser.parse_batch(SENSOR_INFO)
+    assert len(sensor_name_parser) == 2 * len(SENSOR_INFO)
+
+
+class FakeLeaseConnector:
+    def __init__(self):
+        self.leases = {}
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return self.leases.setdefault(key, owner) == owner
+
+    def renew_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return self.leases.get(key) == owner
+
+    def release_lease(self, key: str, owner: str) -> bool:
+        if self.leases.get(key) != owner:
+            return False
+        del self.leases[key]
+        return True
+
+
+def test_leader_election_takeover():
+    lease_connector = FakeLeaseConnector()
+    leader, standby = (
+        LeaderElection(lease_connector, candidate_id, "test")
+        for candidate_id in ("leader", "standby")
+    )
+
+    assert leader.refresh()
+    assert leader.is_leader
+    assert not standby.refresh()
+    assert not standby.is_leader
+    assert not leader.refresh()
+
+    # The standby takes over as soon as the lease is released or expires
+    leader.release()
+    assert not leader.is_leader
+    assert standby.refresh()
+    assert standby.wait(timeout=0)
+    assert not leader.refresh()
+
+
+class FakeMetadataConnector:
+    def __init__(self, sensor_info: dict):
+        self.sensor_info = sensor_info
+
+    def get_many(self, keys: list) -> list:
+        return [self.sensor_info.get(key) for key in keys]
+
+
+def test_follow_leader_update(monkeypatch):
+    monkeypatch.setattr("ngn.sensor.cache.sensor_cache.monotonic", lambda: 1000.0)
+    sensor_cache = SensorCache()
+    sensor_cache._cache_ttl = 100
+    sensor_cache._redis_connector = FakeMetadataConnector(
+        {
+            "CO@2_0_205": {
+                "sensor_key": "CO@2_0_205",
+                "sensor_name": "House 2_Floor1_Kitchen_Electric_Hob_Current",
+            }
+        }
+    )
+
+    sensor_cache._follow_leader_update(
+        {
+            "sensor_keys": ["CO@2_0_205", "CO@1_0_1"],
+            "refreshed_sensor_keys": ["CO@1_3_13"],
+        }
+    )
+
+    # The first poll after a takeover finds the stored sensor already parsed
+    sensor_cache._sensor_name_parser.parse_batch(SENSOR_INFO[:1])
+    assert sensor_cache._sensor_name_parser.hits == 1
+    assert sensor_cache._keys_due_for_refresh(["CO@2_0_205", "CO@1_3_13"]) == []
+
+    sensor_cache._follow_leader_update({"removed_sensor_keys": ["CO@1_3_13"]})
+    assert sensor_cache._keys_due_for_refresh(["CO@1_3_13"]) == ["CO@1_3_13"]
+
+
+def test_sensor_name_parser_range():
+    sensor_name_parser = SensorNameParser()
+    sensor_info = {
+        "key": "CO@2_0_205",
+        "meta": {
+            "description": "House 2_Floor1_Kitchen_Electric_Hob_Current",
+            "minValue": 0,
+            "maxValue": 2147483647.0,
+        },
+    }
+
+    [sensor_metadata] = sensor_name_parser.parse_batch([sensor_info])
+    assert sensor_metadata.min_value == 0
+    assert sensor_metadata.max_value is None
+    assert sensor_metadata.to_dict()["min_value"] == 0
+    assert "max_value" not in sensor_metadata.to_dict()
+
+    # A changed range is parsed again
+    sensor_info["meta"]["maxValue"] = 32
+    [sensor_metadata] = sensor_name_parser.parse_batch([sensor_info])
+    assert sensor_metadata.max_value == 32
+    assert sensor_name_parser.misses == 2
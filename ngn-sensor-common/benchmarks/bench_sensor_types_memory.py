@@ -0,0 +1,97 @@
+"""Memory benchmark of the sensor metadata representations.
+
+It builds an in-process cache of sensor metadata for a large fleet, once with
+plain dictionaries (as decoded from Redis) and once with 'SensorMetadata',
+and reports the per-sensor footprint measured with 'tracemalloc'.
+
+Usage:
+    python ngn-sensor-common/benchmarks/bench_sensor_types_memory.py [--sensors N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+COMMON_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "src",
+    "ngn",
+    "sensor",
+    "common",
+)
+sys.path.insert(0, COMMON_DIR)
+
+import constants as cnt  # noqa: E402
+from sensor_types import SensorMetadata  # noqa: E402
+
+ROOMS = ["Kitchen", "Lounge", "Bed1", "Bed2", "Bathroom", "Global"]
+SERVICES = ["Electric", "Water", "Heating", "Other"]
+MEASUREMENTS = ["Temp", "Humidity", "Current", "Flow", "AppPower"]
+
+
+def wire_messages(n_sensors: int) -> list:
+    """Returns the JSON documents of a synthetic fleet, as stored in Redis."""
+
+    house_numbers = list(cnt.BUILDING_NAMES)
+    messages = []
+    for index in range(n_sensors):
+        building_name = house_numbers[index % len(house_numbers)]
+        floor_name = f"Floor{index % 3}"
+        room_name = ROOMS[index % len(ROOMS)]
+        service_type = SERVICES[index % len(SERVICES)]
+        measurement_type = MEASUREMENTS[index % len(MEASUREMENTS)]
+        sensor_name = "_".join(
+            [building_name, floor_name, room_name, service_type, measurement_type]
+        )
+        messages.append(
+            json.dumps(
+                {
+                    cnt.SENSOR_KEY: f"CO@{index // 1000}_{index % 8}_{index}",
+                    cnt.SENSOR_NAME: sensor_name,
+                    cnt.BUILDING_NAME: building_name,
+                    cnt.ROOM_NAME: room_name,
+                    cnt.FLOOR_NAME: floor_name,
+                    cnt.SERVICE_TYPE: service_type,
+                    cnt.OBJECT_NAME: "",
+                    cnt.MEASUREMENT_TYPE: measurement_type,
+                    cnt.UNIT_OF_MEASURE: "",
+                }
+            )
+        )
+
+    return messages
+
+
+def measure(messages: list, build) -> int:
+    """Returns the bytes allocated to keep the cache built by 'build' alive."""
+
+    tracemalloc.start()
+    cache = {}
+    for message in messages:
+        sensor_info = json.loads(message)
+        cache[sensor_info[cnt.SENSOR_KEY]] = build(sensor_info)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sensors", type=int, default=50000)
+    args = parser.parse_args()
+
+    messages = wire_messages(args.sensors)
+    dict_bytes = measure(messages, dict)
+    slotted_bytes = measure(messages, SensorMetadata.from_dict)
+
+    print(f"Sensors:                    {args.sensors}")
+    print(f"dict per sensor:            {dict_bytes / args.sensors:.0f} B")
+    print(f"SensorMetadata per sensor:  {slotted_bytes / args.sensors:.0f} B")
+    print(f"Saving:                     {1 - slotted_bytes / dict_bytes:.0%}")
+
+
+if __name__ == "__main__":
+    main()
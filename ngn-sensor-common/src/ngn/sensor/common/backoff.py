@@ -0,0 +1,42 @@
+import random
+
+
+class ExponentialBackoff:
+    def __init__(
+        self,
+        initial: float = 1.0,
+        maximum: float = 60.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.0,
+    ):
+        """Delays growing exponentially after each consecutive failure, up to a cap.
+
+        Args:
+            initial (float): the first delay, in seconds.
+            maximum (float): the maximum delay, in seconds.
+            multiplier (float): the growth factor of consecutive delays.
+            jitter (float): the random fraction (0 to 1) removed from each delay,
+                so that many clients don't retry in lockstep.
+        """
+
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        """Returns the delay before the next attempt and counts the attempt."""
+
+        delay = min(self.maximum, self.initial * self.multiplier**self.attempts)
+        self.attempts += 1
+
+        if self.jitter:
+            delay -= delay * self.jitter * random.random()
+
+        return delay
+
+    def reset(self):
+        """Starts again from the initial delay, e.g. after a success."""
+
+        self.attempts = 0
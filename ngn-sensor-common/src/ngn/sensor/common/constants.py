@@ -11,6 +11,11 @@ MEASUREMENT_TYPE = "measurement_type"
 LAST_SHARED_VALUE = "last_shared_value"
 UNIT_OF_MEASURE = "unit_of_measure"
 LAST_SHARED_DATETIME = "last_shared_datetime"
+MIN_VALUE = "min_value"
+MAX_VALUE = "max_value"
+# Bounds the Gira Home Server reports for sensors without a range
+GIRA_UNBOUNDED_MIN_VALUE = -2147483648
+GIRA_UNBOUNDED_MAX_VALUE = 2147483647
 
 WEATHER_STATION_HOUSE_NUMBER = "House 10"
 BUILDING_NAMES = {
@@ -26,13 +31,129 @@ BUILDING_NAMES = {
     WEATHER_STATION_HOUSE_NUMBER: "Weather Stations",
 }
 
+SUBSCRIPTION_CONTEXT = "iotics-connector-cev"
+# Subscription key matching all the sensors of a Gira Home Server
+WILDCARD_SUBSCRIPTION_KEY = "CO@*"
 INITIAL_SUBSCRIPTION_PAYLOAD = {
     "type": "subscribe",
-    "param": {"keys": ["CO@*"], "context": "iotics-connector-cev"},
+    "param": {"keys": [WILDCARD_SUBSCRIPTION_KEY], "context": SUBSCRIPTION_CONTEXT},
 }
+# Maximum number of sensor keys in a single subscription message
+SUBSCRIPTION_CHUNK_SIZE = 500
 
 SENSOR_METADATA_CSV = "sensor_metadata.csv"
 
+# Glob-style pattern of the sensor keys stored in Redis, of any source
+SENSOR_KEYS_PATTERN = "*CO@*"
+# Redis set with the keys of all the sensors in cache
+KNOWN_SENSOR_KEYS = "known_sensor_keys"
+# Prefix of the Redis sets indexing the sensors by metadata field
+SENSOR_INDEX_PREFIX = "sensor_index"
+# How often (in seconds) expired sensors are removed from the indexes
+SENSOR_INDEX_PRUNE_INTERVAL = 3600
+# Prefix of the Redis hashes with the latest value of each sensor, by building
+SENSOR_STATE_PREFIX = "sensor_state"
+# How often (in milliseconds) the latest sensor values are written to Redis
+LATEST_VALUE_FLUSH_INTERVAL_MS = 250
+# Minimum interval (in milliseconds) between two states of a sensor
+# published to the compacted state topic
+SENSOR_STATE_MIN_INTERVAL_MS = 1000
+# File of the local schema registry of the binary Kafka payload formats
+SCHEMA_REGISTRY_PATH = "schemas.json"
+# Seconds a sensor stays in the cache without being seen by the Gira Home Server
+CACHE_TTL = 86400
+# Fraction of the cache TTL after which an entry still seen by the Gira Home Server
+# gets its expiration time refreshed
+CACHE_REFRESH_AHEAD_RATIO = 0.5
+# How often (in seconds) the services report their metrics
+METRICS_REPORT_INTERVAL = 60
+# How often (in seconds) the services report the health of their worker threads
+HEALTH_REPORT_INTERVAL = 5
+# Seconds without progress after which a worker thread is considered stalled
+WORKER_STALL_TIMEOUT = 30
+# Seconds after which a request to a Gira Home Server is abandoned, below the stall timeout
+GIRA_REQUEST_TIMEOUT = 20
+# Seconds of web socket silence after which a ping is sent
+WEBSOCKET_PING_INTERVAL = 15
+# Seconds to wait for any frame after a ping before reconnecting
+WEBSOCKET_PING_TIMEOUT = 10
+# Delay (in seconds) of the first web socket reconnection attempt
+WEBSOCKET_RECONNECT_INITIAL_DELAY = 0.25
+# Maximum delay (in seconds) between web socket reconnection attempts
+WEBSOCKET_RECONNECT_MAX_DELAY = 30
+# Maximum number of sensor readings waiting to be published
+SENSOR_DATA_QUEUE_SIZE = 10000
+# Seconds to wait for the metadata of a Kafka topic at startup
+KAFKA_METADATA_TIMEOUT = 10
+
+# Redis list where the publisher requests metadata of sensors missing from the cache
+METADATA_REQUESTS_KEY = "sensor_metadata_requests"
+# Redis channel where the cache announces the sensor keys it has stored
+METADATA_UPDATES_CHANNEL = "sensor_metadata_updates"
+UPDATED_SENSOR_KEYS = "sensor_keys"
+REMOVED_SENSOR_KEYS = "removed_sensor_keys"
+REFRESHED_SENSOR_KEYS = "refreshed_sensor_keys"
+# Seconds before a sensor missing from the cache is looked up again
+NEGATIVE_CACHE_TTL = 30
+# Maximum number of readings parked per sensor while waiting for its metadata
+PARKED_READINGS_PER_SENSOR = 10
+# Seconds after which the parked readings of a sensor whose metadata never arrived are dropped
+PARKED_READINGS_TTL = 60
+# Number of shards of the sensor key space in cluster mode
+CLUSTER_SHARDS = 64
+# Seconds after which the leases of a dead replica expire
+CLUSTER_LEASE_TTL = 10
+# Prefix of the Redis keys of the cluster leases
+CLUSTER_KEY_PREFIX = "cluster"
+# Seconds after which the lease of a dead Sensor Cache leader expires
+LEADER_LEASE_TTL = 3
+# Read-through cache: field of the cached values, suffix of the loading leases,
+# fraction of the TTL randomly added to it, maximum seconds a load holds its lease
+# and seconds between two checks for a value loaded by another process
+READ_THROUGH_VALUE = "value"
+READ_THROUGH_LOCK_SUFFIX = "loading"
+READ_THROUGH_TTL_JITTER = 0.1
+READ_THROUGH_LOCK_TIMEOUT = 10
+READ_THROUGH_POLL_INTERVAL = 0.05
+# Prefix of the pages of sensor info shared by the metadata requests, and their TTL
+SENSOR_INFO_PAGE_PREFIX = "sensor_info_page"
+SENSOR_INFO_PAGE_TTL = 5
+# Number of sensor metadata read at once, e.g. by a standby Sensor Cache warming up
+WARM_UP_BATCH_SIZE = 1000
+# Seconds between two metadata snapshots written by the Sensor Cache,
+# and between two checks for a new snapshot by the Sensor Publisher
+METADATA_SNAPSHOT_INTERVAL = 10
+METADATA_SNAPSHOT_RELOAD_INTERVAL = 1
+
+# Maximum number of rejected records in a dead-letter message
+DEAD_LETTER_BATCH_SIZE = 100
+# Maximum seconds a rejected record waits for its dead-letter batch
+DEAD_LETTER_FLUSH_INTERVAL = 5
+# Maximum rejected records per second buffered per source
+DEAD_LETTER_RATE_LIMIT = 50
+# Maximum number of rejected records waiting to be published
+DEAD_LETTER_BUFFER_SIZE = 10000
+
+# Anomaly detection: weight of the latest reading in the moving mean and variance,
+# readings before spikes are detected, z-score of a spike, seconds after which
+# an unchanged value is stuck, and maximum readings waiting for detection
+ANOMALY_EWMA_ALPHA = 0.05
+ANOMALY_WARMUP_READINGS = 30
+ANOMALY_Z_SCORE = 6
+ANOMALY_STUCK_SECONDS = 3600
+ANOMALY_QUEUE_SIZE = 10000
+# Seconds between two sweeps for sensors stuck without sending readings
+ANOMALY_STUCK_SWEEP_INTERVAL = 60
+
+# Maximum number of metadata requests served in a single metadata scan
+METADATA_REQUESTS_BATCH_SIZE = 100
+
+# Maximum number of parsed sensor descriptions kept in memory
+SENSOR_NAME_PARSER_CACHE_SIZE = 100000
+
+# Maximum number of log records waiting for the asynchronous logging thread
+LOG_QUEUE_SIZE = 10000
+
 # Logging Configurations
 logging_level = os.getenv("LOGGING_LEVEL")
 LOGGING_CONFIGURATION = {
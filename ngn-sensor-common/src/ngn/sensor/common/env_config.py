@@ -0,0 +1,71 @@
+import logging
+import os
+import sys
+
+log = logging.getLogger(__name__)
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def get_int_env(name: str, default: int = None) -> int:
+    """Reads an integer from an environment variable.
+    The process exits if the variable is set but is not an integer.
+
+    Args:
+        name (str): the environment variable name.
+        default (int): the value to return if the variable is not set.
+
+    Returns:
+        int: the value of the environment variable.
+    """
+
+    value_str = os.getenv(name)
+    if value_str in (None, ""):
+        return default
+
+    try:
+        return int(value_str)
+    except ValueError:
+        log.error("Environment variable '%s' is not an integer: %s", name, value_str)
+        sys.exit(1)
+
+
+def get_float_env(name: str, default: float = None) -> float:
+    """Reads a float from an environment variable.
+    The process exits if the variable is set but is not a number.
+
+    Args:
+        name (str): the environment variable name.
+        default (float): the value to return if the variable is not set.
+
+    Returns:
+        float: the value of the environment variable.
+    """
+
+    value_str = os.getenv(name)
+    if value_str in (None, ""):
+        return default
+
+    try:
+        return float(value_str)
+    except ValueError:
+        log.error("Environment variable '%s' is not a number: %s", name, value_str)
+        sys.exit(1)
+
+
+def get_bool_env(name: str, default: bool = False) -> bool:
+    """Reads a boolean flag from an environment variable.
+
+    Args:
+        name (str): the environment variable name.
+        default (bool): the value to return if the variable is not set.
+
+    Returns:
+        bool: True if the variable is set to '1', 'true', 'yes' or 'on'.
+    """
+
+    value_str = os.getenv(name)
+    if value_str in (None, ""):
+        return default
+
+    return value_str.strip().lower() in TRUE_VALUES
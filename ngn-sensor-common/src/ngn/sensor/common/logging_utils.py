@@ -0,0 +1,155 @@
+import atexit
+import logging
+from logging import config
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+import constants as cnt
+from env_config import get_bool_env, get_float_env, get_int_env
+
+log = logging.getLogger(__name__)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(
+        self, every: int = 1, per_second: float = 0, max_level: int = logging.DEBUG
+    ):
+        """Samples the log records of each call site, so that per-message logs
+        don't flood the output: 1 record in 'every', and at most 'per_second'
+        records per second. Records above 'max_level' always pass.
+
+        Args:
+            every (int): keep 1 record in 'every' per call site. 1 keeps all of them.
+            per_second (float): maximum records per second per call site. 0 is unlimited.
+            max_level (int): the highest level sampled.
+        """
+
+        super().__init__()
+        self.every = max(1, every)
+        self.per_second = per_second
+        self.max_level = max_level
+        # Records seen, available tokens and last refill time of each call site
+        self._call_sites: Dict[Tuple[str, int], list] = {}
+        self._lock = Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether the filter drops any record."""
+
+        return self.every > 1 or self.per_second > 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+
+        now = monotonic()
+        call_site = (record.pathname, record.lineno)
+
+        with self._lock:
+            state = self._call_sites.get(call_site)
+            if state is None:
+                state = self._call_sites[call_site] = [0, self.per_second, now]
+
+            state[0] += 1
+            if (state[0] - 1) % self.every:
+                return False
+
+            if self.per_second:
+                # Token bucket refilled at 'per_second' tokens per second
+                state[1] = min(
+                    self.per_second, state[1] + (now - state[2]) * self.per_second
+                )
+                state[2] = now
+                if state[1] < 1:
+                    return False
+                state[1] -= 1
+
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records when the queue is full instead of blocking
+    the caller. The message is formatted in the caller thread, as its arguments
+    may change before the listener thread handles it, but the output is left to
+    the listener thread."""
+
+    def __init__(self, queue: Queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks can't wait for the listener, format them in the caller thread
+        if record.exc_info:
+            return super().prepare(record)
+
+        # Arguments are often live dicts and lists, later changed by the caller
+        record.msg = record.getMessage()
+        record.args = None
+
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+def _stop_queue_listener(queue_listener: QueueListener):
+    """Flushes the queued records at exit, unless the listener is already stopped."""
+
+    if getattr(queue_listener, "_thread", None) is not None:
+        queue_listener.stop()
+
+
+def configure_logging(
+    logging_configuration: dict = None,
+) -> Optional[QueueListener]:
+    """Configures logging from a dictConfig configuration.
+    With 'LOGGING_ASYNC', the configured handlers run on a background thread
+    fed by a bounded queue, so that slow output never blocks the hot paths.
+    'LOG_SAMPLE_EVERY' and 'LOG_SAMPLE_PER_SECOND' sample the DEBUG records
+    of each call site.
+
+    Args:
+        logging_configuration (dict): the configuration, LOGGING_CONFIGURATION by default.
+
+    Returns:
+        Optional[QueueListener]: the listener running the handlers, None if synchronous.
+    """
+
+    config.dictConfig(logging_configuration or cnt.LOGGING_CONFIGURATION)
+    root_logger = logging.getLogger()
+    handlers = list(root_logger.handlers)
+
+    sampling_filter = SamplingFilter(
+        every=get_int_env("LOG_SAMPLE_EVERY", 1),
+        per_second=get_float_env("LOG_SAMPLE_PER_SECOND", 0),
+    )
+
+    if not get_bool_env("LOGGING_ASYNC"):
+        if sampling_filter.active:
+            for handler in handlers:
+                handler.addFilter(sampling_filter)
+        return None
+
+    # Records are sampled before being queued, in the caller thread
+    queue_handler = DroppingQueueHandler(Queue(maxsize=cnt.LOG_QUEUE_SIZE))
+    if sampling_filter.active:
+        queue_handler.addFilter(sampling_filter)
+
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+
+    queue_listener = QueueListener(
+        queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    queue_listener.start()
+    atexit.register(_stop_queue_listener, queue_listener)
+
+    log.info("Asynchronous logging enabled")
+    return queue_listener
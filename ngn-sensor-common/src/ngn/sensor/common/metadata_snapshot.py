@@ -0,0 +1,185 @@
+import json
+import logging
+import mmap
+import os
+import struct
+from hashlib import blake2b
+from threading import Lock
+from typing import Iterable, Optional, Tuple
+
+import constants as cnt
+
+log = logging.getLogger(__name__)
+
+# Header: magic, version, creation time and number of sensors
+_MAGIC = b"NGNSNAP1"
+_HEADER = struct.Struct("<8sQdI")
+# Index entry: hash of the sensor key, offset and length of its metadata
+_ENTRY = struct.Struct("<QII")
+
+
+def _key_hash(sensor_key: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(
+        blake2b(sensor_key.encode(), digest_size=8).digest(), "little"
+    )
+
+
+def write_metadata_snapshot(
+    path: str, sensor_infos: Iterable[dict], created_at: float
+) -> int:
+    """Writes an immutable snapshot of the sensor metadata: a header, an index
+    of the sensor keys sorted by hash and the metadata of each sensor as JSON.
+    The snapshot replaces the previous one atomically, so that readers only
+    ever map complete snapshots.
+
+    Args:
+        path (str): the path of the snapshot file.
+        sensor_infos (Iterable[dict]): the metadata of the sensors, with their key.
+        created_at (float): the time the metadata was read at, its version.
+
+    Returns:
+        int: the number of sensors in the snapshot.
+    """
+
+    records = sorted(
+        (_key_hash(sensor_info[cnt.SENSOR_KEY]), json.dumps(sensor_info).encode())
+        for sensor_info in sensor_infos
+    )
+
+    index = bytearray()
+    offset = _HEADER.size + _ENTRY.size * len(records)
+    for key_hash, record in records:
+        index += _ENTRY.pack(key_hash, offset, len(record))
+        offset += len(record)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(
+            _HEADER.pack(_MAGIC, int(created_at * 1000), created_at, len(records))
+        )
+        snapshot_file.write(index)
+        for _, record in records:
+            snapshot_file.write(record)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary_path, path)
+
+    return len(records)
+
+
+class MetadataSnapshot:
+    def __init__(self, path: str):
+        """Reads the sensor metadata from the latest snapshot written by the Sensor
+        Cache on the same host. The snapshot is memory-mapped, so that a lookup is
+        a binary search on the index and the decoding of a single record, without
+        a round trip to Redis. A new snapshot is mapped on reload, replacing the
+        previous one for the lookups that follow.
+
+        Args:
+            path (str): the path of the snapshot file.
+        """
+
+        self.path = path
+        # Mapping, version, creation time and size of the current snapshot
+        self._snapshot: Optional[Tuple[mmap.mmap, int, float, int]] = None
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        snapshot = self._snapshot
+        return snapshot[3] if snapshot else 0
+
+    @property
+    def version(self) -> int:
+        """The version of the current snapshot, 0 if none is mapped."""
+
+        snapshot = self._snapshot
+        return snapshot[1] if snapshot else 0
+
+    @property
+    def created_at(self) -> float:
+        """The time the metadata of the current snapshot was read at."""
+
+        snapshot = self._snapshot
+        return snapshot[2] if snapshot else 0.0
+
+    def reload(self) -> bool:
+        """Maps the snapshot file if it has been replaced since the last reload.
+        The previous mapping is closed once the lookups using it are done.
+
+        Returns:
+            bool: whether a new snapshot has been mapped.
+        """
+
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return False
+
+            file_id = (stat.st_ino, stat.st_mtime_ns)
+            if file_id == self._file_id:
+                return False
+
+            try:
+                with open(self.path, "rb") as snapshot_file:
+                    mapping = mmap.mmap(
+                        snapshot_file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                magic, version, created_at, size = _HEADER.unpack_from(mapping)
+                if magic != _MAGIC:
+                    raise ValueError(f"bad magic {magic!r}")
+            except (OSError, ValueError, struct.error) as e:
+                log.error("Failed to map metadata snapshot %s: %s", self.path, e)
+                return False
+
+            self._file_id = file_id
+            self._snapshot = (mapping, version, created_at, size)
+
+        log.debug("Mapped metadata snapshot %d of %d sensors", version, size)
+        return True
+
+    def get(self, sensor_key: str) -> Optional[dict]:
+        """Looks up the metadata of a sensor.
+
+        Args:
+            sensor_key (str): the sensor key.
+
+        Returns:
+            Optional[dict]: the sensor metadata, None if the sensor is not in the snapshot.
+        """
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+
+        mapping, _, _, size = snapshot
+        key_hash = _key_hash(sensor_key)
+
+        # Leftmost index entry with the hash of the key
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            entry_hash, _, _ = _ENTRY.unpack_from(
+                mapping, _HEADER.size + middle * _ENTRY.size
+            )
+            if entry_hash < key_hash:
+                low = middle + 1
+            else:
+                high = middle
+
+        # Colliding hashes are told apart by the key in the record
+        for position in range(low, size):
+            entry_hash, offset, length = _ENTRY.unpack_from(
+                mapping, _HEADER.size + position * _ENTRY.size
+            )
+            if entry_hash != key_hash:
+                break
+
+            sensor_info = json.loads(mapping[offset : offset + length])
+            if sensor_info.get(cnt.SENSOR_KEY) == sensor_key:
+                return sensor_info
+
+        return None
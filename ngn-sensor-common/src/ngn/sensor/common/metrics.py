@@ -0,0 +1,74 @@
+import logging
+from threading import Lock
+from typing import Dict, Union
+
+log = logging.getLogger(__name__)
+
+Number = Union[int, float]
+
+
+class MetricsRegistry:
+    def __init__(self, service_name: str):
+        """Thread-safe registry of the counters and gauges of a service.
+
+        Args:
+            service_name (str): the service name, used to namespace the metrics.
+        """
+
+        self.service_name = service_name
+        self._counters: Dict[str, Number] = {}
+        self._gauges: Dict[str, Number] = {}
+        self._lock = Lock()
+
+    @property
+    def redis_key(self) -> str:
+        """The Redis hash where the metrics of the service are reported."""
+
+        return f"metrics:{self.service_name}"
+
+    def increment(self, name: str, value: Number = 1):
+        """Increments a counter.
+
+        Args:
+            name (str): the counter name.
+            value (Number): the increment.
+        """
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: Number):
+        """Sets the current value of a gauge.
+
+        Args:
+            name (str): the gauge name.
+            value (Number): the gauge value.
+        """
+
+        with self._lock:
+            self._gauges[name] = value
+
+    def snapshot(self) -> Dict[str, Number]:
+        """Returns the current value of all counters and gauges."""
+
+        with self._lock:
+            return {**self._counters, **self._gauges}
+
+    def report(self, redis_connector=None):
+        """Logs the current metrics and optionally stores them in a Redis hash.
+
+        Args:
+            redis_connector (RedisConnector): the connector used to store the metrics.
+        """
+
+        metrics = self.snapshot()
+        if not metrics:
+            return
+
+        log.info(
+            "Metrics: %s",
+            ", ".join(f"{name}={value}" for name, value in sorted(metrics.items())),
+        )
+
+        if redis_connector is not None:
+            redis_connector.store_hash(self.redis_key, metrics)
@@ -1,25 +1,79 @@
 import json
 import logging
-
+import os
+import random
+import uuid
+from concurrent.futures import Future
+from functools import partial
+from threading import Lock, Thread
+from time import monotonic, sleep, time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import constants as cnt
+from env_config import get_int_env
 from redis import ConnectionPool, Redis, exceptions
+from sensor_index import index_keys
+from sensor_types import SensorMetadata
 
 log = logging.getLogger(__name__)
 
+# Extends a lease only if it's still held by the caller
+RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# Extends a lease held by the caller, or acquires it if nobody holds it
+CLAIM_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+# Deletes a lease only if it's still held by the caller
+RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 
 class RedisConnector:
-    def __init__(self, host: str = "redis", port: int = 6379, db_index: int = 0):
+    def __init__(self, host: str = None, port: int = None, db_index: int = 0):
         """Initialises the RedisConnector and establishes a connection to the Redis server.
 
         Args:
-            host (str): The hostname or IP address of the Redis server.
-            port (int): The port number of the Redis server.
+            host (str): The hostname or IP address of the Redis server,
+                'REDIS_HOST' or 'redis' by default.
+            port (int): The port number of the Redis server, 'REDIS_PORT' or 6379 by default.
             db_index (int): The Redis database index to use.
         """
 
-        self._connection_pool = ConnectionPool(host=host, port=port, db=db_index)
-        self._redis_client = Redis(
-            connection_pool=self._connection_pool, decode_responses=True
+        host = host or os.getenv("REDIS_HOST") or "redis"
+        port = port or get_int_env("REDIS_PORT", 6379)
+
+        # Responses are decoded by the pool's connections
+        self._connection_pool = ConnectionPool(
+            host=host, port=port, db=db_index, decode_responses=True
+        )
+        self._redis_client = Redis(connection_pool=self._connection_pool)
+        self._renew_lease_script = self._redis_client.register_script(
+            RENEW_LEASE_SCRIPT
+        )
+        self._release_lease_script = self._redis_client.register_script(
+            RELEASE_LEASE_SCRIPT
+        )
+        self._claim_lease_script = self._redis_client.register_script(
+            CLAIM_LEASE_SCRIPT
         )
+        # Loads in progress in this process, by read-through key
+        self._flights: Dict[str, Future] = {}
+        self._flights_lock = Lock()
         self._connect()
 
     def _connect(self):
@@ -94,6 +148,142 @@ class RedisConnector:
 
         return value
 
+    def store_sensor_metadata(
+        self,
+        sensor_metadata: SensorMetadata,
+        ex: int = None,
+        previous: SensorMetadata = None,
+    ) -> bool:
+        """Stores the metadata of a sensor under its sensor key,
+        keeping the secondary indexes in sync in the same round trip.
+
+        Args:
+            sensor_metadata (SensorMetadata): the sensor metadata to store.
+            ex (int): Expiration time in seconds.
+            previous (SensorMetadata): the metadata being replaced, if any.
+
+        Returns:
+            bool: whether or not the store operation was successful.
+        """
+
+        sensor_key = sensor_metadata.sensor_key
+        sensor_index_keys = index_keys(sensor_metadata)
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.set(
+                name=sensor_key, value=json.dumps(sensor_metadata.to_dict()), ex=ex
+            )
+            if previous is not None:
+                for stale_index_key in set(index_keys(previous)).difference(
+                    sensor_index_keys
+                ):
+                    pipeline.srem(stale_index_key, sensor_key)
+            for sensor_index_key in sensor_index_keys:
+                pipeline.sadd(sensor_index_key, sensor_key)
+            pipeline.sadd(cnt.KNOWN_SENSOR_KEYS, sensor_key)
+            pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error publishing data to Redis: %s", e)
+            return False
+
+        log.debug("Sensor metadata %s stored correctly in Redis", sensor_key)
+        return True
+
+    def refresh_sensor_metadata(self, sensors_metadata: List[SensorMetadata], ex: int):
+        """Refreshes the expiration time of unchanged sensors in a single round trip,
+        adding them to the secondary indexes and the set of known sensors,
+        in case they were stored before these existed or they were lost.
+
+        Args:
+            sensors_metadata (List[SensorMetadata]): the metadata of the sensors.
+            ex (int): Expiration time in seconds.
+        """
+
+        if not sensors_metadata:
+            return
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            for sensor_metadata in sensors_metadata:
+                sensor_key = sensor_metadata.sensor_key
+                pipeline.expire(sensor_key, ex)
+                for sensor_index_key in index_keys(sensor_metadata):
+                    pipeline.sadd(sensor_index_key, sensor_key)
+            pipeline.sadd(
+                cnt.KNOWN_SENSOR_KEYS,
+                *(sensor_metadata.sensor_key for sensor_metadata in sensors_metadata),
+            )
+            pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error refreshing sensor metadata in Redis: %s", e)
+
+    def delete_sensor_metadata(self, sensor_metadata: SensorMetadata):
+        """Deletes the metadata of a sensor and removes it from the secondary indexes.
+
+        Args:
+            sensor_metadata (SensorMetadata): the metadata of the sensor to delete.
+        """
+
+        sensor_key = sensor_metadata.sensor_key
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.delete(sensor_key)
+            for sensor_index_key in index_keys(sensor_metadata):
+                pipeline.srem(sensor_index_key, sensor_key)
+            pipeline.srem(cnt.KNOWN_SENSOR_KEYS, sensor_key)
+            pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error deleting data from Redis: %s", e)
+        else:
+            log.debug("Sensor metadata %s deleted successfully", sensor_key)
+
+    def get_sensor_metadata(self, key: str) -> Optional[SensorMetadata]:
+        """Retrieves the metadata of a sensor.
+
+        Args:
+            key (str): The sensor key.
+
+        Returns:
+            The sensor metadata, or None if the sensor is not in cache.
+        """
+
+        sensor_info = self.get(key)
+        if not sensor_info:
+            return None
+
+        return SensorMetadata.from_dict(sensor_info)
+
+    def get_many(self, keys: List[str]) -> List[Optional[dict]]:
+        """
+        Retrieves the values of several keys in a single round trip.
+
+        Args:
+            keys (List[str]): The keys to retrieve.
+
+        Returns:
+            The values associated with the keys, None for the missing ones.
+        """
+
+        values = [None] * len(keys)
+
+        try:
+            json_values = self._redis_client.mget(keys)
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error consuming data from Redis: %s", e)
+            return values
+
+        for position, json_data in enumerate(json_values):
+            if not json_data:
+                continue
+            try:
+                values[position] = json.loads(json_data)
+            except (TypeError, ValueError) as e:
+                log.error("Error deserialising '%s': %s", json_data, e)
+
+        return values
+
     def delete(self, key: str):
         """
         Deletes a key.
@@ -109,6 +299,216 @@ class RedisConnector:
         else:
             log.debug("Data with key %s deleted successfully", key)
 
+    def push(self, key: str, *values) -> bool:
+        """Pushes values to the head of a list.
+
+        Args:
+            key (str): The list key.
+            values (any): The values to push.
+
+        Returns:
+            bool: whether or not the push operation was successful.
+        """
+
+        try:
+            self._redis_client.lpush(key, *(json.dumps(value) for value in values))
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error pushing data to Redis list %s: %s", key, e)
+        except TypeError as e:
+            log.error("Error serialising '%s': %s", values, e)
+        else:
+            return True
+
+        return False
+
+    def pop_many(self, key: str, count: int, timeout: int = 0) -> List:
+        """Pops up to 'count' values from the tail of a list,
+        waiting up to 'timeout' seconds for the first one.
+
+        Args:
+            key (str): The list key.
+            count (int): The maximum number of values to pop.
+            timeout (int): Seconds to wait for a value. 0 waits forever.
+
+        Returns:
+            List: the popped values, in the order they were pushed.
+        """
+
+        values = []
+
+        try:
+            popped = self._redis_client.brpop(key, timeout=timeout)
+            if popped:
+                values.append(popped[1])
+                if count > 1:
+                    values.extend(self._redis_client.rpop(key, count - 1) or [])
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error popping data from Redis list %s: %s", key, e)
+
+        decoded_values = []
+        for value in values:
+            try:
+                decoded_values.append(json.loads(value))
+            except (TypeError, ValueError) as e:
+                log.error("Error deserialising '%s': %s", value, e)
+
+        return decoded_values
+
+    def publish(self, channel: str, message) -> bool:
+        """Publishes a message to a channel.
+
+        Args:
+            channel (str): The channel name.
+            message (any): The message to publish.
+
+        Returns:
+            bool: whether or not the publish operation was successful.
+        """
+
+        try:
+            self._redis_client.publish(channel, json.dumps(message))
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error publishing message to Redis channel %s: %s", channel, e)
+        except TypeError as e:
+            log.error("Error serialising '%s': %s", message, e)
+        else:
+            return True
+
+        return False
+
+    def listen(self, channel: str) -> Iterator:
+        """Subscribes to a channel and yields the messages published to it.
+        Connection errors are raised to the caller, which is expected to listen again.
+
+        Args:
+            channel (str): The channel name.
+
+        Yields:
+            The messages published to the channel.
+        """
+
+        pubsub = self._redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        log.info("Subscribed to Redis channel %s", channel)
+
+        try:
+            for message in pubsub.listen():
+                try:
+                    yield json.loads(message["data"])
+                except (TypeError, ValueError) as e:
+                    log.error("Error deserialising '%s': %s", message, e)
+        finally:
+            pubsub.close()
+
+    def members(self, key: str) -> Set[str]:
+        """
+        Returns the members of a set.
+
+        Args:
+            key (str): The set key.
+
+        Returns:
+            Set[str]: the members of the set.
+        """
+
+        try:
+            return self._redis_client.smembers(key)
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error reading set %s from Redis: %s", key, e)
+
+        return set()
+
+    def intersect(self, keys: List[str]) -> Set[str]:
+        """
+        Returns the members of the intersection of several sets.
+
+        Args:
+            keys (List[str]): The set keys.
+
+        Returns:
+            Set[str]: the members common to all the sets.
+        """
+
+        try:
+            return self._redis_client.sinter(keys)
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error intersecting sets %s in Redis: %s", keys, e)
+
+        return set()
+
+    def add_to_set(self, key: str, members: List[str]):
+        """
+        Adds members to a set.
+
+        Args:
+            key (str): The set key.
+            members (List[str]): The members to add.
+        """
+
+        if not members:
+            return
+
+        try:
+            self._redis_client.sadd(key, *members)
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error adding members to set in Redis: %s", e)
+
+    def remove_from_sets(self, keys: List[str], members: List[str]):
+        """
+        Removes members from several sets in a single round trip.
+
+        Args:
+            keys (List[str]): The set keys.
+            members (List[str]): The members to remove.
+        """
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.srem(key, *members)
+            pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error removing members from sets in Redis: %s", e)
+
+    def scan_keys(self, pattern: str) -> List[str]:
+        """
+        Returns the keys matching a pattern, without blocking the server.
+
+        Args:
+            pattern (str): The glob-style pattern of the keys.
+
+        Returns:
+            List[str]: the matching keys.
+        """
+
+        try:
+            return list(self._redis_client.scan_iter(match=pattern, count=1000))
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error scanning keys in Redis: %s", e)
+
+        return []
+
+    def exists_many(self, keys: List[str]) -> List[bool]:
+        """
+        Checks if several keys exist in a single round trip.
+
+        Args:
+            keys (List[str]): The keys to check.
+
+        Returns:
+            List[bool]: whether each key exists. Keys are assumed to exist on errors.
+        """
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.exists(key)
+            return [bool(exists) for exists in pipeline.execute()]
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error checking keys in Redis: %s", e)
+
+        return [True] * len(keys)
+
     def exists(self, key):
         """
         Checks if a key exists.
@@ -133,6 +533,449 @@ class RedisConnector:
 
         self._redis_client.expire(key, timeout)
 
+    def expire_many(self, keys: Iterable[str], timeout: int):
+        """
+        Sets the same expiration time for several keys in a single round trip.
+
+        Args:
+            keys (Iterable[str]): The keys to set the expiration time for.
+            timeout (int): Expiration time in seconds.
+        """
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.expire(key, timeout)
+            pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error refreshing expiration time in Redis: %s", e)
+
+    def count_keys(self, pattern: str) -> Optional[int]:
+        """
+        Counts the keys matching a pattern, without blocking the server.
+
+        Args:
+            pattern (str): The glob-style pattern of the keys.
+
+        Returns:
+            The number of matching keys, or None if they couldn't be counted.
+        """
+
+        try:
+            return sum(
+                1 for _ in self._redis_client.scan_iter(match=pattern, count=1000)
+            )
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error counting keys in Redis: %s", e)
+
+        return None
+
+    def store_hash(self, key: str, mapping: Dict[str, object]) -> bool:
+        """
+        Sets several fields of a hash.
+
+        Args:
+            key (str): The hash key.
+            mapping (Dict[str, object]): The fields and values to set.
+
+        Returns:
+            bool: whether or not the store operation was successful.
+        """
+
+        try:
+            self._redis_client.hset(key, mapping=mapping)
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error storing hash %s in Redis: %s", key, e)
+        else:
+            return True
+
+        return False
+
+    def store_hashes(self, mappings: Dict[str, Dict[str, object]]) -> bool:
+        """
+        Sets fields of several hashes in a single round trip.
+
+        Args:
+            mappings (Dict[str, Dict[str, object]]): The fields and values to set,
+                by hash key.
+
+        Returns:
+            bool: whether or not the store operation was successful.
+        """
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            for key, mapping in mappings.items():
+                pipeline.hset(key, mapping=mapping)
+            pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error storing hashes in Redis: %s", e)
+        else:
+            return True
+
+        return False
+
+    def get_hash(self, key: str) -> Dict[str, str]:
+        """
+        Retrieves all the fields of a hash.
+
+        Args:
+            key (str): The hash key.
+
+        Returns:
+            Dict[str, str]: the fields and values of the hash, empty if it doesn't exist.
+        """
+
+        try:
+            return self._redis_client.hgetall(key)
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error reading hash %s from Redis: %s", key, e)
+
+        return {}
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Acquires a lease, unless another owner holds it.
+
+        Args:
+            key (str): The lease key.
+            owner (str): The identifier of the owner.
+            ttl (float): Seconds after which the lease expires unless renewed.
+
+        Returns:
+            bool: whether the lease has been acquired.
+        """
+
+        try:
+            return bool(self._redis_client.set(key, owner, nx=True, px=int(ttl * 1000)))
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error acquiring lease %s in Redis: %s", key, e)
+
+        return False
+
+    def renew_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Extends a lease, if still held by the owner.
+
+        Args:
+            key (str): The lease key.
+            owner (str): The identifier of the owner.
+            ttl (float): Seconds after which the lease expires unless renewed again.
+
+        Returns:
+            bool: whether the lease is still held.
+        """
+
+        try:
+            return bool(
+                self._renew_lease_script(keys=[key], args=[owner, int(ttl * 1000)])
+            )
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error renewing lease %s in Redis: %s", key, e)
+
+        return False
+
+    def release_lease(self, key: str, owner: str) -> bool:
+        """
+        Releases a lease, if still held by the owner.
+
+        Args:
+            key (str): The lease key.
+            owner (str): The identifier of the owner.
+
+        Returns:
+            bool: whether the lease has been released.
+        """
+
+        try:
+            return bool(self._release_lease_script(keys=[key], args=[owner]))
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error releasing lease %s in Redis: %s", key, e)
+
+        return False
+
+    def claim_leases(self, keys: List[str], owner: str, ttl: float) -> List[bool]:
+        """
+        Renews or acquires several leases in a single round trip.
+
+        Args:
+            keys (List[str]): The lease keys.
+            owner (str): The identifier of the owner.
+            ttl (float): Seconds after which the leases expire unless renewed.
+
+        Returns:
+            List[bool]: whether each lease is held by the owner.
+        """
+
+        if not keys:
+            return []
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            for key in keys:
+                self._claim_lease_script(
+                    keys=[key], args=[owner, int(ttl * 1000)], client=pipeline
+                )
+            return [bool(claimed) for claimed in pipeline.execute()]
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error claiming leases in Redis: %s", e)
+
+        return [False] * len(keys)
+
+    def release_leases(self, keys: List[str], owner: str):
+        """
+        Releases several leases still held by the owner in a single round trip.
+
+        Args:
+            keys (List[str]): The lease keys.
+            owner (str): The identifier of the owner.
+        """
+
+        if not keys:
+            return
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            for key in keys:
+                self._release_lease_script(keys=[key], args=[owner], client=pipeline)
+            pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error releasing leases in Redis: %s", e)
+
+    def heartbeat(self, key: str, member: str, ttl: float) -> Optional[List[str]]:
+        """
+        Records the heartbeat of a member in a sorted set scored by time, and removes
+        the members without a heartbeat for 'ttl' seconds, in a single round trip.
+
+        Args:
+            key (str): The sorted set key.
+            member (str): The identifier of the member.
+            ttl (float): Seconds after which a silent member is removed.
+
+        Returns:
+            The live members, or None if they couldn't be read.
+        """
+
+        now = time()
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.zadd(key, {member: now})
+            pipeline.zremrangebyscore(key, "-inf", now - ttl)
+            pipeline.zrange(key, 0, -1)
+            # The set of a cluster whose members are all gone expires too
+            pipeline.pexpire(key, int(ttl * 2000))
+            return pipeline.execute()[2]
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error recording heartbeat in %s in Redis: %s", key, e)
+
+        return None
+
+    def _cached_value(self, key: str) -> Tuple[bool, object, Optional[int]]:
+        """
+        Retrieves a value stored by 'read_through' with its remaining time to live.
+
+        Args:
+            key (str): The key to retrieve.
+
+        Returns:
+            Tuple[bool, object, Optional[int]]: whether the key is cached, its value,
+                which may be None, and its remaining time to live in milliseconds.
+        """
+
+        try:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.get(key)
+            pipeline.pttl(key)
+            json_data, pttl = pipeline.execute()
+        except (exceptions.ConnectionError, exceptions.RedisError) as e:
+            log.error("Error consuming data from Redis: %s", e)
+            return False, None, None
+
+        if json_data is None:
+            return False, None, None
+
+        try:
+            return True, json.loads(json_data)[cnt.READ_THROUGH_VALUE], pttl
+        except (TypeError, ValueError, KeyError) as e:
+            log.error("Error deserialising '%s': %s", json_data, e)
+
+        return False, None, None
+
+    @staticmethod
+    def _is_stale(pttl: Optional[int], stale_ttl: float) -> bool:
+        """Whether a cached value is within its stale period, at the end of its TTL."""
+
+        return bool(stale_ttl) and pttl is not None and 0 <= pttl < stale_ttl * 1000
+
+    def _load(
+        self,
+        key: str,
+        loader: Callable[[], object],
+        ttl: float,
+        jitter: float,
+        stale_ttl: float,
+        lock_timeout: float,
+        wait: bool = True,
+    ):
+        """
+        Loads a value and caches it, once across all the processes sharing the cache:
+        the process holding the loading lease loads it, the others wait for its value.
+
+        Args:
+            key (str): The cache key.
+            loader (Callable[[], object]): Returns the value, JSON serialisable.
+            ttl (float): Seconds the value is fresh, before jitter.
+            jitter (float): Fraction of the TTL randomly added to it.
+            stale_ttl (float): Seconds the value is served stale after its TTL.
+            lock_timeout (float): Maximum seconds a load can hold the lease,
+                and others wait for it.
+            wait (bool): Whether to wait for the value loaded by another process,
+                unless a value is already cached, e.g. while it's refreshed.
+
+        Returns:
+            The value.
+        """
+
+        lock_key = f"{key}:{cnt.READ_THROUGH_LOCK_SUFFIX}"
+        owner = uuid.uuid4().hex
+        locked = self.acquire_lease(lock_key, owner, lock_timeout)
+
+        if not locked:
+            if not wait:
+                cached, value, _ = self._cached_value(key)
+                if cached:
+                    return value
+
+            deadline = monotonic() + lock_timeout
+            while monotonic() < deadline:
+                sleep(cnt.READ_THROUGH_POLL_INTERVAL)
+                cached, value, _ = self._cached_value(key)
+                if cached:
+                    return value
+            log.warning("Timed out waiting for %s to be loaded. Loading it", key)
+
+        try:
+            # The value may have been loaded while acquiring the lease
+            cached, value, pttl = self._cached_value(key)
+            if cached and not self._is_stale(pttl, stale_ttl):
+                return value
+
+            value = loader()
+            expiry = ttl * (1 + random.uniform(0, jitter)) + stale_ttl
+            try:
+                self._redis_client.set(
+                    key,
+                    json.dumps({cnt.READ_THROUGH_VALUE: value}),
+                    px=max(1, int(expiry * 1000)),
+                )
+            except (exceptions.ConnectionError, exceptions.RedisError) as e:
+                log.error("Error publishing data to Redis: %s", e)
+            except TypeError as e:
+                log.error("Error serialising '%s': %s", value, e)
+
+            return value
+        finally:
+            if locked:
+                self.release_lease(lock_key, owner)
+
+    def _single_flight(self, key: str, load: Callable[[], object]):
+        """
+        Runs a load once per key in this process: concurrent callers wait
+        for the load already in progress and share its value or exception.
+
+        Args:
+            key (str): The cache key.
+            load (Callable[[], object]): Loads the value.
+
+        Returns:
+            The value.
+        """
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leading = flight is None
+            if leading:
+                flight = self._flights[key] = Future()
+
+        if not leading:
+            return flight.result()
+
+        try:
+            value = load()
+        except Exception as ex:
+            flight.set_exception(ex)
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+
+    def _refresh(self, key: str, load: Callable[[], object]):
+        """
+        Reloads a stale value in the background.
+
+        Args:
+            key (str): The cache key.
+            load (Callable[[], object]): Loads the value.
+        """
+
+        try:
+            self._single_flight(key, load)
+        except Exception as ex:
+            log.error("Error refreshing %s: %s", key, ex)
+
+    def read_through(
+        self,
+        key: str,
+        loader: Callable[[], object],
+        ttl: float,
+        jitter: float = cnt.READ_THROUGH_TTL_JITTER,
+        stale_ttl: float = 0,
+        lock_timeout: float = cnt.READ_THROUGH_LOCK_TIMEOUT,
+    ):
+        """
+        Returns the cached value of a key, loading and caching it on a miss.
+        Concurrent misses of the same key load it once: within this process, and
+        across processes through a lease. TTLs get a random jitter, so that values
+        loaded together don't expire together.
+        With a stale TTL, values are kept that much longer and served stale while
+        a single background load refreshes them.
+
+        Args:
+            key (str): The cache key.
+            loader (Callable[[], object]): Returns the value, JSON serialisable.
+                None is cached too.
+            ttl (float): Seconds the value is fresh, before jitter.
+            jitter (float): Fraction of the TTL randomly added to it.
+            stale_ttl (float): Seconds the value is served stale after its TTL.
+            lock_timeout (float): Maximum seconds a load can hold the lease,
+                and others wait for it.
+
+        Returns:
+            The value.
+        """
+
+        load = partial(self._load, key, loader, ttl, jitter, stale_ttl, lock_timeout)
+
+        cached, value, pttl = self._cached_value(key)
+        if not cached:
+            return self._single_flight(key, load)
+
+        if self._is_stale(pttl, stale_ttl):
+            with self._flights_lock:
+                refreshing = key in self._flights
+            if not refreshing:
+                Thread(
+                    target=self._refresh,
+                    args=(key, partial(load, wait=False)),
+                    daemon=True,
+                ).start()
+
+        return value
+
     def close(self):
         """
         Closes the connection to the Redis server.
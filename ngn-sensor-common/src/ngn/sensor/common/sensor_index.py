@@ -0,0 +1,160 @@
+import logging
+from typing import List
+
+import constants as cnt
+from sensor_types import SensorMetadata
+
+log = logging.getLogger(__name__)
+
+# Sensor metadata fields with a Redis set index
+INDEXED_FIELDS = (
+    cnt.BUILDING_NAME,
+    cnt.FLOOR_NAME,
+    cnt.ROOM_NAME,
+    cnt.SERVICE_TYPE,
+    cnt.MEASUREMENT_TYPE,
+)
+
+
+def index_key(field: str, value: str) -> str:
+    """Returns the key of the Redis set indexing the sensors with a given field value.
+
+    Args:
+        field (str): the sensor metadata field, e.g. 'building_name'.
+        value (str): the field value, e.g. 'House 4'.
+
+    Returns:
+        str: the index key, e.g. 'sensor_index:building_name:House 4'.
+    """
+
+    return f"{cnt.SENSOR_INDEX_PREFIX}:{field}:{value}"
+
+
+def index_keys(sensor_metadata: SensorMetadata) -> List[str]:
+    """Returns the keys of the Redis sets indexing a sensor.
+    Empty fields are not indexed.
+
+    Args:
+        sensor_metadata (SensorMetadata): the sensor metadata.
+
+    Returns:
+        List[str]: the index keys.
+    """
+
+    return [
+        index_key(field, getattr(sensor_metadata, field))
+        for field in INDEXED_FIELDS
+        if getattr(sensor_metadata, field)
+    ]
+
+
+def query_sensors(
+    redis_connector,
+    building_name: str = None,
+    floor_name: str = None,
+    room_name: str = None,
+    service_type: str = None,
+    measurement_type: str = None,
+) -> List[SensorMetadata]:
+    """Returns the metadata of the sensors matching all the given filters,
+    e.g. all the 'Temp' sensors in 'House 4'.
+    It costs two round trips to Redis: one to intersect the index sets
+    and one to retrieve the metadata of the matching sensors.
+
+    Args:
+        redis_connector (RedisConnector): the connector to the sensor cache.
+        building_name (str): the building name, e.g. 'House 4'.
+        floor_name (str): the floor name, e.g. 'Floor1'.
+        room_name (str): the room name, e.g. 'Kitchen'.
+        service_type (str): the service type, e.g. 'Electric'.
+        measurement_type (str): the measurement type, e.g. 'Temp'.
+
+    Returns:
+        List[SensorMetadata]: the metadata of the matching sensors, sorted by key.
+    """
+
+    filters = {
+        cnt.BUILDING_NAME: building_name,
+        cnt.FLOOR_NAME: floor_name,
+        cnt.ROOM_NAME: room_name,
+        cnt.SERVICE_TYPE: service_type,
+        cnt.MEASUREMENT_TYPE: measurement_type,
+    }
+    queried_index_keys = [
+        index_key(field, value) for field, value in filters.items() if value
+    ]
+    if not queried_index_keys:
+        raise ValueError("At least one filter is needed to query the sensors")
+
+    sensor_keys = sorted(redis_connector.intersect(queried_index_keys))
+    if not sensor_keys:
+        return []
+
+    sensors_metadata = []
+    expired_sensor_keys = []
+    for sensor_key, sensor_info in zip(
+        sensor_keys, redis_connector.get_many(sensor_keys)
+    ):
+        if sensor_info:
+            sensors_metadata.append(SensorMetadata.from_dict(sensor_info))
+        else:
+            expired_sensor_keys.append(sensor_key)
+
+    if expired_sensor_keys:
+        # Sensors expired from the cache are removed lazily from the indexes
+        log.debug("Removing expired sensors %s from indexes", expired_sensor_keys)
+        redis_connector.remove_from_sets(queried_index_keys, expired_sensor_keys)
+
+    return sensors_metadata
+
+
+def prune_sensor_indexes(redis_connector) -> int:
+    """Removes from all the indexes the sensors expired from the cache.
+
+    Args:
+        redis_connector (RedisConnector): the connector to the sensor cache.
+
+    Returns:
+        int: the number of index entries removed.
+    """
+
+    removed_entries = 0
+
+    for sensor_index_key in redis_connector.scan_keys(f"{cnt.SENSOR_INDEX_PREFIX}:*"):
+        sensor_keys = sorted(redis_connector.members(sensor_index_key))
+        expired_sensor_keys = [
+            sensor_key
+            for sensor_key, exists in zip(
+                sensor_keys, redis_connector.exists_many(sensor_keys)
+            )
+            if not exists
+        ]
+        if expired_sensor_keys:
+            redis_connector.remove_from_sets([sensor_index_key], expired_sensor_keys)
+            removed_entries += len(expired_sensor_keys)
+
+    return removed_entries
+
+
+def prune_known_sensor_keys(redis_connector) -> List[str]:
+    """Removes from the set of known sensors the sensors expired from the cache.
+
+    Args:
+        redis_connector (RedisConnector): the connector to the sensor cache.
+
+    Returns:
+        List[str]: the keys of the sensors removed.
+    """
+
+    sensor_keys = sorted(redis_connector.members(cnt.KNOWN_SENSOR_KEYS))
+    expired_sensor_keys = [
+        sensor_key
+        for sensor_key, exists in zip(
+            sensor_keys, redis_connector.exists_many(sensor_keys)
+        )
+        if not exists
+    ]
+    if expired_sensor_keys:
+        redis_connector.remove_from_sets([cnt.KNOWN_SENSOR_KEYS], expired_sensor_keys)
+
+    return expired_sensor_keys
@@ -0,0 +1,61 @@
+import json
+import logging
+from typing import Dict
+
+import constants as cnt
+from sensor_types import Reading
+
+log = logging.getLogger(__name__)
+
+
+def state_key(building_name: str) -> str:
+    """Returns the key of the Redis hash with the latest sensor values of a building.
+
+    Args:
+        building_name (str): the building name, e.g. 'House 3'.
+
+    Returns:
+        str: the hash key, e.g. 'sensor_state:House 3'.
+    """
+
+    return f"{cnt.SENSOR_STATE_PREFIX}:{building_name}"
+
+
+def encode_state(reading: Reading) -> str:
+    """Returns the hash field value storing the latest value of a sensor.
+
+    Args:
+        reading (Reading): the latest reading of the sensor.
+
+    Returns:
+        str: the value and timestamp of the reading as a JSON array.
+    """
+
+    return json.dumps([reading.value, reading.timestamp])
+
+
+def get_building_state(redis_connector, building_name: str) -> Dict[str, Reading]:
+    """Returns the latest value of every sensor of a building in a single call.
+
+    Args:
+        redis_connector (RedisConnector): the connector to the sensor cache.
+        building_name (str): the building name, e.g. 'House 3'.
+
+    Returns:
+        Dict[str, Reading]: the latest reading of each sensor, by sensor key.
+    """
+
+    building_state = {}
+
+    for sensor_key, sensor_state in redis_connector.get_hash(
+        state_key(building_name)
+    ).items():
+        try:
+            value, timestamp = json.loads(sensor_state)
+        except (TypeError, ValueError) as e:
+            log.error("Bad state '%s' of sensor %s: %s", sensor_state, sensor_key, e)
+            continue
+
+        building_state[sensor_key] = Reading(sensor_key, value, timestamp)
+
+    return building_state
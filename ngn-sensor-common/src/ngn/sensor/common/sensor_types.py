@@ -0,0 +1,194 @@
+from sys import intern
+from time import time
+from typing import Optional
+
+import constants as cnt
+
+
+def _intern(value: Optional[str]) -> str:
+    """Interns a string so that repeated values share a single object."""
+
+    return intern(value) if value else ""
+
+
+class SensorMetadata:
+    """Metadata of a sensor, as stored in the cache.
+
+    Attribute names match the wire field names defined in 'constants'.
+    Categorical fields (building, floor, room, ...) are interned, since they
+    repeat across thousands of sensors. Instances are shared between threads
+    and caches, so they must be treated as immutable: use 'replace' instead.
+    """
+
+    __slots__ = (
+        "sensor_key",
+        "sensor_name",
+        "building_name",
+        "floor_name",
+        "room_name",
+        "service_type",
+        "object_name",
+        "measurement_type",
+        "unit_of_measure",
+        "min_value",
+        "max_value",
+    )
+
+    def __init__(
+        self,
+        sensor_key: str,
+        sensor_name: str,
+        building_name: str,
+        floor_name: str = "",
+        room_name: str = "",
+        service_type: str = "",
+        object_name: str = "",
+        measurement_type: str = "",
+        unit_of_measure: str = "",
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+    ):
+        self.sensor_key = sensor_key
+        self.sensor_name = sensor_name
+        self.building_name = _intern(building_name)
+        self.floor_name = _intern(floor_name)
+        self.room_name = _intern(room_name)
+        self.service_type = _intern(service_type)
+        self.object_name = _intern(object_name)
+        self.measurement_type = _intern(measurement_type)
+        self.unit_of_measure = _intern(unit_of_measure)
+        # Valid range of the values, None if unbounded
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SensorMetadata):
+            return NotImplemented
+
+        return all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{field}={getattr(self, field)!r}" for field in self.__slots__
+        )
+        return f"SensorMetadata({fields})"
+
+    @classmethod
+    def from_dict(cls, sensor_info: dict) -> "SensorMetadata":
+        """Builds the sensor metadata from its wire (dictionary) representation.
+
+        Args:
+            sensor_info (dict): the sensor metadata keyed by the 'constants' field names.
+
+        Returns:
+            SensorMetadata: the sensor metadata.
+        """
+
+        return cls(
+            sensor_key=sensor_info.get(cnt.SENSOR_KEY),
+            sensor_name=sensor_info.get(cnt.SENSOR_NAME),
+            building_name=sensor_info.get(cnt.BUILDING_NAME),
+            floor_name=sensor_info.get(cnt.FLOOR_NAME),
+            room_name=sensor_info.get(cnt.ROOM_NAME),
+            service_type=sensor_info.get(cnt.SERVICE_TYPE),
+            object_name=sensor_info.get(cnt.OBJECT_NAME),
+            measurement_type=sensor_info.get(cnt.MEASUREMENT_TYPE),
+            unit_of_measure=sensor_info.get(cnt.UNIT_OF_MEASURE),
+            min_value=sensor_info.get(cnt.MIN_VALUE),
+            max_value=sensor_info.get(cnt.MAX_VALUE),
+        )
+
+    def to_dict(self) -> dict:
+        """Returns the wire (dictionary) representation of the sensor metadata.
+        The range is only included if the sensor has one.
+        """
+
+        sensor_info = {
+            cnt.SENSOR_KEY: self.sensor_key,
+            cnt.SENSOR_NAME: self.sensor_name,
+            cnt.BUILDING_NAME: self.building_name,
+            cnt.ROOM_NAME: self.room_name,
+            cnt.FLOOR_NAME: self.floor_name,
+            cnt.SERVICE_TYPE: self.service_type,
+            cnt.OBJECT_NAME: self.object_name,
+            cnt.MEASUREMENT_TYPE: self.measurement_type,
+            cnt.UNIT_OF_MEASURE: self.unit_of_measure,
+        }
+        if self.min_value is not None:
+            sensor_info[cnt.MIN_VALUE] = self.min_value
+        if self.max_value is not None:
+            sensor_info[cnt.MAX_VALUE] = self.max_value
+
+        return sensor_info
+
+    def replace(self, **changes) -> "SensorMetadata":
+        """Returns a copy of the sensor metadata with the given fields replaced."""
+
+        fields = {field: getattr(self, field) for field in self.__slots__}
+        fields.update(changes)
+
+        return SensorMetadata(**fields)
+
+
+class Reading:
+    """A single sensor value received from the Gira Home Server."""
+
+    __slots__ = ("sensor_key", "value", "timestamp")
+
+    def __init__(self, sensor_key: str, value: float, timestamp: float = None):
+        self.sensor_key = sensor_key
+        self.value = value
+        self.timestamp = time() if timestamp is None else timestamp
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Reading):
+            return NotImplemented
+
+        return (self.sensor_key, self.value, self.timestamp) == (
+            other.sensor_key,
+            other.value,
+            other.timestamp,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Reading(sensor_key={self.sensor_key!r}, value={self.value!r}, "
+            f"timestamp={self.timestamp!r})"
+        )
+
+    @classmethod
+    def from_dict(cls, sensor_data: dict) -> "Reading":
+        """Builds a reading from its wire (dictionary) representation.
+
+        Args:
+            sensor_data (dict): the reading keyed by the 'constants' field names.
+
+        Returns:
+            Reading: the sensor reading.
+        """
+
+        return cls(
+            sensor_key=sensor_data.get(cnt.SENSOR_KEY),
+            value=sensor_data.get(cnt.LAST_SHARED_VALUE),
+            timestamp=sensor_data.get(cnt.LAST_SHARED_DATETIME),
+        )
+
+    def to_dict(self, sensor_metadata: SensorMetadata = None) -> dict:
+        """Returns the wire (dictionary) representation of the reading,
+        optionally enriched with the metadata of its sensor.
+
+        Args:
+            sensor_metadata (SensorMetadata): the metadata of the sensor.
+
+        Returns:
+            dict: the reading keyed by the 'constants' field names.
+        """
+
+        sensor_data = sensor_metadata.to_dict() if sensor_metadata else {}
+        sensor_data[cnt.SENSOR_KEY] = self.sensor_key
+        sensor_data[cnt.LAST_SHARED_VALUE] = self.value
+        sensor_data[cnt.LAST_SHARED_DATETIME] = self.timestamp
+
+        return sensor_data
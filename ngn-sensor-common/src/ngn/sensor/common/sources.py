@@ -0,0 +1,130 @@
+import base64
+import json
+import logging
+import os
+import re
+import sys
+from typing import List, Tuple
+
+log = logging.getLogger(__name__)
+
+# Name of the source configured with the legacy single-server variables.
+# Its sensor keys are not namespaced, e.g. 'CO@9_4_81'
+DEFAULT_SOURCE_NAME = "default"
+# Separator between the source name and the Gira sensor key, e.g. 'site_b:CO@9_4_81'
+SOURCE_KEY_SEPARATOR = ":"
+SOURCE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class Source:
+    def __init__(
+        self, name: str, ws_url: str, api_url: str, username: str, password: str
+    ):
+        """A Gira Home Server feeding the services.
+
+        Args:
+            name (str): the source name, used to namespace its sensor keys.
+            ws_url (str): the URL of the web socket streaming the sensor values.
+            api_url (str): the URL of the endpoint returning the sensor metadata.
+            username (str): the username of the source API.
+            password (str): the password of the source API.
+        """
+
+        self.name = name
+        self.ws_url = ws_url
+        self.api_url = api_url
+        self.is_default = name == DEFAULT_SOURCE_NAME
+        # Prefix of the sensor keys of the source
+        self.key_prefix = "" if self.is_default else f"{name}{SOURCE_KEY_SEPARATOR}"
+
+        credentials = f"{username}:{password}"
+        encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode(
+            "utf-8"
+        )
+        self.headers = {"Authorization": f"Basic {encoded_credentials}"}
+
+    def __repr__(self) -> str:
+        return f"Source({self.name!r})"
+
+    def sensor_key(self, gira_sensor_key: str) -> str:
+        """Returns the namespaced key of a sensor of this source.
+
+        Args:
+            gira_sensor_key (str): the sensor key on the Gira Home Server, e.g. 'CO@9_4_81'.
+
+        Returns:
+            str: the sensor key, e.g. 'site_b:CO@9_4_81'.
+        """
+
+        return self.key_prefix + gira_sensor_key
+
+
+def split_sensor_key(sensor_key: str) -> Tuple[str, str]:
+    """Splits a namespaced sensor key into its source name and Gira sensor key.
+
+    Args:
+        sensor_key (str): the sensor key, e.g. 'site_b:CO@9_4_81'.
+
+    Returns:
+        Tuple[str, str]: the source name and Gira sensor key, e.g. ('site_b', 'CO@9_4_81').
+    """
+
+    source_name, separator, gira_sensor_key = sensor_key.partition(SOURCE_KEY_SEPARATOR)
+    if not separator:
+        return DEFAULT_SOURCE_NAME, sensor_key
+
+    return source_name, gira_sensor_key
+
+
+def load_sources() -> List[Source]:
+    """Reads the Gira Home Servers to connect to.
+    'GIRA_SOURCES' is a JSON list of objects with 'name', 'ws_url', 'api_url',
+    'username' and 'password'. If it's not set, the single server configured with
+    'SOURCE_API_WS_URL', 'CONNECTOR_SOURCE_API_URL', 'SOURCE_API_USERNAME' and
+    'SOURCE_API_PASSWORD' is used as the default source.
+    The process exits if the configuration is not valid.
+
+    Returns:
+        List[Source]: the configured sources.
+    """
+
+    gira_sources = os.getenv("GIRA_SOURCES", "")
+    if not gira_sources.strip():
+        return [
+            Source(
+                DEFAULT_SOURCE_NAME,
+                ws_url=os.getenv("SOURCE_API_WS_URL"),
+                api_url=os.getenv("CONNECTOR_SOURCE_API_URL"),
+                username=os.getenv("SOURCE_API_USERNAME"),
+                password=os.getenv("SOURCE_API_PASSWORD"),
+            )
+        ]
+
+    try:
+        sources = [
+            Source(
+                source_config["name"],
+                ws_url=source_config.get("ws_url"),
+                api_url=source_config.get("api_url"),
+                username=source_config.get("username"),
+                password=source_config.get("password"),
+            )
+            for source_config in json.loads(gira_sources)
+        ]
+    except (ValueError, TypeError, KeyError) as ex:
+        log.error("Environment variable 'GIRA_SOURCES' is not valid: %s", ex)
+        sys.exit(1)
+
+    source_names = [source.name for source in sources]
+    for source_name in source_names:
+        if not (
+            isinstance(source_name, str) and SOURCE_NAME_PATTERN.match(source_name)
+        ):
+            log.error("Bad source name '%s' in 'GIRA_SOURCES'", source_name)
+            sys.exit(1)
+    if not sources or len(set(source_names)) != len(source_names):
+        log.error("'GIRA_SOURCES' must list sources with unique names")
+        sys.exit(1)
+
+    log.info("Configured sources: %s", source_names)
+    return sources
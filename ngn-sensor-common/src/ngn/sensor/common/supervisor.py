@@ -0,0 +1,242 @@
+import json
+import logging
+from threading import Thread, current_thread
+from time import monotonic, sleep, time
+from typing import Callable, Dict, List, Optional
+
+import constants as cnt
+from backoff import ExponentialBackoff
+
+log = logging.getLogger(__name__)
+
+
+class WorkerSuperseded(Exception):
+    """Raised in a stalled worker thread that has been replaced by a new one."""
+
+
+class WorkerHandle:
+    def __init__(
+        self,
+        name: str,
+        target: Callable[["WorkerHandle"], None],
+        stall_timeout: Optional[float] = None,
+        backoff: ExponentialBackoff = None,
+    ):
+        """A named worker thread owned by a Supervisor.
+        The target receives this handle and must call beat() to report progress.
+
+        Args:
+            name (str): the worker name, also used as thread name.
+            target (Callable[[WorkerHandle], None]): the worker loop.
+            stall_timeout (Optional[float]): seconds without progress after which
+                the worker is restarted. None if the worker can't stall.
+            backoff (ExponentialBackoff): the delays between consecutive restarts.
+        """
+
+        self.name = name
+        self.stall_timeout = stall_timeout
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self._target = target
+        self._backoff = backoff or ExponentialBackoff()
+        self._thread: Optional[Thread] = None
+        self._started_at = 0.0
+        self._last_progress = 0.0
+        self._last_progress_time = 0.0
+        self._restart_at: Optional[float] = None
+
+    def beat(self):
+        """Records the progress of the worker.
+        A stalled thread that has been replaced gets a WorkerSuperseded exception,
+        so that it exits instead of running alongside its replacement.
+        """
+
+        if self._thread is not current_thread():
+            raise WorkerSuperseded(self.name)
+
+        self._last_progress = monotonic()
+        self._last_progress_time = time()
+
+    def start(self):
+        """Starts a new thread running the worker."""
+
+        self._restart_at = None
+        self._started_at = self._last_progress = monotonic()
+        self._last_progress_time = time()
+        self._thread = Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._target(self)
+        except WorkerSuperseded:
+            log.info("Stalled worker '%s' replaced. Exiting", self.name)
+        except Exception as ex:
+            self.last_error = repr(ex)
+            log.exception("Worker '%s' failed: %s", self.name, ex)
+        else:
+            log.warning("Worker '%s' returned", self.name)
+
+    def is_stalled(self, now: float) -> bool:
+        return (
+            self.stall_timeout is not None
+            and now - self._last_progress > self.stall_timeout
+        )
+
+    def check(self, now: float):
+        """Schedules a restart of a stopped or stalled worker, with backoff,
+        and restarts it once the delay has passed.
+
+        Args:
+            now (float): the current monotonic time.
+        """
+
+        if self._restart_at is not None:
+            if now >= self._restart_at:
+                self.restarts += 1
+                log.info(
+                    "Restarting worker '%s' (restart n. %d)", self.name, self.restarts
+                )
+                self.start()
+            return
+
+        if not self._thread.is_alive():
+            reason = "stopped"
+        elif self.is_stalled(now):
+            reason = f"stalled for {now - self._last_progress:.0f}s"
+            self.last_error = "stalled"
+        else:
+            return
+
+        # A worker that ran fine for a while restarts without delay
+        if now - self._started_at > self._backoff.maximum:
+            self._backoff.reset()
+
+        delay = self._backoff.next_delay()
+        self._restart_at = now + delay
+        log.warning("Worker '%s' %s. Restarting in %.1fs", self.name, reason, delay)
+
+    def health(self, now: float) -> dict:
+        """Returns the liveness and last progress of the worker.
+
+        Args:
+            now (float): the current monotonic time.
+
+        Returns:
+            dict: the worker health.
+        """
+
+        return {
+            "alive": bool(
+                self._thread is not None
+                and self._thread.is_alive()
+                and self._restart_at is None
+                and not self.is_stalled(now)
+            ),
+            "last_progress": round(self._last_progress_time, 3),
+            "seconds_since_progress": round(now - self._last_progress, 1),
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
+
+
+class Supervisor:
+    def __init__(
+        self,
+        service_name: str,
+        redis_connector=None,
+        check_interval: float = 1.0,
+        health_report_interval: float = cnt.HEALTH_REPORT_INTERVAL,
+    ):
+        """Owns the worker threads of a service and restarts them with exponential
+        backoff when they fail or stall. The health of every worker is periodically
+        stored in the Redis hash 'health:<service>'.
+
+        Args:
+            service_name (str): the service name.
+            redis_connector (RedisConnector): the connector used to report the health.
+            check_interval (float): how often (in seconds) the workers are checked.
+            health_report_interval (float): how often (in seconds) the health is reported.
+        """
+
+        self.service_name = service_name
+        self._redis_connector = redis_connector
+        self._check_interval = check_interval
+        self._health_report_interval = health_report_interval
+        self._workers: List[WorkerHandle] = []
+
+    @property
+    def redis_key(self) -> str:
+        """The Redis hash where the health of the workers is reported."""
+
+        return f"health:{self.service_name}"
+
+    def add_worker(
+        self,
+        name: str,
+        target: Callable[[WorkerHandle], None],
+        stall_timeout: Optional[float] = None,
+        backoff: ExponentialBackoff = None,
+    ) -> WorkerHandle:
+        """Adds a worker, started by run().
+
+        Args:
+            name (str): the worker name.
+            target (Callable[[WorkerHandle], None]): the worker loop.
+            stall_timeout (Optional[float]): seconds without progress after which
+                the worker is restarted. None if the worker can't stall.
+            backoff (ExponentialBackoff): the delays between consecutive restarts.
+
+        Returns:
+            WorkerHandle: the worker handle.
+        """
+
+        worker = WorkerHandle(
+            name, target, stall_timeout=stall_timeout, backoff=backoff
+        )
+        self._workers.append(worker)
+
+        return worker
+
+    def health(self) -> Dict[str, dict]:
+        """Returns the health of every worker, by name."""
+
+        now = monotonic()
+        return {worker.name: worker.health(now) for worker in self._workers}
+
+    def check(self):
+        """Restarts the workers that have stopped or stalled."""
+
+        now = monotonic()
+        for worker in self._workers:
+            worker.check(now)
+
+    def _report_health(self):
+        health = self.health()
+        unhealthy_workers = [
+            name for name, status in health.items() if not status["alive"]
+        ]
+        if unhealthy_workers:
+            log.warning("Unhealthy workers: %s", unhealthy_workers)
+
+        if self._redis_connector is not None:
+            self._redis_connector.store_hash(
+                self.redis_key,
+                {name: json.dumps(status) for name, status in health.items()},
+            )
+
+    def run(self):
+        """Starts all the workers and supervises them forever."""
+
+        for worker in self._workers:
+            log.info("Starting worker '%s'...", worker.name)
+            worker.start()
+
+        next_health_report = monotonic()
+        while True:
+            sleep(self._check_interval)
+            self.check()
+
+            if monotonic() >= next_health_report:
+                self._report_health()
+                next_health_report = monotonic() + self._health_report_interval
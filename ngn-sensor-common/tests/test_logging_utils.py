@@ -0,0 +1,108 @@
+import logging
+from queue import Queue
+
+from ngn.sensor.common.logging_utils import (
+    DroppingQueueHandler,
+    SamplingFilter,
+    configure_logging,
+)
+
+
+def make_record(lineno: int, level: int = logging.DEBUG) -> logging.LogRecord:
+    return logging.LogRecord(
+        "test",
+        level,
+        "sensor_publisher.py",
+        lineno,
+        "reading %s",
+        ({"value": 1},),
+        None,
+    )
+
+
+def test_sampling_filter_every():
+    sampling_filter = SamplingFilter(every=3)
+
+    assert [sampling_filter.filter(make_record(10)) for _ in range(6)] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+    ]
+    # Call sites are sampled independently and higher levels always pass
+    assert sampling_filter.filter(make_record(20))
+    assert all(
+        sampling_filter.filter(make_record(10, logging.WARNING)) for _ in range(3)
+    )
+
+
+def test_sampling_filter_per_second(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("ngn.sensor.common.logging_utils.monotonic", lambda: now[0])
+    sampling_filter = SamplingFilter(per_second=2)
+
+    assert [sampling_filter.filter(make_record(10)) for _ in range(4)] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+
+    now[0] += 0.5
+    assert sampling_filter.filter(make_record(10))
+    assert not sampling_filter.filter(make_record(10))
+
+
+def test_dropping_queue_handler_formats_eagerly():
+    queue_handler = DroppingQueueHandler(Queue(maxsize=1))
+    live_reading = {"value": 1}
+    record = make_record(10)
+    record.args = (live_reading,)
+
+    queue_handler.handle(record)
+    queue_handler.handle(make_record(11))
+    # Arguments changed after the call don't change the queued message
+    live_reading["value"] = 2
+    live_reading["state"] = "changed"
+
+    queued_record = queue_handler.queue.get_nowait()
+    assert queued_record.getMessage() == "reading {'value': 1}"
+    assert queue_handler.dropped == 1
+
+
+def test_configure_async_logging(monkeypatch):
+    monkeypatch.setenv("LOGGING_ASYNC", "true")
+    monkeypatch.setenv("LOG_SAMPLE_EVERY", "2")
+    records = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    logging_configuration = {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {"list": {"()": ListHandler, "level": "DEBUG"}},
+        "root": {"level": "DEBUG", "handlers": ["list"]},
+    }
+    root_logger = logging.getLogger()
+    previous_handlers = root_logger.handlers[:]
+    previous_level = root_logger.level
+
+    queue_listener = configure_logging(logging_configuration)
+    try:
+        (queue_handler,) = root_logger.handlers
+        assert isinstance(queue_handler, DroppingQueueHandler)
+
+        for index in range(4):
+            logging.getLogger("test").debug("reading %d", index)
+    finally:
+        queue_listener.stop()
+        root_logger.handlers = previous_handlers
+        root_logger.setLevel(previous_level)
+
+    assert "reading 0" in records
+    assert "reading 2" in records
+    assert "reading 1" not in records
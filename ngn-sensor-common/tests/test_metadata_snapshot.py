@@ -0,0 +1,47 @@
+import os
+
+from ngn.sensor.common import metadata_snapshot
+from ngn.sensor.common.metadata_snapshot import (
+    MetadataSnapshot,
+    write_metadata_snapshot,
+)
+
+
+def test_metadata_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "metadata" / "sensor_metadata.snapshot")
+    snapshot = MetadataSnapshot(path)
+    assert not snapshot.reload()
+    assert snapshot.get("CO@9_4_81") is None
+
+    sensor_infos = [
+        {"sensor_key": f"CO@9_4_{index}", "building_name": f"House {index % 10}"}
+        for index in range(500)
+    ]
+    assert write_metadata_snapshot(path, sensor_infos, created_at=1000.5) == 500
+    assert snapshot.reload()
+    assert not snapshot.reload()
+    assert (len(snapshot), snapshot.version, snapshot.created_at) == (
+        500,
+        1000500,
+        1000.5,
+    )
+    assert all(
+        snapshot.get(sensor_info["sensor_key"]) == sensor_info
+        for sensor_info in sensor_infos
+    )
+    assert snapshot.get("CO@9_4_500") is None
+    assert os.listdir(tmp_path / "metadata") == ["sensor_metadata.snapshot"]
+
+    # A new snapshot replaces the mapped one on reload
+    write_metadata_snapshot(path, sensor_infos[:1], created_at=1001)
+    assert snapshot.get("CO@9_4_2") is not None
+    assert snapshot.reload()
+    assert snapshot.get("CO@9_4_2") is None
+    assert snapshot.get("CO@9_4_0") == sensor_infos[0]
+
+    # Colliding hashes are told apart by the key
+    monkeypatch.setattr(metadata_snapshot, "_key_hash", lambda sensor_key: 7)
+    write_metadata_snapshot(path, sensor_infos[:3], created_at=1002)
+    assert snapshot.reload()
+    assert snapshot.get("CO@9_4_1") == sensor_infos[1]
+    assert snapshot.get("CO@9_4_3") is None
@@ -0,0 +1,170 @@
+import threading
+import time
+from functools import partial
+
+from ngn.sensor.common.redis_connector import RedisConnector
+from ngn.sensor.common.sensor_types import SensorMetadata
+
+
+class FakePipeline:
+    def __init__(self, client: "FakeRedisClient"):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self._client, name)
+        return lambda *args, **kwargs: self._commands.append(
+            partial(command, *args, **kwargs)
+        )
+
+    def execute(self) -> list:
+        return [command() for command in self._commands]
+
+
+class FakeRedisClient:
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self._lock = threading.Lock()
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def get(self, name: str):
+        with self._lock:
+            value, expires_at = self.values.get(name, (None, None))
+            return value if expires_at is None or expires_at > time.time() else None
+
+    def pttl(self, key: str) -> int:
+        with self._lock:
+            _, expires_at = self.values.get(key, (None, None))
+            return -2 if expires_at is None else int((expires_at - time.time()) * 1000)
+
+    def set(
+        self, name: str, value, ex: int = None, px: int = None, nx: bool = False
+    ) -> bool:
+        if nx and self.get(name) is not None:
+            return False
+        with self._lock:
+            ttl = ex if ex is not None else px / 1000 if px is not None else None
+            self.values[name] = (value, None if ttl is None else time.time() + ttl)
+            return True
+
+    def expire(self, name: str, time_seconds: int) -> bool:
+        value = self.get(name)
+        if value is None:
+            return False
+        return self.set(name, value, ex=time_seconds)
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            return sum(self.values.pop(name, None) is not None for name in names)
+
+    def sadd(self, name: str, *values) -> int:
+        self.sets.setdefault(name, set()).update(values)
+        return len(values)
+
+    def srem(self, name: str, *values) -> int:
+        self.sets.get(name, set()).difference_update(values)
+        return len(values)
+
+    def release(self, keys: list, args: list) -> int:
+        with self._lock:
+            return int(self.values.pop(keys[0], None) is not None)
+
+
+def test_read_through_single_flight():
+    redis_connector = RedisConnector()
+    redis_connector._redis_client = FakeRedisClient()
+    redis_connector._release_lease_script = redis_connector._redis_client.release
+    loads = []
+
+    def loader() -> dict:
+        loads.append(1)
+        time.sleep(0.2)
+        return {"loads": len(loads)}
+
+    values = []
+    threads = [
+        threading.Thread(
+            target=lambda: values.append(
+                redis_connector.read_through("page", loader, ttl=10)
+            )
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert values == [{"loads": 1}] * 8
+    # Missing values are cached too
+    assert redis_connector.read_through("missing", lambda: None, ttl=10) is None
+    assert redis_connector.read_through("missing", loader, ttl=10) is None
+    assert len(loads) == 1
+
+
+def test_read_through_stale_while_revalidate():
+    redis_connector = RedisConnector()
+    redis_connector._redis_client = FakeRedisClient()
+    redis_connector._release_lease_script = redis_connector._redis_client.release
+    loads = []
+
+    def loader() -> int:
+        loads.append(1)
+        return len(loads)
+
+    assert redis_connector.read_through("page", loader, ttl=0.1, stale_ttl=10) == 1
+    time.sleep(0.15)
+
+    # The stale value is served while a background load refreshes it
+    assert redis_connector.read_through("page", loader, ttl=0.1, stale_ttl=10) == 1
+    for _ in range(100):
+        if redis_connector.read_through("page", loader, ttl=10, stale_ttl=10) == 2:
+            break
+        time.sleep(0.01)
+    assert len(loads) == 2
+
+
+def test_sensor_index_maintenance():
+    redis_connector = RedisConnector()
+    redis_client = redis_connector._redis_client = FakeRedisClient()
+    sensor_metadata = SensorMetadata(
+        sensor_key="CO@4_3_148",
+        sensor_name="House 4_Kitchen_Temp",
+        building_name="House 4",
+        room_name="Kitchen",
+        measurement_type="Temp",
+    )
+
+    assert redis_connector.store_sensor_metadata(sensor_metadata, ex=60)
+    assert redis_client.sets == {
+        "sensor_index:building_name:House 4": {"CO@4_3_148"},
+        "sensor_index:room_name:Kitchen": {"CO@4_3_148"},
+        "sensor_index:measurement_type:Temp": {"CO@4_3_148"},
+        "known_sensor_keys": {"CO@4_3_148"},
+    }
+
+    # A changed field moves the sensor to the index of its new value
+    moved_sensor_metadata = sensor_metadata.replace(room_name="Lounge")
+    assert redis_connector.store_sensor_metadata(
+        moved_sensor_metadata, ex=60, previous=sensor_metadata
+    )
+    assert redis_client.sets["sensor_index:room_name:Kitchen"] == set()
+    assert redis_client.sets["sensor_index:room_name:Lounge"] == {"CO@4_3_148"}
+
+    # Refreshing an unchanged sensor backfills its lost indexes
+    redis_client.sets.clear()
+    redis_connector.refresh_sensor_metadata([moved_sensor_metadata], ex=60)
+    assert redis_client.sets == {
+        "sensor_index:building_name:House 4": {"CO@4_3_148"},
+        "sensor_index:room_name:Lounge": {"CO@4_3_148"},
+        "sensor_index:measurement_type:Temp": {"CO@4_3_148"},
+        "known_sensor_keys": {"CO@4_3_148"},
+    }
+
+    redis_connector.delete_sensor_metadata(moved_sensor_metadata)
+    assert redis_connector.get_sensor_metadata("CO@4_3_148") is None
+    assert not any(redis_client.sets.values())
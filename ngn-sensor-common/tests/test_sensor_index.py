@@ -0,0 +1,93 @@
+import pytest
+from ngn.sensor.common.sensor_index import index_keys, query_sensors
+from ngn.sensor.common.sensor_types import SensorMetadata
+
+
+def test_index_keys():
+    sensor_metadata = SensorMetadata(
+        sensor_key="CO@4_3_148",
+        sensor_name="House 4_WWHRS_ShowerMIX_Temp",
+        building_name="House 4",
+        service_type="WWHRS",
+        object_name="ShowerMIX",
+        measurement_type="Temp",
+    )
+
+    # Empty fields are not indexed
+    assert index_keys(sensor_metadata) == [
+        "sensor_index:building_name:House 4",
+        "sensor_index:service_type:WWHRS",
+        "sensor_index:measurement_type:Temp",
+    ]
+
+
+def test_query_sensors_without_filters():
+    with pytest.raises(ValueError):
+        query_sensors(redis_connector=None)
+
+
+class IndexedSensors:
+    def __init__(self, sensors_metadata: list):
+        self.values = {
+            sensor_metadata.sensor_key: sensor_metadata.to_dict()
+            for sensor_metadata in sensors_metadata
+        }
+        self.sets = {}
+        for sensor_metadata in sensors_metadata:
+            for sensor_index_key in index_keys(sensor_metadata):
+                self.sets.setdefault(sensor_index_key, set()).add(
+                    sensor_metadata.sensor_key
+                )
+        self.fetched_keys = []
+
+    def intersect(self, keys: list) -> set:
+        return set.intersection(*(self.sets.get(key, set()) for key in keys))
+
+    def get_many(self, keys: list) -> list:
+        self.fetched_keys.append(keys)
+        return [self.values.get(key) for key in keys]
+
+    def remove_from_sets(self, keys: list, members: list):
+        for key in keys:
+            self.sets[key].difference_update(members)
+
+
+def test_query_sensors():
+    indexed_sensors = IndexedSensors(
+        [
+            SensorMetadata(
+                sensor_key=sensor_key,
+                sensor_name=sensor_key,
+                building_name=building_name,
+                measurement_type=measurement_type,
+            )
+            for sensor_key, building_name, measurement_type in (
+                ("CO@4_3_1", "House 4", "Temp"),
+                ("CO@4_3_2", "House 4", "Humidity"),
+                ("CO@4_3_3", "House 4", "Temp"),
+                ("CO@5_3_1", "House 5", "Temp"),
+            )
+        ]
+    )
+
+    # Only the sensors in all the queried indexes, fetched in a single call
+    sensors_metadata = query_sensors(
+        indexed_sensors, building_name="House 4", measurement_type="Temp"
+    )
+    assert [sensor_metadata.sensor_key for sensor_metadata in sensors_metadata] == [
+        "CO@4_3_1",
+        "CO@4_3_3",
+    ]
+    assert indexed_sensors.fetched_keys == [["CO@4_3_1", "CO@4_3_3"]]
+    assert query_sensors(indexed_sensors, building_name="House 6") == []
+
+    # Sensors expired from the cache are removed from the queried indexes
+    del indexed_sensors.values["CO@4_3_3"]
+    sensors_metadata = query_sensors(
+        indexed_sensors, building_name="House 4", measurement_type="Temp"
+    )
+    assert [sensor_metadata.sensor_key for sensor_metadata in sensors_metadata] == [
+        "CO@4_3_1"
+    ]
+    assert "CO@4_3_3" not in indexed_sensors.sets["sensor_index:building_name:House 4"]
+    assert "CO@4_3_3" not in indexed_sensors.sets["sensor_index:measurement_type:Temp"]
@@ -0,0 +1,68 @@
+import pytest
+from ngn.sensor.common.sensor_types import Reading, SensorMetadata
+
+SENSOR_KEY = "sensor_key"
+SENSOR_NAME = "sensor_name"
+BUILDING_NAME = "building_name"
+ROOM_NAME = "room_name"
+FLOOR_NAME = "floor_name"
+SERVICE_TYPE = "service_type"
+OBJECT_NAME = "object_name"
+MEASUREMENT_TYPE = "measurement_type"
+UNIT_OF_MEASURE = "unit_of_measure"
+LAST_SHARED_VALUE = "last_shared_value"
+LAST_SHARED_DATETIME = "last_shared_datetime"
+
+SENSOR_INFO = {
+    SENSOR_KEY: "CO@9_4_81",
+    SENSOR_NAME: "House 9_Floor2_Bed1_Other_Humidity",
+    BUILDING_NAME: "House 9",
+    ROOM_NAME: "Bed1",
+    FLOOR_NAME: "Floor2",
+    SERVICE_TYPE: "Other",
+    OBJECT_NAME: "",
+    MEASUREMENT_TYPE: "Humidity",
+    UNIT_OF_MEASURE: "%",
+}
+
+
+def test_sensor_metadata_wire_round_trip():
+    sensor_metadata = SensorMetadata.from_dict(SENSOR_INFO)
+
+    assert sensor_metadata.to_dict() == SENSOR_INFO
+    assert SensorMetadata.from_dict(sensor_metadata.to_dict()) == sensor_metadata
+
+
+def test_sensor_metadata_interned_fields():
+    first = SensorMetadata.from_dict(SENSOR_INFO)
+    second = SensorMetadata.from_dict(
+        {**SENSOR_INFO, BUILDING_NAME: "".join(["House", " 9"])}
+    )
+
+    assert first.building_name is second.building_name
+    assert not hasattr(first, "__dict__")
+
+
+def test_sensor_metadata_replace():
+    sensor_metadata = SensorMetadata.from_dict(SENSOR_INFO)
+    replaced = sensor_metadata.replace(unit_of_measure="")
+
+    assert replaced != sensor_metadata
+    assert replaced.unit_of_measure == ""
+    assert sensor_metadata.unit_of_measure == "%"
+
+
+@pytest.mark.parametrize(
+    "sensor_metadata", [None, SensorMetadata.from_dict(SENSOR_INFO)]
+)
+def test_reading_to_dict(sensor_metadata: SensorMetadata):
+    reading = Reading("CO@9_4_81", 34.62, 1700000000.0)
+    sensor_data = reading.to_dict(sensor_metadata)
+
+    assert sensor_data.get(SENSOR_KEY) == "CO@9_4_81"
+    assert sensor_data.get(LAST_SHARED_VALUE) == 34.62
+    assert sensor_data.get(LAST_SHARED_DATETIME) == 1700000000.0
+    assert Reading.from_dict(sensor_data) == reading
+
+    if sensor_metadata:
+        assert sensor_data.get(BUILDING_NAME) == "House 9"
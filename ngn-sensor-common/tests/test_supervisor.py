@@ -0,0 +1,104 @@
+from time import monotonic, sleep
+
+import pytest
+from ngn.sensor.common.backoff import ExponentialBackoff
+from ngn.sensor.common.supervisor import Supervisor, WorkerSuperseded
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = monotonic() + timeout
+    while not condition():
+        assert monotonic() < deadline, "Condition not met in time"
+        sleep(0.01)
+
+
+def test_exponential_backoff():
+    backoff = ExponentialBackoff(initial=0.5, maximum=3, multiplier=2)
+    assert [backoff.next_delay() for _ in range(5)] == [0.5, 1, 2, 3, 3]
+
+    backoff.reset()
+    assert backoff.next_delay() == 0.5
+
+    jittered_backoff = ExponentialBackoff(initial=1, jitter=0.5)
+    assert 0.5 <= jittered_backoff.next_delay() <= 1
+
+
+def test_failed_worker_is_restarted():
+    runs = []
+
+    def failing_worker(worker):
+        runs.append(worker.name)
+        raise RuntimeError("boom")
+
+    supervisor = Supervisor("test")
+    worker = supervisor.add_worker(
+        "failing", failing_worker, backoff=ExponentialBackoff(initial=0.01)
+    )
+    worker.start()
+
+    wait_for(lambda: runs)
+    wait_for(lambda: not worker._thread.is_alive())
+    supervisor.check()
+    assert supervisor.health()["failing"]["alive"] is False
+    assert supervisor.health()["failing"]["last_error"] == "RuntimeError('boom')"
+
+    sleep(0.02)
+    supervisor.check()
+    wait_for(lambda: len(runs) == 2)
+    assert worker.restarts == 1
+
+
+def test_stalled_worker_is_replaced():
+    superseded = []
+    stalled = [True]
+
+    def stalling_worker(worker):
+        while True:
+            while stalled[0]:
+                sleep(0.01)
+            try:
+                worker.beat()
+            except WorkerSuperseded:
+                superseded.append(True)
+                raise
+            sleep(0.01)
+
+    supervisor = Supervisor("test")
+    worker = supervisor.add_worker(
+        "stalling",
+        stalling_worker,
+        stall_timeout=0.05,
+        backoff=ExponentialBackoff(initial=0),
+    )
+    worker.start()
+    first_thread = worker._thread
+
+    sleep(0.1)
+    assert supervisor.health()["stalling"]["alive"] is False
+    supervisor.check()
+    supervisor.check()
+    assert worker.restarts == 1
+    assert worker._thread is not first_thread
+
+    # The stalled thread exits as soon as it makes progress again
+    stalled[0] = False
+    wait_for(lambda: not first_thread.is_alive())
+    assert superseded == [True]
+    assert supervisor.health()["stalling"]["alive"] is True
+
+
+@pytest.mark.parametrize("stall_timeout", [None, 10])
+def test_healthy_worker_is_alive(stall_timeout):
+    def idle_worker(worker):
+        while True:
+            worker.beat()
+            sleep(0.01)
+
+    supervisor = Supervisor("test")
+    worker = supervisor.add_worker("idle", idle_worker, stall_timeout=stall_timeout)
+    worker.start()
+    supervisor.check()
+
+    health = supervisor.health()["idle"]
+    assert health["alive"] is True
+    assert health["restarts"] == 0
@@ -0,0 +1,131 @@
+"""Benchmark of the Kafka producer compression codecs.
+
+It publishes the readings of the whole fleet, built from the sensor metadata CSV,
+to a local Kafka broker with each compression codec and reports the bytes sent
+on the wire, the CPU time per message and the produce latency.
+Start the local broker first with `make kafka-bench-run`, or:
+
+    docker compose -f docker/docker-compose.yaml --profile bench up -d kafka
+
+Usage:
+    python ngn-sensor-publisher/benchmarks/bench_kafka_compression.py \
+        [--bootstrap-servers localhost:9092] [--messages 50000] [--linger-ms 20]
+"""
+
+import argparse
+import json
+import sys
+from time import monotonic, process_time
+
+# Also puts the publisher and common sources on the path
+from bench_payload_formats import load_sensor_data
+from confluent_kafka import Producer
+from kafka_profiles import parse_overrides
+
+COMPRESSION_TYPES = ["none", "gzip", "lz4", "zstd"]
+STATISTICS_INTERVAL_MS = 100
+
+
+def percentile(sorted_values: list, ratio: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+def run(bootstrap_servers: str, compression_type: str, payloads: list, settings: dict):
+    """Publishes the payloads with a compression codec.
+
+    Returns:
+        dict: the bytes on the wire, CPU time per message and latency percentiles.
+    """
+
+    statistics = {}
+    latencies = []
+
+    def on_statistics(statistics_json: str):
+        statistics.update(json.loads(statistics_json))
+
+    def on_delivery(err, msg):
+        if err is None:
+            latencies.append(msg.latency())
+
+    producer = Producer(
+        {
+            "bootstrap.servers": bootstrap_servers,
+            "compression.type": compression_type,
+            "statistics.interval.ms": STATISTICS_INTERVAL_MS,
+            "stats_cb": on_statistics,
+            **settings,
+        }
+    )
+    topic_name = f"bench_compression_{compression_type}"
+
+    # Warm up the connection and topic metadata, so that they are not measured
+    producer.produce(topic_name, value=payloads[0])
+    if producer.flush(10):
+        sys.exit(f"Kafka broker {bootstrap_servers} is not reachable")
+    producer.poll(2 * STATISTICS_INTERVAL_MS / 1000)
+    tx_bytes_before = statistics.get("tx_bytes", 0)
+
+    cpu_start = process_time()
+    for payload in payloads:
+        while True:
+            try:
+                producer.produce(topic_name, value=payload, callback=on_delivery)
+                break
+            except BufferError:
+                producer.poll(0.1)
+        producer.poll(0)
+    producer.flush()
+    cpu_time = process_time() - cpu_start
+
+    # Wait for the statistics emitted after the last delivery
+    stats_deadline = monotonic() + 2 * STATISTICS_INTERVAL_MS / 1000
+    while monotonic() < stats_deadline:
+        producer.poll(STATISTICS_INTERVAL_MS / 1000)
+
+    latencies.sort()
+    return {
+        "wire_bytes": statistics.get("tx_bytes", 0) - tx_bytes_before,
+        "cpu_us_per_msg": cpu_time / len(payloads) * 1e6,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "delivered": len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bootstrap-servers", default="localhost:9092")
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--linger-ms", type=int, default=20)
+    parser.add_argument(
+        "--overrides",
+        default="",
+        help="extra producer settings, e.g. 'batch.size=1000000,acks=all'",
+    )
+    args = parser.parse_args()
+
+    sensor_data = load_sensor_data()
+    payloads = [
+        json.dumps(sensor_data[index % len(sensor_data)]).encode("utf-8")
+        for index in range(args.messages)
+    ]
+    payload_bytes = sum(len(payload) for payload in payloads)
+    settings = {"linger.ms": args.linger_ms, **parse_overrides(args.overrides)}
+
+    print(f"Messages: {len(payloads)}, payload bytes: {payload_bytes}")
+    print(
+        f"{'codec':<6} {'wire bytes':>12} {'ratio':>6} {'cpu us/msg':>11} "
+        f"{'p50 ms':>8} {'p99 ms':>8}"
+    )
+    for compression_type in COMPRESSION_TYPES:
+        result = run(args.bootstrap_servers, compression_type, payloads, settings)
+        print(
+            f"{compression_type:<6} {result['wire_bytes']:>12} "
+            f"{payload_bytes / max(result['wire_bytes'], 1):>6.2f} "
+            f"{result['cpu_us_per_msg']:>11.1f} "
+            f"{result['latency_p50_ms']:>8.2f} {result['latency_p99_ms']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark of the Kafka payload formats.
+
+It builds the readings of the whole fleet from the sensor metadata CSV and
+reports the average payload bytes and serialisation time of each format.
+
+Usage:
+    python ngn-sensor-publisher/benchmarks/bench_payload_formats.py
+"""
+
+import csv
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_DIR = os.path.join(ROOT_DIR, "ngn-sensor-cache", "src", "ngn", "sensor", "cache")
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "ngn-sensor-publisher", "src", "ngn", "sensor", "publisher"),
+    os.path.join(ROOT_DIR, "ngn-sensor-common", "src", "ngn", "sensor", "common"),
+]
+
+import constants as cnt  # noqa: E402
+from sensor_types import Reading, SensorMetadata  # noqa: E402
+from serialisers import (  # noqa: E402
+    JSON_FORMAT,
+    MSGPACK_COMPACT_FORMAT,
+    MSGPACK_FORMAT,
+    create_serialisers,
+)
+
+
+def load_sensor_data() -> list:
+    """Returns one reading of every sensor of the CSV, enriched with its metadata."""
+
+    with open(
+        os.path.join(CACHE_DIR, cnt.SENSOR_METADATA_CSV), "r", encoding="utf-8-sig"
+    ) as csv_file:
+        return [
+            Reading(
+                row[cnt.SENSOR_KEY], round(float(row[cnt.LAST_SHARED_VALUE] or 0), 3)
+            ).to_dict(SensorMetadata.from_dict(row))
+            for row in csv.DictReader(csv_file)
+            if row.get(cnt.SENSOR_KEY)
+        ]
+
+
+def main():
+    sensor_data = load_sensor_data()
+    payload_formats = [JSON_FORMAT, MSGPACK_FORMAT, MSGPACK_COMPACT_FORMAT]
+
+    with tempfile.TemporaryDirectory() as registry_dir:
+        serialisers = create_serialisers(
+            os.path.join(registry_dir, "schemas.json"), payload_formats
+        )
+
+    json_bytes = None
+    print(f"Readings: {len(sensor_data)}")
+    for payload_format in payload_formats:
+        serialiser = serialisers[payload_format]
+        start = perf_counter()
+        payload_bytes = sum(len(serialiser.serialise(data)[0]) for data in sensor_data)
+        elapsed = perf_counter() - start
+        json_bytes = json_bytes or payload_bytes
+
+        print(
+            f"{payload_format:16} {payload_bytes / len(sensor_data):7.1f} B/reading"
+            f"  {elapsed / len(sensor_data) * 1e6:6.2f} us/reading"
+            f"  {json_bytes / payload_bytes:5.1f}x smaller than JSON"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import math
+from array import array
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+import constants as cnt
+from sensor_types import Reading, SensorMetadata
+
+OUT_OF_RANGE = "out_of_range"
+SPIKE = "spike"
+STUCK = "stuck"
+
+# Flags of the anomalies already reported for a sensor, cleared when they end
+_OUT_OF_RANGE_FLAG = 1
+_STUCK_FLAG = 2
+
+
+class AnomalyDetector:
+    def __init__(
+        self,
+        alpha: float = cnt.ANOMALY_EWMA_ALPHA,
+        warmup_readings: int = cnt.ANOMALY_WARMUP_READINGS,
+        z_score: float = cnt.ANOMALY_Z_SCORE,
+        stuck_seconds: float = cnt.ANOMALY_STUCK_SECONDS,
+    ):
+        """Detects anomalous readings from per-sensor statistics updated in O(1):
+        values outside the range of the sensor, spikes far from the exponentially
+        weighted moving mean, and values that haven't changed for too long.
+        The statistics live in flat arrays indexed by a slot per sensor,
+        instead of an object per sensor.
+        Out of range and stuck values are reported once, until they end.
+        Sensors pushing on change go quiet when stuck, so they're also swept
+        periodically for values unchanged for too long.
+        The slots of removed sensors are reused by the sensors that follow.
+
+        Args:
+            alpha (float): the weight of the latest reading in the moving mean and variance.
+            warmup_readings (int): the readings of a sensor before spikes are detected.
+            z_score (float): the distance from the mean of a spike, in standard
+                deviations, 0 to disable spike detection.
+            stuck_seconds (float): the seconds after which an unchanged value is
+                stuck, 0 to disable stuck detection.
+        """
+
+        self.alpha = alpha
+        self.warmup_readings = warmup_readings
+        self.z_score = z_score
+        self.stuck_seconds = stuck_seconds
+        self._slots: Dict[str, int] = {}
+        self._sensors_metadata: List[Optional[SensorMetadata]] = []
+        self._free_slots: List[int] = []
+        self._means = array("d")
+        self._variances = array("d")
+        self._last_values = array("d")
+        self._last_changes = array("d")
+        self._counts = array("L")
+        self._flags = array("B")
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot(
+        self, sensor_key: str, reading: Reading, sensor_metadata: SensorMetadata
+    ) -> int:
+        slot = self._slots.get(sensor_key)
+        if slot is not None:
+            self._sensors_metadata[slot] = sensor_metadata
+        elif self._free_slots:
+            slot = self._slots[sensor_key] = self._free_slots.pop()
+            self._sensors_metadata[slot] = sensor_metadata
+            self._means[slot] = reading.value
+            self._variances[slot] = 0.0
+            self._last_values[slot] = reading.value
+            self._last_changes[slot] = reading.timestamp
+            self._counts[slot] = 0
+            self._flags[slot] = 0
+        else:
+            slot = self._slots[sensor_key] = len(self._sensors_metadata)
+            self._sensors_metadata.append(sensor_metadata)
+            self._means.append(reading.value)
+            self._variances.append(0.0)
+            self._last_values.append(reading.value)
+            self._last_changes.append(reading.timestamp)
+            self._counts.append(0)
+            self._flags.append(0)
+
+        return slot
+
+    def remove(self, sensor_keys: Iterable[str]):
+        """Forgets sensors removed from the cache, so that they're no longer
+        reported as stuck and their slots can be reused.
+
+        Args:
+            sensor_keys (Iterable[str]): the keys of the removed sensors.
+        """
+
+        with self._lock:
+            for sensor_key in sensor_keys:
+                slot = self._slots.pop(sensor_key, None)
+                if slot is not None:
+                    self._sensors_metadata[slot] = None
+                    self._free_slots.append(slot)
+
+    @staticmethod
+    def _event(
+        kind: str, reading: Reading, sensor_metadata: SensorMetadata, **details
+    ) -> dict:
+        event = reading.to_dict(sensor_metadata)
+        event["anomaly"] = kind
+        event.update(details)
+
+        return event
+
+    def _is_stuck(self, slot: int, flags: int, now: float) -> bool:
+        return bool(
+            self.stuck_seconds
+            and not flags & _STUCK_FLAG
+            and now - self._last_changes[slot] >= self.stuck_seconds
+        )
+
+    def _stuck_event(
+        self, slot: int, reading: Reading, sensor_metadata: SensorMetadata
+    ) -> dict:
+        return self._event(
+            STUCK,
+            reading,
+            sensor_metadata,
+            unchanged_seconds=round(reading.timestamp - self._last_changes[slot], 3),
+        )
+
+    def sweep_stuck(self, now: float) -> List[dict]:
+        """Reports the sensors whose value hasn't changed for too long,
+        including those that stopped sending readings.
+
+        Args:
+            now (float): the current time, as a timestamp.
+
+        Returns:
+            List[dict]: the stuck events, with the last value of each sensor.
+        """
+
+        events = []
+        with self._lock:
+            for sensor_key, slot in self._slots.items():
+                flags = self._flags[slot]
+                if self._is_stuck(slot, flags, now):
+                    events.append(
+                        self._stuck_event(
+                            slot,
+                            Reading(sensor_key, self._last_values[slot], now),
+                            self._sensors_metadata[slot],
+                        )
+                    )
+                    self._flags[slot] = flags | _STUCK_FLAG
+
+        return events
+
+    def check(self, reading: Reading, sensor_metadata: SensorMetadata) -> List[dict]:
+        """Updates the statistics of a sensor with a reading.
+
+        Args:
+            reading (Reading): the sensor reading, with a numeric value.
+            sensor_metadata (SensorMetadata): the metadata of the sensor.
+
+        Returns:
+            List[dict]: the anomaly events, the reading with its metadata,
+                the kind of anomaly and its details.
+        """
+
+        events = []
+        value = reading.value
+        with self._lock:
+            slot = self._slot(reading.sensor_key, reading, sensor_metadata)
+            flags = self._flags[slot]
+
+            out_of_range = (
+                sensor_metadata.min_value is not None
+                and value < sensor_metadata.min_value
+            ) or (
+                sensor_metadata.max_value is not None
+                and value > sensor_metadata.max_value
+            )
+            if out_of_range and not flags & _OUT_OF_RANGE_FLAG:
+                events.append(self._event(OUT_OF_RANGE, reading, sensor_metadata))
+            flags = (
+                flags | _OUT_OF_RANGE_FLAG
+                if out_of_range
+                else flags & ~_OUT_OF_RANGE_FLAG
+            )
+
+            if value != self._last_values[slot]:
+                self._last_values[slot] = value
+                self._last_changes[slot] = reading.timestamp
+                flags &= ~_STUCK_FLAG
+            elif self._is_stuck(slot, flags, reading.timestamp):
+                events.append(self._stuck_event(slot, reading, sensor_metadata))
+                flags |= _STUCK_FLAG
+
+            # Incremental update of the exponentially weighted mean and variance
+            mean = self._means[slot]
+            variance = self._variances[slot]
+            deviation = value - mean
+            if (
+                self.z_score
+                and self._counts[slot] >= self.warmup_readings
+                and variance > 0
+                and abs(deviation) > self.z_score * math.sqrt(variance)
+            ):
+                events.append(
+                    self._event(
+                        SPIKE,
+                        reading,
+                        sensor_metadata,
+                        z_score=round(deviation / math.sqrt(variance), 3),
+                        mean=round(mean, 3),
+                    )
+                )
+
+            increment = self.alpha * deviation
+            self._means[slot] = mean + increment
+            self._variances[slot] = (1 - self.alpha) * (
+                variance + deviation * increment
+            )
+            if self._counts[slot] < self.warmup_readings:
+                self._counts[slot] += 1
+            self._flags[slot] = flags
+
+        return events
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import zlib
+from time import sleep
+from typing import Callable, FrozenSet, Iterable, Optional, Set
+
+import constants as cnt
+from redis_connector import RedisConnector
+from supervisor import WorkerHandle
+
+log = logging.getLogger(__name__)
+
+
+def rendezvous_score(replica_id: str, shard: int) -> int:
+    """Returns the weight of a replica for a shard: each shard goes to the replica
+    with the highest score, so only the shards of a joining or leaving replica move.
+
+    Args:
+        replica_id (str): the replica identifier.
+        shard (int): the shard number.
+
+    Returns:
+        int: the score.
+    """
+
+    digest = hashlib.blake2b(f"{replica_id}:{shard}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class ShardCoordinator:
+    def __init__(
+        self,
+        redis_connector: RedisConnector,
+        replica_id: str,
+        service_name: str,
+        shard_count: int = cnt.CLUSTER_SHARDS,
+        lease_ttl: float = cnt.CLUSTER_LEASE_TTL,
+        on_change: Optional[Callable[[], None]] = None,
+    ):
+        """Splits the sensor key space of a service in shards among its replicas.
+        Each replica sends heartbeats to a membership set, computes the shards assigned
+        to it from the live replicas, and holds a lease on each of them.
+        A replica only handles the sensors of the shards whose lease it holds,
+        so that a moving shard is never handled by two replicas at once.
+
+        Args:
+            redis_connector (RedisConnector): the connector holding the leases.
+            replica_id (str): the identifier of this replica, unique in the cluster.
+            service_name (str): the service name, used to namespace the leases.
+            shard_count (int): the number of shards of the sensor key space.
+            lease_ttl (float): seconds after which the leases of a dead replica expire.
+            on_change (Optional[Callable[[], None]]): called when the owned shards change.
+        """
+
+        self.replica_id = replica_id
+        self.shard_count = shard_count
+        self.lease_ttl = lease_ttl
+        self.owned_shards: FrozenSet[int] = frozenset()
+        self.replica_count = 0
+        self._redis_connector = redis_connector
+        self._key_prefix = f"{cnt.CLUSTER_KEY_PREFIX}:{service_name}"
+        self._replicas_key = f"{self._key_prefix}:replicas"
+        self._replica_ids: Set[str] = set()
+        self._on_change = on_change
+
+    def shard_of(self, sensor_key: str) -> int:
+        """Returns the shard of a sensor key."""
+
+        return zlib.crc32(sensor_key.encode()) % self.shard_count
+
+    def owns(self, sensor_key: str) -> bool:
+        """Whether this replica handles a sensor."""
+
+        return self.shard_of(sensor_key) in self.owned_shards
+
+    def _shard_key(self, shard: int) -> str:
+        return f"{self._key_prefix}:shard:{shard}"
+
+    def assigned_shards(self, replica_ids: Iterable[str]) -> Set[int]:
+        """Returns the shards assigned to this replica by rendezvous hashing.
+
+        Args:
+            replica_ids (Iterable[str]): the identifiers of the live replicas.
+
+        Returns:
+            Set[int]: the shards assigned to this replica.
+        """
+
+        replica_ids = set(replica_ids) | {self.replica_id}
+
+        return {
+            shard
+            for shard in range(self.shard_count)
+            if max(
+                replica_ids, key=lambda replica_id: rendezvous_score(replica_id, shard)
+            )
+            == self.replica_id
+        }
+
+    def refresh(self) -> bool:
+        """Renews the membership of this replica, then claims the shards assigned
+        to it and releases the others, in three round trips to Redis.
+
+        Returns:
+            bool: whether the owned shards have changed.
+        """
+
+        replica_ids = self._redis_connector.heartbeat(
+            self._replicas_key, self.replica_id, self.lease_ttl
+        )
+        # Keeps the last known replicas while Redis is unreachable
+        if replica_ids is not None:
+            self._replica_ids = set(replica_ids) | {self.replica_id}
+        assigned_shards = sorted(self.assigned_shards(self._replica_ids))
+        self.replica_count = len(self._replica_ids)
+
+        # Handed over straight away, instead of waiting for the leases to expire
+        self._redis_connector.release_leases(
+            [
+                self._shard_key(shard)
+                for shard in sorted(self.owned_shards.difference(assigned_shards))
+            ],
+            self.replica_id,
+        )
+        owned_shards = {
+            shard
+            for shard, claimed in zip(
+                assigned_shards,
+                self._redis_connector.claim_leases(
+                    [self._shard_key(shard) for shard in assigned_shards],
+                    self.replica_id,
+                    self.lease_ttl,
+                ),
+            )
+            if claimed
+        }
+
+        if owned_shards == self.owned_shards:
+            return False
+
+        log.info(
+            "Replica %s now owns %d of %d shards (%d replicas): %s",
+            self.replica_id,
+            len(owned_shards),
+            self.shard_count,
+            self.replica_count,
+            sorted(owned_shards),
+        )
+        self.owned_shards = frozenset(owned_shards)
+        return True
+
+    def run(self, worker: WorkerHandle):
+        """Thread refreshing the leases three times per lease TTL, so that a single
+        late renewal never loses a shard.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        while True:
+            worker.beat()
+            if self.refresh() and self._on_change is not None:
+                self._on_change()
+            sleep(self.lease_ttl / 3)
@@ -0,0 +1,84 @@
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+
+
+class KeyedThrottle:
+    def __init__(self, min_interval: float):
+        """Limits the records published per key to one every 'min_interval' seconds.
+        A record arriving earlier is held back, replacing any record already held for
+        its key, and is released once the interval has elapsed, so that the latest
+        record of every key is always published eventually.
+
+        Args:
+            min_interval (float): the minimum seconds between two records of a key.
+        """
+
+        self.min_interval = min_interval
+        self._published_at: Dict[str, float] = {}
+        self._held_records: Dict[str, dict] = {}
+        self._next_release = 0.0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._held_records)
+
+    def offer(self, key: str, record: dict, now: float) -> bool:
+        """Offers the latest record of a key.
+
+        Args:
+            key (str): the record key.
+            record (dict): the record.
+            now (float): the current monotonic time.
+
+        Returns:
+            bool: whether the record can be published now, otherwise it's held back.
+        """
+
+        with self._lock:
+            published_at = self._published_at.get(key)
+            if published_at is None or now - published_at >= self.min_interval:
+                self._published_at[key] = now
+                self._held_records.pop(key, None)
+                return True
+
+            self._held_records[key] = record
+            return False
+
+    def release(self, now: float) -> List[Tuple[str, dict]]:
+        """Releases the held records whose interval has elapsed.
+        Held records are only scanned a few times per interval.
+
+        Args:
+            now (float): the current monotonic time.
+
+        Returns:
+            List[Tuple[str, dict]]: the key and record of every released record.
+        """
+
+        with self._lock:
+            if not self._held_records or now < self._next_release:
+                return []
+            self._next_release = now + self.min_interval / 4
+
+            released_records = [
+                (key, record)
+                for key, record in self._held_records.items()
+                if now - self._published_at[key] >= self.min_interval
+            ]
+            for key, _ in released_records:
+                self._published_at[key] = now
+                del self._held_records[key]
+
+        return released_records
+
+    def forget(self, keys: Iterable[str]):
+        """Forgets keys that are gone, with their held records.
+
+        Args:
+            keys (Iterable[str]): the keys.
+        """
+
+        with self._lock:
+            for key in keys:
+                self._published_at.pop(key, None)
+                self._held_records.pop(key, None)
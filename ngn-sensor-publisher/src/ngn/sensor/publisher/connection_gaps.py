@@ -0,0 +1,69 @@
+import logging
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+
+class GapTracker:
+    def __init__(self):
+        """Tracks the web socket disconnections and estimates the messages missed
+        during each of them, from the message rate seen while connected.
+        """
+
+        self.messages = 0
+        self._connected_seconds = 0.0
+        self._connected_at: Optional[float] = None
+        self._disconnected_at: Optional[float] = None
+
+    @property
+    def message_rate(self) -> float:
+        """The average number of messages per second received while connected."""
+
+        if not self._connected_seconds:
+            return 0.0
+
+        return self.messages / self._connected_seconds
+
+    def message(self):
+        """Counts a message received from the web socket."""
+
+        self.messages += 1
+
+    def connected(self, now: float) -> Optional[dict]:
+        """Records a (re)connection.
+
+        Args:
+            now (float): the current time, as a timestamp.
+
+        Returns:
+            Optional[dict]: the report of the gap just closed, None on the first connection.
+        """
+
+        self._connected_at = now
+        if self._disconnected_at is None:
+            return None
+
+        gap_seconds = max(0.0, now - self._disconnected_at)
+        gap_report = {
+            "disconnected_at": self._disconnected_at,
+            "reconnected_at": now,
+            "gap_seconds": round(gap_seconds, 3),
+            "estimated_missed_messages": round(gap_seconds * self.message_rate),
+        }
+        self._disconnected_at = None
+
+        return gap_report
+
+    def disconnected(self, now: float):
+        """Records a disconnection, unless already disconnected.
+
+        Args:
+            now (float): the current time, as a timestamp.
+        """
+
+        if self._connected_at is not None:
+            self._connected_seconds += max(0.0, now - self._connected_at)
+            self._connected_at = None
+
+        if self._disconnected_at is None:
+            self._disconnected_at = now
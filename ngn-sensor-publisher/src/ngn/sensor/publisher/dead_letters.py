@@ -0,0 +1,147 @@
+import logging
+from threading import Lock
+from time import monotonic, time
+from typing import Dict, List
+
+import constants as cnt
+from metrics import MetricsRegistry
+from sources import DEFAULT_SOURCE_NAME
+
+log = logging.getLogger(__name__)
+
+# Reason codes of the rejected records
+MISSING_SENSOR_KEY = "missing_sensor_key"
+MISSING_VALUE = "missing_value"
+NON_NUMERIC_VALUE = "non_numeric_value"
+MISSING_METADATA = "missing_metadata"
+
+
+class DeadLetterBuffer:
+    def __init__(
+        self,
+        metrics: MetricsRegistry,
+        enabled: bool = True,
+        batch_size: int = cnt.DEAD_LETTER_BATCH_SIZE,
+        flush_interval: float = cnt.DEAD_LETTER_FLUSH_INTERVAL,
+        rate_limit: float = cnt.DEAD_LETTER_RATE_LIMIT,
+        max_size: int = cnt.DEAD_LETTER_BUFFER_SIZE,
+    ):
+        """Buffers the rejected records, so that they can be published in batches
+        to a dead-letter topic with their reason code and raw payload.
+        Rejections are counted per reason even when buffering is disabled, and each
+        source is capped to 'rate_limit' buffered records per second.
+
+        Args:
+            metrics (MetricsRegistry): the registry of the per-reason counters.
+            enabled (bool): whether the rejected records are buffered.
+            batch_size (int): maximum number of records in a batch.
+            flush_interval (float): maximum seconds a record waits for its batch.
+            rate_limit (float): maximum records per second per source. 0 is unlimited.
+            max_size (int): maximum number of buffered records.
+        """
+
+        self.enabled = enabled
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.rate_limit = rate_limit
+        self.max_size = max_size
+        self._metrics = metrics
+        self._records: List[dict] = []
+        # Available tokens and last refill time of each source
+        self._buckets: Dict[str, list] = {}
+        self._first_record_at = 0.0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _take_token(self, source_name: str, now: float) -> bool:
+        """Takes a token from the bucket of a source, refilled at 'rate_limit'
+        tokens per second.
+
+        Args:
+            source_name (str): the source name.
+            now (float): the current time, as a monotonic timestamp.
+
+        Returns:
+            bool: whether the source is below its rate cap.
+        """
+
+        if not self.rate_limit:
+            return True
+
+        bucket = self._buckets.get(source_name)
+        if bucket is None:
+            bucket = self._buckets[source_name] = [self.rate_limit, now]
+
+        bucket[0] = min(
+            self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit
+        )
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+
+        bucket[0] -= 1
+        return True
+
+    def add(self, reason: str, payload, source_name: str = DEFAULT_SOURCE_NAME):
+        """Counts a rejected record and buffers it, unless the source is over
+        its rate cap or the buffer is full.
+
+        Args:
+            reason (str): the reason code, e.g. 'missing_metadata'.
+            payload (any): the raw payload of the record, JSON serialisable.
+            source_name (str): the name of the source of the record.
+        """
+
+        self._metrics.increment(f"dead_letters_{reason}")
+        if not self.enabled:
+            return
+
+        now = monotonic()
+
+        with self._lock:
+            if not self._take_token(source_name, now):
+                self._metrics.increment("dead_letters_rate_limited")
+                return
+
+            if len(self._records) >= self.max_size:
+                self._metrics.increment("dead_letters_dropped")
+                return
+
+            if not self._records:
+                self._first_record_at = now
+            self._records.append(
+                {
+                    "reason": reason,
+                    "source": source_name,
+                    "rejected_at": time(),
+                    "payload": payload,
+                }
+            )
+
+    def is_due(self) -> bool:
+        """Whether a full batch is ready, or the oldest record waited long enough."""
+
+        if not self._records:
+            return False
+
+        return (
+            len(self._records) >= self.batch_size
+            or monotonic() - self._first_record_at >= self.flush_interval
+        )
+
+    def drain(self) -> List[List[dict]]:
+        """Removes all the buffered records.
+
+        Returns:
+            List[List[dict]]: the records, in batches of at most 'batch_size'.
+        """
+
+        with self._lock:
+            records, self._records = self._records, []
+
+        return [
+            records[start : start + self.batch_size]
+            for start in range(0, len(records), self.batch_size)
+        ]
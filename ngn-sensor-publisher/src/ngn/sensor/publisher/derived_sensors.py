@@ -0,0 +1,303 @@
+import json
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import constants as cnt
+from sensor_types import Reading, SensorMetadata
+from sources import split_sensor_key
+
+MEAN = "mean"
+SUM = "sum"
+MIN = "min"
+MAX = "max"
+FUNCTIONS = (MEAN, SUM, MIN, MAX)
+
+# Metadata fields a derived sensor can select its inputs by
+SELECTOR_FIELDS = (
+    cnt.BUILDING_NAME,
+    cnt.FLOOR_NAME,
+    cnt.ROOM_NAME,
+    cnt.SERVICE_TYPE,
+    cnt.OBJECT_NAME,
+    cnt.MEASUREMENT_TYPE,
+)
+
+
+class DerivedSensor:
+    def __init__(
+        self,
+        sensor_metadata: SensorMetadata,
+        function: str,
+        sensor_keys: Iterable[str] = (),
+        selector: Optional[Dict[str, List[str]]] = None,
+    ):
+        """A virtual sensor whose value is a function of the latest values of its inputs.
+        Inputs are listed by sensor key, or selected by their metadata among the
+        sensors of the same source as the virtual sensor.
+
+        Args:
+            sensor_metadata (SensorMetadata): the metadata of the virtual sensor.
+            function (str): 'mean', 'sum', 'min' or 'max'.
+            sensor_keys (Iterable[str]): the keys of the input sensors.
+            selector (Optional[Dict[str, List[str]]]): the accepted values
+                of the metadata fields of the input sensors.
+
+        Raises:
+            ValueError: if the function or the selector are not valid.
+        """
+
+        if function not in FUNCTIONS:
+            raise ValueError(
+                f"Bad function '{function}' of {sensor_metadata.sensor_key}"
+            )
+        bad_fields = set(selector or {}).difference(SELECTOR_FIELDS)
+        if bad_fields:
+            raise ValueError(
+                f"Bad selector fields {sorted(bad_fields)} of {sensor_metadata.sensor_key}"
+            )
+
+        self.sensor_metadata = sensor_metadata
+        self.function = function
+        self.sensor_keys: Set[str] = set(sensor_keys)
+        self.selector = selector or {}
+        self.source_name, _ = split_sensor_key(sensor_metadata.sensor_key)
+        self.value: Optional[float] = None
+        self._values: Dict[str, float] = {}
+        self._sum = 0.0
+
+    def matches(self, sensor_metadata: SensorMetadata) -> bool:
+        """Whether a sensor is an input of this virtual sensor.
+
+        Args:
+            sensor_metadata (SensorMetadata): the metadata of the sensor.
+
+        Returns:
+            bool: whether the sensor is listed or selected.
+        """
+
+        if sensor_metadata.sensor_key in self.sensor_keys:
+            return True
+        if not self.selector:
+            return False
+
+        source_name, _ = split_sensor_key(sensor_metadata.sensor_key)
+        return source_name == self.source_name and all(
+            getattr(sensor_metadata, field) in values
+            for field, values in self.selector.items()
+        )
+
+    def _compute(self) -> Optional[float]:
+        if not self._values:
+            return None
+        if self.function == MEAN:
+            return round(self._sum / len(self._values), 3)
+        if self.function == SUM:
+            return round(self._sum, 3)
+        if self.function == MIN:
+            return min(self._values.values())
+
+        return max(self._values.values())
+
+    def update(self, sensor_key: str, value: Optional[float]) -> bool:
+        """Updates the latest value of an input, or removes it, and recomputes
+        the value of this virtual sensor.
+
+        Args:
+            sensor_key (str): the key of the input sensor.
+            value (Optional[float]): its latest value, None if it's gone.
+
+        Returns:
+            bool: whether the value of this virtual sensor has changed.
+        """
+
+        previous_value = self._values.pop(sensor_key, None)
+        if previous_value is not None:
+            self._sum -= previous_value
+        if value is None:
+            # Drops the rounding residue of the removed values
+            if not self._values:
+                self._sum = 0.0
+            # The new value is published with the next reading of another input
+            return False
+
+        self._values[sensor_key] = value
+        self._sum += value
+        value = self._compute()
+        if value == self.value:
+            return False
+
+        self.value = value
+        return value is not None
+
+
+def _is_str_list(values) -> bool:
+    return isinstance(values, list) and all(isinstance(value, str) for value in values)
+
+
+def parse_derived_sensor(definition: dict) -> DerivedSensor:
+    """Builds a virtual sensor from its definition, e.g.
+    {"sensor_key": "DERIVED@house_1_kitchen_temp", "function": "mean",
+     "select": {"building_name": "House 1", "room_name": "Kitchen",
+                "measurement_type": "Temp"},
+     "metadata": {"unit_of_measure": "Celsius degrees"}}
+
+    The metadata of the virtual sensor defaults to the single values of the selector.
+    Its building, whose topic it's published to, must be known: selected alone,
+    or given in the metadata, e.g. with inputs listed by key.
+
+    Args:
+        definition (dict): the definition, with 'sensor_key', 'function' and
+            'sensor_keys', 'select' or both, optionally with 'metadata'.
+
+    Returns:
+        DerivedSensor: the virtual sensor.
+
+    Raises:
+        ValueError: if the definition is not valid.
+    """
+
+    if not isinstance(definition, dict):
+        raise ValueError(f"Bad derived sensor definition: {definition}")
+
+    sensor_key = definition.get(cnt.SENSOR_KEY)
+    sensor_keys = definition.get("sensor_keys", [])
+    select = definition.get("select", {})
+    metadata = definition.get("metadata", {})
+    if not (
+        _is_str_list(sensor_keys)
+        and isinstance(select, dict)
+        and all(
+            isinstance(values, str) or _is_str_list(values)
+            for values in select.values()
+        )
+        and isinstance(metadata, dict)
+    ):
+        raise ValueError(f"Bad derived sensor definition: {definition}")
+
+    selector = {
+        field: [values] if isinstance(values, str) else values
+        for field, values in select.items()
+    }
+    if not sensor_key or not (sensor_keys or selector):
+        raise ValueError(f"Bad derived sensor definition: {definition}")
+
+    sensor_info = {
+        field: values[0] for field, values in selector.items() if len(values) == 1
+    }
+    sensor_info.update(metadata)
+    if not sensor_info.get(cnt.BUILDING_NAME):
+        raise ValueError(
+            f"Derived sensor {sensor_key} needs a 'building_name', "
+            "in its metadata or as the single selected one"
+        )
+    sensor_info[cnt.SENSOR_KEY] = sensor_key
+    sensor_info.setdefault(cnt.SENSOR_NAME, sensor_key)
+    sensor_info.setdefault(cnt.SERVICE_TYPE, "Derived")
+
+    return DerivedSensor(
+        SensorMetadata.from_dict(sensor_info),
+        definition.get("function", MEAN),
+        sensor_keys,
+        selector,
+    )
+
+
+def load_derived_sensors(path: str) -> List[DerivedSensor]:
+    """Reads the definitions of the virtual sensors from a JSON list.
+
+    Args:
+        path (str): the path of the JSON file.
+
+    Returns:
+        List[DerivedSensor]: the virtual sensors.
+
+    Raises:
+        ValueError: if a definition is not valid.
+        OSError: if the file can't be read.
+    """
+
+    with open(path, "r") as definitions_file:
+        definitions = json.load(definitions_file)
+    if not isinstance(definitions, list):
+        raise ValueError("Derived sensor definitions must be a JSON list")
+
+    return [parse_derived_sensor(definition) for definition in definitions]
+
+
+class DerivedSensorEngine:
+    def __init__(self, derived_sensors: List[DerivedSensor]):
+        """Streams the values of virtual sensors computed from the readings of others.
+        The inputs of each sensor are resolved once from its metadata, so that a
+        reading only recomputes the virtual sensors it's an input of.
+
+        Args:
+            derived_sensors (List[DerivedSensor]): the virtual sensors.
+        """
+
+        self.derived_sensors = derived_sensors
+        # Metadata and virtual sensors of every sensor seen, resolved again on change
+        self._outputs: Dict[str, Tuple[SensorMetadata, List[DerivedSensor]]] = {}
+        self._lock = Lock()
+
+    def _resolve(self, sensor_metadata: SensorMetadata) -> List[DerivedSensor]:
+        resolved = self._outputs.get(sensor_metadata.sensor_key)
+        if resolved is not None and (
+            resolved[0] is sensor_metadata or resolved[0] == sensor_metadata
+        ):
+            return resolved[1]
+
+        derived_sensors = [
+            derived_sensor
+            for derived_sensor in self.derived_sensors
+            if derived_sensor.matches(sensor_metadata)
+        ]
+        # A sensor whose metadata changed is no longer an input of the others
+        if resolved is not None:
+            for derived_sensor in resolved[1]:
+                if derived_sensor not in derived_sensors:
+                    derived_sensor.update(sensor_metadata.sensor_key, None)
+
+        self._outputs[sensor_metadata.sensor_key] = (sensor_metadata, derived_sensors)
+        return derived_sensors
+
+    def add(
+        self, reading: Reading, sensor_metadata: SensorMetadata
+    ) -> List[Tuple[Reading, SensorMetadata]]:
+        """Updates the virtual sensors a reading is an input of.
+
+        Args:
+            reading (Reading): the sensor reading.
+            sensor_metadata (SensorMetadata): the metadata of its sensor.
+
+        Returns:
+            List[Tuple[Reading, SensorMetadata]]: the readings of the virtual
+                sensors whose value has changed, with their metadata.
+        """
+
+        with self._lock:
+            return [
+                (
+                    Reading(
+                        derived_sensor.sensor_metadata.sensor_key,
+                        derived_sensor.value,
+                        reading.timestamp,
+                    ),
+                    derived_sensor.sensor_metadata,
+                )
+                for derived_sensor in self._resolve(sensor_metadata)
+                if derived_sensor.update(reading.sensor_key, reading.value)
+            ]
+
+    def remove(self, sensor_keys: Iterable[str]):
+        """Forgets sensors removed from the cache, so that their last value
+        no longer counts.
+
+        Args:
+            sensor_keys (Iterable[str]): the keys of the removed sensors.
+        """
+
+        with self._lock:
+            for sensor_key in sensor_keys:
+                _, derived_sensors = self._outputs.pop(sensor_key, (None, []))
+                for derived_sensor in derived_sensors:
+                    derived_sensor.update(sensor_key, None)
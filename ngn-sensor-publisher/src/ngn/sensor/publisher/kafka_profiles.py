@@ -0,0 +1,90 @@
+import logging
+from typing import Dict
+
+log = logging.getLogger(__name__)
+
+LOW_LATENCY_PROFILE = "low-latency"
+HIGH_THROUGHPUT_PROFILE = "high-throughput"
+DURABLE_PROFILE = "durable"
+
+# librdkafka producer settings of each profile
+KAFKA_PRODUCER_PROFILES: Dict[str, Dict[str, str]] = {
+    # Send every message straight away, waiting for the leader only
+    LOW_LATENCY_PROFILE: {
+        "linger.ms": "0",
+        "acks": "1",
+        "compression.type": "none",
+        "enable.idempotence": "false",
+    },
+    # Batch messages for up to 50ms and compress whole batches
+    HIGH_THROUGHPUT_PROFILE: {
+        "linger.ms": "50",
+        "batch.size": "1000000",
+        "batch.num.messages": "10000",
+        "acks": "1",
+        "compression.type": "lz4",
+        "enable.idempotence": "false",
+    },
+    # Wait for all in-sync replicas and never duplicate or reorder messages on retries
+    DURABLE_PROFILE: {
+        "linger.ms": "10",
+        "acks": "all",
+        "compression.type": "zstd",
+        "enable.idempotence": "true",
+        "max.in.flight.requests.per.connection": "5",
+    },
+}
+
+
+def parse_overrides(overrides: str) -> Dict[str, str]:
+    """Parses producer settings overrides, e.g. 'linger.ms=20,compression.type=zstd'.
+
+    Args:
+        overrides (str): comma-separated 'setting=value' pairs.
+
+    Returns:
+        Dict[str, str]: the overridden settings.
+
+    Raises:
+        ValueError: if an override is not a 'setting=value' pair.
+    """
+
+    parsed_overrides = {}
+
+    for override in overrides.split(","):
+        if not override.strip():
+            continue
+
+        setting, separator, value = override.partition("=")
+        if not (separator and setting.strip()):
+            raise ValueError(f"Bad producer setting override '{override}'")
+
+        parsed_overrides[setting.strip()] = value.strip()
+
+    return parsed_overrides
+
+
+def producer_settings(profile_name: str, overrides: str = "") -> Dict[str, str]:
+    """Returns the producer settings of a profile, with the given overrides applied.
+    Without a profile, only the overrides are returned and the rest is left
+    at librdkafka defaults.
+
+    Args:
+        profile_name (str): the profile name, e.g. 'low-latency'. Can be empty.
+        overrides (str): comma-separated 'setting=value' pairs.
+
+    Returns:
+        Dict[str, str]: the producer settings.
+
+    Raises:
+        ValueError: if the profile is unknown or the overrides are not valid.
+    """
+
+    profile = KAFKA_PRODUCER_PROFILES.get(profile_name) if profile_name else {}
+    if profile is None:
+        raise ValueError(
+            f"Unknown producer profile '{profile_name}'. "
+            f"Available profiles: {', '.join(KAFKA_PRODUCER_PROFILES)}"
+        )
+
+    return {**profile, **parse_overrides(overrides)}
@@ -0,0 +1,91 @@
+import logging
+from threading import Lock
+from time import sleep
+from typing import Dict
+
+from sensor_state import encode_state, state_key
+from sensor_types import Reading
+from supervisor import WorkerHandle
+
+log = logging.getLogger(__name__)
+
+
+class LatestValueStore:
+    def __init__(self, redis_connector, flush_interval: float):
+        """Keeps the latest value of every sensor in Redis hashes grouped by building.
+        Values are written behind in pipelined batches: updates only touch memory,
+        and successive readings of the same sensor between two flushes are coalesced.
+
+        Args:
+            redis_connector (RedisConnector): the connector to the sensor cache.
+            flush_interval (float): seconds between two writes to Redis.
+        """
+
+        self._redis_connector = redis_connector
+        self._flush_interval = flush_interval
+        self._pending_readings: Dict[str, Dict[str, Reading]] = {}
+        self._lock = Lock()
+
+    def update(self, building_name: str, reading: Reading):
+        """Records the latest reading of a sensor, to be written on the next flush.
+
+        Args:
+            building_name (str): the building of the sensor.
+            reading (Reading): the latest reading of the sensor.
+        """
+
+        with self._lock:
+            building_readings = self._pending_readings.get(building_name)
+            if building_readings is None:
+                building_readings = self._pending_readings[building_name] = {}
+            building_readings[reading.sensor_key] = reading
+
+    def flush(self) -> int:
+        """Writes the pending readings to Redis in a single round trip.
+
+        Returns:
+            int: the number of sensor values written.
+        """
+
+        with self._lock:
+            pending_readings, self._pending_readings = self._pending_readings, {}
+
+        if not pending_readings:
+            return 0
+
+        sensor_states = {
+            state_key(building_name): {
+                sensor_key: encode_state(reading)
+                for sensor_key, reading in building_readings.items()
+            }
+            for building_name, building_readings in pending_readings.items()
+        }
+        if not self._redis_connector.store_hashes(sensor_states):
+            # Put the readings back, unless newer ones arrived in the meantime
+            with self._lock:
+                for building_name, building_readings in pending_readings.items():
+                    newer_readings = self._pending_readings.setdefault(
+                        building_name, {}
+                    )
+                    for sensor_key, reading in building_readings.items():
+                        newer_readings.setdefault(sensor_key, reading)
+            return 0
+
+        return sum(len(building_states) for building_states in sensor_states.values())
+
+    def run(self, worker: WorkerHandle):
+        """Thread that periodically flushes the pending readings to Redis.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        while True:
+            sleep(self._flush_interval)
+            worker.beat()
+            try:
+                written_values = self.flush()
+            except Exception as ex:
+                log.error("Got an exception while writing latest values: %s", ex)
+            else:
+                log.debug("Written %d latest sensor values", written_values)
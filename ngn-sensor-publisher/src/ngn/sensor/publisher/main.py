@@ -1,9 +1,7 @@
-from logging import config
-
-from constants import LOGGING_CONFIGURATION
+from logging_utils import configure_logging
 from sensor_publisher import SensorPublisher
 
-config.dictConfig(LOGGING_CONFIGURATION)
+configure_logging()
 
 
 def main():
@@ -0,0 +1,225 @@
+import logging
+from threading import Lock
+from typing import Dict, List, Tuple
+
+import constants as cnt
+from sensor_types import Reading
+
+log = logging.getLogger(__name__)
+
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+# Positions of the running aggregates of a sensor
+COUNT, MIN, MAX, SUM, LAST = range(5)
+
+
+def parse_window(window_name: str) -> int:
+    """Returns the size in seconds of a window, e.g. 900 for '15m'.
+
+    Args:
+        window_name (str): the window size, as a number followed by 's', 'm' or 'h'.
+
+    Returns:
+        int: the window size in seconds.
+
+    Raises:
+        ValueError: if the window size is not valid.
+    """
+
+    unit = WINDOW_UNITS.get(window_name[-1:])
+    if unit is None or not window_name[:-1].isdigit() or int(window_name[:-1]) <= 0:
+        raise ValueError(f"Bad rollup window '{window_name}'")
+
+    return int(window_name[:-1]) * unit
+
+
+def rollup_topic_name(topic_name: str, window_name: str) -> str:
+    """Returns the rollup topic of a building topic, e.g. 'house_1_rollup_1m'.
+
+    Args:
+        topic_name (str): the topic of the raw readings, e.g. 'house_1'.
+        window_name (str): the window size, e.g. '1m'.
+
+    Returns:
+        str: the rollup topic name.
+    """
+
+    return f"{topic_name}_rollup_{window_name}"
+
+
+class RollupWindow:
+    def __init__(self, window_name: str):
+        """Running aggregates (count, min, max, mean, last) of every sensor
+        over tumbling windows of a fixed size, aligned to the epoch.
+        Each sensor costs a fixed-size list, whatever the number of readings.
+
+        Args:
+            window_name (str): the window size, e.g. '15m'.
+        """
+
+        self.window_name = window_name
+        self.window_size = parse_window(window_name)
+        self._window_start: float = None
+        self._aggregates: Dict[str, list] = {}
+        self._topic_names: Dict[str, str] = {}
+        self._lock = Lock()
+        self.late_readings = 0
+
+    def _window_start_of(self, timestamp: float) -> float:
+        return timestamp - timestamp % self.window_size
+
+    def add(self, topic_name: str, reading: Reading) -> List[Tuple[str, dict]]:
+        """Adds a reading to the running aggregates of its sensor.
+        Readings of a later window close the current one first,
+        readings of an already closed window are dropped.
+
+        Args:
+            topic_name (str): the topic of the raw readings of the sensor.
+            reading (Reading): the sensor reading.
+
+        Returns:
+            List[Tuple[str, dict]]: the rollup records of the closed window, if any.
+        """
+
+        closed_records = []
+        window_start = self._window_start_of(reading.timestamp)
+        value = reading.value
+
+        with self._lock:
+            if self._window_start is None:
+                self._window_start = window_start
+            elif window_start > self._window_start:
+                closed_records = self._close(window_start)
+            elif window_start < self._window_start:
+                # Late or parked readings would skew the open window
+                self.late_readings += 1
+                return []
+
+            aggregates = self._aggregates.get(reading.sensor_key)
+            if aggregates is None:
+                self._aggregates[reading.sensor_key] = [1, value, value, value, value]
+                self._topic_names[reading.sensor_key] = rollup_topic_name(
+                    topic_name, self.window_name
+                )
+            else:
+                aggregates[COUNT] += 1
+                if value < aggregates[MIN]:
+                    aggregates[MIN] = value
+                if value > aggregates[MAX]:
+                    aggregates[MAX] = value
+                aggregates[SUM] += value
+                aggregates[LAST] = value
+
+        return closed_records
+
+    def close_expired(self, now: float) -> List[Tuple[str, dict]]:
+        """Closes the current window if it has ended, e.g. because sensors are quiet.
+
+        Args:
+            now (float): the current time, as a timestamp.
+
+        Returns:
+            List[Tuple[str, dict]]: the rollup records of the closed window, if any.
+        """
+
+        with self._lock:
+            if self._window_start is None:
+                return []
+            if now < self._window_start + self.window_size:
+                return []
+
+            return self._close(self._window_start_of(now))
+
+    def _close(self, next_window_start: float) -> List[Tuple[str, dict]]:
+        """Closes the current window and starts a new one. Must hold the lock.
+
+        Args:
+            next_window_start (float): the start of the new window.
+
+        Returns:
+            List[Tuple[str, dict]]: the topic and rollup record of every sensor.
+        """
+
+        window_start = self._window_start
+        window_end = window_start + self.window_size
+        closed_records = [
+            (
+                self._topic_names[sensor_key],
+                {
+                    cnt.SENSOR_KEY: sensor_key,
+                    "window": self.window_name,
+                    "window_start": window_start,
+                    "window_end": window_end,
+                    "count": aggregates[COUNT],
+                    "min": aggregates[MIN],
+                    "max": aggregates[MAX],
+                    "mean": round(aggregates[SUM] / aggregates[COUNT], 3),
+                    "last": aggregates[LAST],
+                },
+            )
+            for sensor_key, aggregates in self._aggregates.items()
+        ]
+
+        self._window_start = next_window_start
+        self._aggregates = {}
+
+        return closed_records
+
+
+class RollupAggregator:
+    def __init__(self, window_names: List[str]):
+        """Streaming per-sensor rollups over one or more window sizes.
+
+        Args:
+            window_names (List[str]): the window sizes, e.g. ['1m', '15m', '1h'],
+                surrounding spaces are ignored.
+        """
+
+        self._windows = [
+            RollupWindow(window_name.strip()) for window_name in window_names
+        ]
+
+    @property
+    def window_names(self) -> List[str]:
+        """The sizes of the windows, e.g. ['1m', '15m', '1h']."""
+
+        return [window.window_name for window in self._windows]
+
+    @property
+    def late_readings(self) -> int:
+        """The readings dropped because their window was already closed."""
+
+        return sum(window.late_readings for window in self._windows)
+
+    def add(self, topic_name: str, reading: Reading) -> List[Tuple[str, dict]]:
+        """Adds a reading to every window.
+
+        Args:
+            topic_name (str): the topic of the raw readings of the sensor.
+            reading (Reading): the sensor reading.
+
+        Returns:
+            List[Tuple[str, dict]]: the rollup records of the windows just closed.
+        """
+
+        closed_records = []
+        for window in self._windows:
+            closed_records.extend(window.add(topic_name, reading))
+
+        return closed_records
+
+    def close_expired(self, now: float) -> List[Tuple[str, dict]]:
+        """Closes the windows that have ended.
+
+        Args:
+            now (float): the current time, as a timestamp.
+
+        Returns:
+            List[Tuple[str, dict]]: the rollup records of the windows just closed.
+        """
+
+        closed_records = []
+        for window in self._windows:
+            closed_records.extend(window.close_expired(now))
+
+        return closed_records
@@ -1,17 +1,57 @@
-import base64
 import json
 import logging
 import os
+import socket
 import ssl
-from datetime import datetime
-from queue import Queue
-from threading import Thread
-from time import sleep
+import sys
+from functools import partial
+from queue import Empty, Full, Queue
+from threading import Lock
+from time import monotonic, sleep, time
+from typing import Dict, List, Optional, Set, Tuple
 
 import constants as cnt
-from confluent_kafka import Producer
+from anomalies import AnomalyDetector
+from backoff import ExponentialBackoff
+from cluster import ShardCoordinator
+from compacted_topics import KeyedThrottle
+from confluent_kafka import KafkaException, Producer
+from connection_gaps import GapTracker
+from dead_letters import (
+    MISSING_METADATA,
+    MISSING_SENSOR_KEY,
+    MISSING_VALUE,
+    NON_NUMERIC_VALUE,
+    DeadLetterBuffer,
+)
+from derived_sensors import DerivedSensorEngine, load_derived_sensors
+from env_config import get_bool_env, get_float_env, get_int_env
+from kafka_profiles import producer_settings
+from latest_value_store import LatestValueStore
+from metadata_snapshot import MetadataSnapshot
+from metrics import MetricsRegistry
 from redis_connector import RedisConnector
-from websocket import WebSocketException, create_connection
+from rollups import RollupAggregator, rollup_topic_name
+from sensor_types import Reading, SensorMetadata
+from serialisers import JSON_FORMAT, Headers, create_serialisers
+from sources import (
+    DEFAULT_SOURCE_NAME,
+    SOURCE_KEY_SEPARATOR,
+    Source,
+    load_sources,
+    split_sensor_key,
+)
+from subscriptions import SensorSubscriptions
+from supervisor import Supervisor, WorkerHandle
+from unknown_sensors import NegativeCache, ParkedReadings
+from websocket import (
+    ABNF,
+    WebSocket,
+    WebSocketConnectionClosedException,
+    WebSocketException,
+    WebSocketTimeoutException,
+    create_connection,
+)
 
 log = logging.getLogger(__name__)
 
@@ -20,9 +60,37 @@ class SensorPublisher:
     def __init__(self):
         self._redis_connector = RedisConnector()
         self._sensor_data_queue: Queue = Queue()
-        self._headers: dict = None
-        self._source_api_ws_url: str = None
+        self._sources: List[Source] = []
+        self._subscriptions: Dict[str, SensorSubscriptions] = {}
+        self._shard_coordinator: Optional[ShardCoordinator] = None
         self._kafka_conf: dict = {}
+        self._topic_names: Dict[Tuple[str, str], str] = {}
+        self._unknown_sensors: NegativeCache = None
+        self._parked_readings: Optional[ParkedReadings] = None
+        self._latest_value_store: LatestValueStore = None
+        self._rollup_aggregator: Optional[RollupAggregator] = None
+        self._derived_sensors: Optional[DerivedSensorEngine] = None
+        self._alerts_topic: Optional[str] = None
+        self._state_topic: Optional[str] = None
+        self._state_throttle = KeyedThrottle(cnt.SENSOR_STATE_MIN_INTERVAL_MS / 1000)
+        self._metadata_topic: Optional[str] = None
+        self._metadata_snapshot: Optional[MetadataSnapshot] = None
+        # Time of the changes to sensors since the snapshot, looked up in Redis
+        self._snapshot_overrides: Dict[str, float] = {}
+        self._snapshot_overrides_lock = Lock()
+        self._anomaly_detector: Optional[AnomalyDetector] = None
+        self._anomaly_queue: Optional[Queue] = None
+        self._producer: Producer = None
+        self._serialisers: Dict = {}
+        self._default_payload_format: str = JSON_FORMAT
+        self._topic_payload_formats: Dict[str, str] = {}
+        self._metrics = MetricsRegistry("sensor_publisher")
+        self._dead_letter_topic: Optional[str] = None
+        self._dead_letters = DeadLetterBuffer(self._metrics, enabled=False)
+        self._worker_stall_timeout: int = cnt.WORKER_STALL_TIMEOUT
+        self._ping_interval: float = cnt.WEBSOCKET_PING_INTERVAL
+        self._ping_timeout: float = cnt.WEBSOCKET_PING_TIMEOUT
+        self._reconnect_max_delay: float = cnt.WEBSOCKET_RECONNECT_MAX_DELAY
 
     def initialise(self):
         """Initialising the Sensor Publisher connector by creating an 'Application'
@@ -45,27 +113,291 @@ class SensorPublisher:
             "ssl.ca.location": kafka_broker_ca_certificate,
         }
 
-        source_api_username: str = os.getenv("SOURCE_API_USERNAME")
-        source_api_password: str = os.getenv("SOURCE_API_PASSWORD")
-        credentials = f"{source_api_username}:{source_api_password}"
-        encoded_credentials = base64.b64encode(credentials.encode("utf-8")).decode(
-            "utf-8"
+        kafka_producer_profile = os.getenv("KAFKA_PRODUCER_PROFILE", "")
+        try:
+            self._kafka_conf.update(
+                producer_settings(
+                    kafka_producer_profile,
+                    os.getenv("KAFKA_PRODUCER_OVERRIDES", ""),
+                )
+            )
+        except ValueError as ex:
+            log.error("Kafka producer settings are not valid: %s", ex)
+            sys.exit(1)
+        log.info(
+            "Kafka producer profile: %s",
+            kafka_producer_profile or "librdkafka defaults",
+        )
+
+        self._sources = load_sources()
+        if get_bool_env("CLUSTER_MODE"):
+            self._shard_coordinator = ShardCoordinator(
+                self._redis_connector,
+                replica_id=os.getenv("CLUSTER_REPLICA_ID")
+                or f"{socket.gethostname()}-{os.getpid()}",
+                service_name="sensor_publisher",
+                shard_count=get_int_env("CLUSTER_SHARDS", cnt.CLUSTER_SHARDS),
+                lease_ttl=get_float_env("CLUSTER_LEASE_TTL", cnt.CLUSTER_LEASE_TTL),
+                on_change=self._sync_subscriptions,
+            )
+        if get_bool_env("SUBSCRIBE_KNOWN_SENSORS", True):
+            subscription_chunk_size = get_int_env(
+                "WEBSOCKET_SUBSCRIPTION_CHUNK_SIZE", cnt.SUBSCRIPTION_CHUNK_SIZE
+            )
+            # A replica subscribing to all sensors would receive the other shards too
+            self._subscriptions = {
+                source.name: SensorSubscriptions(
+                    subscription_chunk_size,
+                    wildcard_fallback=self._shard_coordinator is None,
+                )
+                for source in self._sources
+            }
+        self._ping_interval = get_float_env(
+            "WEBSOCKET_PING_INTERVAL", cnt.WEBSOCKET_PING_INTERVAL
+        )
+        self._ping_timeout = get_float_env(
+            "WEBSOCKET_PING_TIMEOUT", cnt.WEBSOCKET_PING_TIMEOUT
+        )
+        self._reconnect_max_delay = get_float_env(
+            "WEBSOCKET_RECONNECT_MAX_DELAY", cnt.WEBSOCKET_RECONNECT_MAX_DELAY
+        )
+
+        self._sensor_data_queue = Queue(
+            maxsize=get_int_env("SENSOR_DATA_QUEUE_SIZE", cnt.SENSOR_DATA_QUEUE_SIZE)
+        )
+        self._worker_stall_timeout = get_int_env(
+            "WORKER_STALL_TIMEOUT", cnt.WORKER_STALL_TIMEOUT
+        )
+
+        self._unknown_sensors = NegativeCache(
+            ttl=get_int_env("NEGATIVE_CACHE_TTL", cnt.NEGATIVE_CACHE_TTL)
+        )
+        if get_bool_env("PARK_UNKNOWN_READINGS"):
+            self._parked_readings = ParkedReadings(
+                max_per_sensor=get_int_env(
+                    "PARKED_READINGS_PER_SENSOR", cnt.PARKED_READINGS_PER_SENSOR
+                ),
+                ttl=get_float_env("PARKED_READINGS_TTL", cnt.PARKED_READINGS_TTL),
+            )
+
+        self._dead_letter_topic = os.getenv("DEAD_LETTER_TOPIC", "").strip() or None
+        self._dead_letters = DeadLetterBuffer(
+            self._metrics,
+            enabled=self._dead_letter_topic is not None,
+            batch_size=get_int_env(
+                "DEAD_LETTER_BATCH_SIZE", cnt.DEAD_LETTER_BATCH_SIZE
+            ),
+            flush_interval=get_float_env(
+                "DEAD_LETTER_FLUSH_INTERVAL", cnt.DEAD_LETTER_FLUSH_INTERVAL
+            ),
+            rate_limit=get_float_env(
+                "DEAD_LETTER_RATE_LIMIT", cnt.DEAD_LETTER_RATE_LIMIT
+            ),
+        )
+
+        self._latest_value_store = LatestValueStore(
+            self._redis_connector,
+            flush_interval=get_int_env(
+                "LATEST_VALUE_FLUSH_INTERVAL_MS", cnt.LATEST_VALUE_FLUSH_INTERVAL_MS
+            )
+            / 1000,
+        )
+
+        rollup_windows = os.getenv("ROLLUP_WINDOWS", "")
+        if rollup_windows.strip():
+            try:
+                self._rollup_aggregator = RollupAggregator(rollup_windows.split(","))
+            except ValueError as ex:
+                log.error("Environment variable 'ROLLUP_WINDOWS' is not valid: %s", ex)
+                sys.exit(1)
+
+        self._initialise_derived_sensors(os.getenv("DERIVED_SENSORS_CONFIG", ""))
+
+        self._state_topic = os.getenv("SENSOR_STATE_TOPIC", "").strip() or None
+        self._state_throttle = KeyedThrottle(
+            get_int_env(
+                "SENSOR_STATE_MIN_INTERVAL_MS", cnt.SENSOR_STATE_MIN_INTERVAL_MS
+            )
+            / 1000
         )
-        self._headers = {"Authorization": f"Basic {encoded_credentials}"}
-        self._source_api_ws_url: str = os.getenv("SOURCE_API_WS_URL")
+        self._metadata_topic = os.getenv("SENSOR_METADATA_TOPIC", "").strip() or None
+
+        metadata_snapshot_path = os.getenv("METADATA_SNAPSHOT_PATH", "").strip()
+        if metadata_snapshot_path:
+            self._metadata_snapshot = MetadataSnapshot(metadata_snapshot_path)
+            self._metadata_snapshot.reload()
+
+        self._alerts_topic = os.getenv("ANOMALY_ALERTS_TOPIC", "").strip() or None
+        if self._alerts_topic is not None:
+            self._anomaly_detector = AnomalyDetector(
+                alpha=get_float_env("ANOMALY_EWMA_ALPHA", cnt.ANOMALY_EWMA_ALPHA),
+                warmup_readings=get_int_env(
+                    "ANOMALY_WARMUP_READINGS", cnt.ANOMALY_WARMUP_READINGS
+                ),
+                z_score=get_float_env("ANOMALY_Z_SCORE", cnt.ANOMALY_Z_SCORE),
+                stuck_seconds=get_float_env(
+                    "ANOMALY_STUCK_SECONDS", cnt.ANOMALY_STUCK_SECONDS
+                ),
+            )
+            self._anomaly_queue = Queue(
+                maxsize=get_int_env("ANOMALY_QUEUE_SIZE", cnt.ANOMALY_QUEUE_SIZE)
+            )
+
+        self._initialise_payload_formats()
+        self._initialise_producer(verify_topics=get_bool_env("KAFKA_VERIFY_TOPICS"))
 
         log.info("Sensor Publisher Connector initialised")
 
-    def _process_websocket_msg(self, msg_dict: dict):
-        """It processes a web socket message and adds sensor key and sensor value to a queue.
+    def _initialise_derived_sensors(self, path: str):
+        """Reads the definitions of the derived sensors, if configured.
+
+        Args:
+            path (str): the path of the JSON definitions, empty to disable them.
+        """
+
+        if not path.strip():
+            return
+        if self._shard_coordinator is not None:
+            # A replica only sees the inputs of its own shards
+            log.warning("Derived sensors are not supported in cluster mode")
+            return
+
+        try:
+            derived_sensors = load_derived_sensors(path)
+        except (OSError, ValueError) as ex:
+            log.error("Derived sensor definitions are not valid: %s", ex)
+            sys.exit(1)
+
+        self._derived_sensors = DerivedSensorEngine(derived_sensors)
+        log.info("Loaded %d derived sensors", len(derived_sensors))
+
+    def _initialise_payload_formats(self):
+        """Reads the payload format of each topic and creates their serialisers.
+        Topics use JSON unless configured otherwise. The formats only apply to
+        the reading topics: the rollup, alerts, metadata and dead-letter records
+        have their own fields and are always published as JSON.
+        """
+
+        self._default_payload_format = os.getenv("KAFKA_PAYLOAD_FORMAT") or JSON_FORMAT
+
+        topic_payload_formats = os.getenv("KAFKA_TOPIC_PAYLOAD_FORMATS", "")
+        for topic_payload_format in topic_payload_formats.split(","):
+            if not topic_payload_format.strip():
+                continue
+
+            topic_name, _, payload_format = topic_payload_format.partition(":")
+            self._topic_payload_formats[topic_name.strip()] = payload_format.strip()
+
+        json_topic_names = self._json_topic_names().intersection(
+            topic_name
+            for topic_name, payload_format in self._topic_payload_formats.items()
+            if payload_format != JSON_FORMAT
+        )
+        if json_topic_names:
+            log.error(
+                "Kafka payload formats are not valid: topic '%s' is always JSON",
+                sorted(json_topic_names)[0],
+            )
+            sys.exit(1)
+
+        try:
+            self._serialisers = create_serialisers(
+                registry_path=os.getenv(
+                    "SCHEMA_REGISTRY_PATH", cnt.SCHEMA_REGISTRY_PATH
+                ),
+                payload_formats=[self._default_payload_format]
+                + list(self._topic_payload_formats.values()),
+            )
+        except (ValueError, ImportError) as ex:
+            log.error("Kafka payload formats are not valid: %s", ex)
+            sys.exit(1)
+
+    def _json_topic_names(self) -> Set[str]:
+        """Returns the topics whose records are not readings, always published as JSON.
+
+        Returns:
+            Set[str]: the topic names.
+        """
+
+        topic_names = {
+            topic_name
+            for topic_name in (
+                self._dead_letter_topic,
+                self._alerts_topic,
+                self._metadata_topic,
+            )
+            if topic_name is not None
+        }
+        if self._rollup_aggregator is not None:
+            for source in self._sources:
+                for building_name in cnt.BUILDING_NAMES:
+                    topic_name = self._get_topic_name(building_name, source.name)
+                    topic_names.update(
+                        rollup_topic_name(topic_name, window_name)
+                        for window_name in self._rollup_aggregator.window_names
+                    )
+
+        return topic_names
+
+    def _serialise(self, topic_name: str, sensor_data: dict) -> Tuple[bytes, Headers]:
+        """Serialises a message in the payload format of its topic.
+
+        Args:
+            topic_name (str): the topic of the message.
+            sensor_data (dict): the message to publish.
+
+        Returns:
+            Tuple[bytes, Headers]: the payload and headers of the message.
+        """
+
+        payload_format = self._topic_payload_formats.get(
+            topic_name, self._default_payload_format
+        )
+
+        return self._serialisers[payload_format].serialise(sensor_data)
+
+    def _enqueue(self, reading: Reading):
+        """Adds a sensor reading to the publish queue.
+        When the queue is full, e.g. because Kafka is unreachable, the oldest reading
+        is dropped so that memory stays bounded and the newest values get through.
+
+        Args:
+            reading (Reading): the sensor reading.
+        """
+
+        while True:
+            try:
+                self._sensor_data_queue.put_nowait(reading)
+                return
+            except Full:
+                try:
+                    self._sensor_data_queue.get_nowait()
+                except Empty:
+                    continue
+                self._metrics.increment("readings_dropped")
+
+    def _process_websocket_msg(self, msg_dict: dict, key_prefix: str = ""):
+        """It processes a web socket message and adds a sensor reading to a queue.
+        Rejected data messages go to the dead-letter buffer.
 
         Args:
             msg_dict (dict): A message with sensor key and value received from the Server.
+            key_prefix (str): the prefix namespacing the sensor keys of the Server.
         """
 
+        # Subscription responses and other control messages are not readings
+        is_data_message = msg_dict.get("type") == "push"
+        source_name = key_prefix.rstrip(SOURCE_KEY_SEPARATOR) or DEFAULT_SOURCE_NAME
+
         sensor_key: str = msg_dict.get("subscription", {}).get("key")
         if not sensor_key:
             log.debug("Bad format of Sensor Key %s", sensor_key)
+            if is_data_message:
+                self._dead_letters.add(MISSING_SENSOR_KEY, msg_dict, source_name)
+            return
+
+        if not self._handles(key_prefix + sensor_key):
+            self._metrics.increment("readings_of_other_shards")
             return
 
         sensor_value = msg_dict.get("data", {}).get("value")
@@ -75,30 +407,36 @@ class SensorPublisher:
                 sensor_key,
                 sensor_value,
             )
+            if is_data_message:
+                self._dead_letters.add(MISSING_VALUE, msg_dict, source_name)
             return
 
         try:
             sensor_value = round(float(sensor_value), 3)
-        except ValueError:
+        except (TypeError, ValueError):
             log.debug(
                 "Can't convert Sensor Value into float for Sensor Key '%s': %s",
                 sensor_key,
                 sensor_value,
             )
+            if is_data_message:
+                self._dead_letters.add(NON_NUMERIC_VALUE, msg_dict, source_name)
             return
 
-        self._sensor_data_queue.put(
-            {cnt.SENSOR_KEY: sensor_key, cnt.LAST_SHARED_VALUE: sensor_value}
-        )
-        log.debug(
-            "Sensor Key '%s' and Sensor Value '%s' added to publish queue",
-            sensor_key,
-            sensor_value,
-        )
+        self._enqueue(Reading(key_prefix + sensor_key, sensor_value))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(
+                "Sensor Key '%s' and Sensor Value '%s' added to publish queue",
+                sensor_key,
+                sensor_value,
+            )
 
-    def _connect_to_websocket(self):
+    def _connect_to_websocket(self, source: Source):
         """Create a web socket connection
 
+        Args:
+            source (Source): the Gira Home Server to connect to.
+
         Returns:
             web_socket_connection (WebSocket): the websocket connection needed to receive data.
         """
@@ -108,60 +446,244 @@ class SensorPublisher:
         ssl_context.check_hostname = False
         ssl_context.verify_mode = ssl.CERT_NONE
 
+        # Reads time out when the server is silent, so that a ping can be sent.
+        # Subscriptions are also updated from the metadata updates thread
         web_socket_connection = create_connection(
-            self._source_api_ws_url,
-            header=self._headers,
+            source.ws_url,
+            header=source.headers,
             sslopt={"context": ssl_context},
+            timeout=self._ping_interval,
+            enable_multithread=True,
         )
-        log.info("WebSocket connected")
+        log.info("WebSocket connected to source %s", source.name)
 
-        # Send the subscription message
-        web_socket_connection.send(json.dumps(cnt.INITIAL_SUBSCRIPTION_PAYLOAD))
-        log.info("WebSocket subscribed")
+        # Send the subscription messages
+        subscriptions = self._subscriptions.get(source.name)
+        if subscriptions is None:
+            web_socket_connection.send(json.dumps(cnt.INITIAL_SUBSCRIPTION_PAYLOAD))
+            log.info("WebSocket subscribed")
+        else:
+            subscriptions.connected(
+                web_socket_connection, self._known_sensor_keys(source)
+            )
 
         # The first message contains the last shared value for all sensors
-        subscription_response = json.loads(web_socket_connection.recv())
+        subscription_response = json.loads(self._recv_message(web_socket_connection))
         log.debug("WebSocket subscription response: %s", subscription_response)
 
         return web_socket_connection
 
-    def _receive_sensor_data(self):
-        """Periodally wait for incoming sensor value messages from the Web Socket"""
+    def _known_sensor_keys(self, source: Source) -> List[str]:
+        """Returns the Gira keys of the sensors of a source known to the Sensor Cache.
+
+        Args:
+            source (Source): the Gira Home Server.
+
+        Returns:
+            List[str]: the Gira sensor keys, e.g. ['CO@9_4_81'].
+        """
+
+        known_sensor_keys = []
+        for sensor_key in self._redis_connector.members(cnt.KNOWN_SENSOR_KEYS):
+            source_name, gira_sensor_key = split_sensor_key(sensor_key)
+            if source_name == source.name and self._handles(sensor_key):
+                known_sensor_keys.append(gira_sensor_key)
+
+        return known_sensor_keys
+
+    def _handles(self, sensor_key: str) -> bool:
+        """Whether this publisher handles a sensor: always, unless in cluster mode,
+        where only the sensors of the shards owned by this replica are handled.
+
+        Args:
+            sensor_key (str): the sensor key.
+
+        Returns:
+            bool: whether the readings of the sensor are published by this replica.
+        """
+
+        return self._shard_coordinator is None or self._shard_coordinator.owns(
+            sensor_key
+        )
+
+    def _sync_subscriptions(self):
+        """Subscribes to the known sensors of the shards owned by this replica
+        only, after the owned shards have changed.
+        """
+
+        for source in self._sources:
+            subscriptions = self._subscriptions.get(source.name)
+            if subscriptions is not None:
+                subscriptions.sync(self._known_sensor_keys(source))
+
+    def _update_subscriptions(self, update: dict):
+        """Subscribes to the sensors stored by the Sensor Cache and unsubscribes
+        from the removed ones.
+
+        Args:
+            update (dict): the metadata update published by the Sensor Cache.
+        """
+
+        if not self._subscriptions:
+            return
+
+        for update_field, subscribe in (
+            (cnt.UPDATED_SENSOR_KEYS, True),
+            (cnt.REMOVED_SENSOR_KEYS, False),
+        ):
+            source_sensor_keys: Dict[str, List[str]] = {}
+            for sensor_key in update.get(update_field, []):
+                if subscribe and not self._handles(sensor_key):
+                    continue
+                source_name, gira_sensor_key = split_sensor_key(sensor_key)
+                source_sensor_keys.setdefault(source_name, []).append(gira_sensor_key)
+
+            for source_name, gira_sensor_keys in source_sensor_keys.items():
+                subscriptions = self._subscriptions.get(source_name)
+                if subscriptions is None:
+                    continue
+                if subscribe:
+                    subscriptions.add(gira_sensor_keys)
+                else:
+                    subscriptions.remove(gira_sensor_keys)
+
+    def _recv_message(self, web_socket_connection: WebSocket):
+        """Waits for the next data message from the web socket.
+        When the server is silent for the ping interval, a ping is sent, and
+        the connection is considered dead if nothing arrives within the ping timeout.
+
+        Args:
+            web_socket_connection (WebSocket): the websocket connection.
+
+        Returns:
+            Union[str, bytes]: the message, decoded if it's a text message.
+
+        Raises:
+            WebSocketTimeoutException: if the server doesn't answer a ping.
+            WebSocketConnectionClosedException: if the server closes the connection.
+        """
+
+        ping_sent = False
 
         while True:
             try:
+                opcode, data = web_socket_connection.recv_data(control_frame=True)
+            except WebSocketTimeoutException:
+                if ping_sent:
+                    raise WebSocketTimeoutException(
+                        f"No answer to ping within {self._ping_timeout}s"
+                    )
+
+                web_socket_connection.ping()
+                web_socket_connection.settimeout(self._ping_timeout)
+                ping_sent = True
+                continue
+
+            # Any frame proves the connection is alive
+            if ping_sent:
+                web_socket_connection.settimeout(self._ping_interval)
+                ping_sent = False
+
+            if opcode == ABNF.OPCODE_CLOSE:
+                raise WebSocketConnectionClosedException("Connection closed by server")
+            if opcode == ABNF.OPCODE_TEXT:
+                return data.decode("utf-8")
+            if opcode == ABNF.OPCODE_BINARY:
+                return data
+
+    def _report_gap(self, source: Source, gap_report: Optional[dict]):
+        """Logs and counts the gap in the sensor data caused by a disconnection.
+
+        Args:
+            source (Source): the disconnected Gira Home Server.
+            gap_report (Optional[dict]): the gap report, None on the first connection.
+        """
+
+        if gap_report is None:
+            return
+
+        log.warning(
+            "WebSocket data gap of %.1fs from source %s, about %d messages missed",
+            gap_report["gap_seconds"],
+            source.name,
+            gap_report["estimated_missed_messages"],
+        )
+        self._metrics.increment("websocket_reconnects")
+        self._metrics.increment("websocket_gap_seconds", gap_report["gap_seconds"])
+        self._metrics.increment(
+            "websocket_missed_messages_estimate",
+            gap_report["estimated_missed_messages"],
+        )
+        self._metrics.set_gauge("websocket_last_gap_seconds", gap_report["gap_seconds"])
+
+    def _receive_sensor_data(self, source: Source, worker: WorkerHandle):
+        """Periodally wait for incoming sensor value messages from the Web Socket
+        of a Gira Home Server.
+        Dropped connections are retried straight away, then with exponential
+        backoff and jitter while the server stays unreachable.
+
+        Args:
+            source (Source): the Gira Home Server.
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        gap_tracker = GapTracker()
+
+        reconnect_backoff = ExponentialBackoff(
+            initial=cnt.WEBSOCKET_RECONNECT_INITIAL_DELAY,
+            maximum=self._reconnect_max_delay,
+            jitter=0.5,
+        )
+
+        while True:
+            web_socket_connection = None
+            try:
+                worker.beat()
                 log.info("Connecting to WebSocket...")
-                web_socket_connection = self._connect_to_websocket()
+                web_socket_connection = self._connect_to_websocket(source)
+                self._report_gap(source, gap_tracker.connected(time()))
                 log.info("Waiting for incoming messages...")
 
                 # Inner loop polls for messages
                 while True:
-                    try:
-                        msg = web_socket_connection.recv()
-                        if not (msg and isinstance(msg, str)):
-                            log.warning("Received unknown message type: %s", msg)
-                            continue
+                    msg = self._recv_message(web_socket_connection)
+                    worker.beat()
+                    gap_tracker.message()
+                    self._metrics.increment("websocket_messages")
+                    reconnect_backoff.reset()
+                    if not (msg and isinstance(msg, str)):
+                        log.warning("Received unknown message type: %s", msg)
+                        continue
 
+                    try:
                         msg_dict = json.loads(msg)
-                        self._process_websocket_msg(msg_dict)
+                        self._process_websocket_msg(msg_dict, source.key_prefix)
                     except json.JSONDecodeError as ex:
                         log.warning(
                             "Failed to decode JSON msg %s from WebSocket message: %s",
                             msg,
                             ex,
                         )
-                        continue
                     except Exception as ex:
                         log.warning("Exception while processing message: %s", ex)
-                        break
-            except (ConnectionError, WebSocketException) as ex:
+            except (OSError, WebSocketException, ValueError) as ex:
                 # For connection or client errors, reconnect
-                log.warning(
-                    "Reconnecting to %s in 5 seconds due to %s",
-                    self._source_api_ws_url,
-                    ex,
-                )
-                sleep(5)
+                reconnect_reason = ex
+            finally:
+                if source.name in self._subscriptions:
+                    self._subscriptions[source.name].disconnected()
+                if web_socket_connection is not None:
+                    web_socket_connection.close()
+
+            gap_tracker.disconnected(time())
+            reconnect_delay = reconnect_backoff.next_delay()
+            log.warning(
+                "Reconnecting to %s in %.1f seconds due to %s",
+                source.ws_url,
+                reconnect_delay,
+                reconnect_reason,
+            )
+            sleep(reconnect_delay)
 
     @staticmethod
     def _delivery_report(err, msg):
@@ -170,89 +692,683 @@ class SensorPublisher:
 
         if err is not None:
             log.error("Message delivery failed: %s", err)
-        else:
+        elif log.isEnabledFor(logging.DEBUG):
             log.debug("Message delivered: %s", msg.topic())
 
-    def _process_queue(self):
-        """Create an application connected to the Kafka cluster.
-        Then wait for sensor messages from the internal queue,
-        processes them and publish them to a Kafka topic.
+    def _get_topic_name(
+        self, building_name: str, source_name: str = DEFAULT_SOURCE_NAME
+    ) -> str:
+        """Returns the Kafka topic name of a building.
+        Buildings of sources other than the default one get the source name as prefix.
+
+        Args:
+            building_name (str): the building name, e.g. 'House 1'.
+            source_name (str): the name of the source of the building.
+
+        Returns:
+            str: the topic name, e.g. 'house_1' or 'site_b_house_1'.
+        """
+
+        topic_name = self._topic_names.get((source_name, building_name))
+        if topic_name is None:
+            topic_name = building_name.lower().replace(" ", "_")
+            if source_name != DEFAULT_SOURCE_NAME:
+                topic_name = f"{source_name}_{topic_name}"
+            self._topic_names[(source_name, building_name)] = topic_name
+
+        return topic_name
+
+    def _expected_topic_names(self) -> List[str]:
+        """Returns the topics this publisher is expected to write to: the topic of
+        every building of every source, their rollup topics, the dead-letter, alerts,
+        state and metadata topics and the topics with a specific payload format.
+
+        Returns:
+            List[str]: the sorted topic names.
+        """
+
+        topic_names = set(self._topic_payload_formats)
+        for topic_name in (
+            self._dead_letter_topic,
+            self._alerts_topic,
+            self._state_topic,
+            self._metadata_topic,
+        ):
+            if topic_name is not None:
+                topic_names.add(topic_name)
+
+        window_names = (
+            self._rollup_aggregator.window_names
+            if self._rollup_aggregator is not None
+            else []
+        )
+        for source in self._sources:
+            for building_name in cnt.BUILDING_NAMES:
+                topic_name = self._get_topic_name(building_name, source.name)
+                topic_names.add(topic_name)
+                topic_names.update(
+                    rollup_topic_name(topic_name, window_name)
+                    for window_name in window_names
+                )
+
+        return sorted(topic_names)
+
+    def _initialise_producer(self, verify_topics: bool = False):
+        """Creates the Kafka producer and fetches the metadata of the expected topics,
+        so that the first message to each topic doesn't wait for a metadata lookup.
+
+        Args:
+            verify_topics (bool): whether to exit if a topic doesn't exist
+                or the broker can't be reached.
         """
 
         log.info("Creating Kafka producer...")
-        producer = Producer(self._kafka_conf)
+        self._producer = Producer(self._kafka_conf)
         log.info("Kafka producer created")
 
+        topic_names = self._expected_topic_names()
+        started_at = time()
+        try:
+            # Asking for a single topic may auto-create it, so existence is checked
+            # against the metadata of all the topics first
+            existing_topics = self._producer.list_topics(
+                timeout=cnt.KAFKA_METADATA_TIMEOUT
+            ).topics
+            missing_topic_names = [
+                topic_name
+                for topic_name in topic_names
+                if topic_name not in existing_topics
+                or existing_topics[topic_name].error is not None
+            ]
+            for topic_name in set(topic_names).difference(missing_topic_names):
+                self._producer.list_topics(
+                    topic=topic_name, timeout=cnt.KAFKA_METADATA_TIMEOUT
+                )
+        except KafkaException as ex:
+            if verify_topics:
+                log.error("Failed to fetch the Kafka topic metadata: %s", ex)
+                sys.exit(1)
+            log.warning("Failed to fetch the Kafka topic metadata: %s", ex)
+            return
+
+        log.info(
+            "Fetched the metadata of %d Kafka topics in %.3fs",
+            len(topic_names) - len(missing_topic_names),
+            time() - started_at,
+        )
+        if not missing_topic_names:
+            return
+
+        if verify_topics:
+            log.error("Kafka topics not found: %s", missing_topic_names)
+            sys.exit(1)
+        log.warning("Kafka topics not found: %s", missing_topic_names)
+
+    def _process_queue_message(
+        self, reading: Reading, sensor_metadata: SensorMetadata
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """Enriches a sensor reading with the metadata of its sensor.
+
+        Args:
+            reading (Reading): the sensor reading received from the web socket.
+            sensor_metadata (SensorMetadata): the cached metadata of the sensor.
+
+        Returns:
+            Tuple[Optional[str], Optional[dict]]: the topic name and the message
+                to publish, or (None, None) if the reading is not valid.
+        """
+
+        if not reading.sensor_key or reading.value is None:
+            log.warning("Bad sensor reading: %s. Skipping.", reading)
+            return None, None
+
+        source_name, _ = split_sensor_key(reading.sensor_key)
+        topic_name = self._get_topic_name(sensor_metadata.building_name, source_name)
+
+        return topic_name, reading.to_dict(sensor_metadata)
+
+    def _handle_unknown_sensor(self, reading: Reading, negative_cache_hit: bool):
+        """Handles a reading of a sensor whose metadata is not in cache.
+        On a cache miss, the sensor is remembered in the negative cache and its metadata
+        is requested to the Sensor Cache. The reading is parked if enabled.
+
+        Args:
+            reading (Reading): the reading of the unknown sensor.
+            negative_cache_hit (bool): whether the miss was served by the negative cache.
+        """
+
+        if not negative_cache_hit:
+            log.debug(
+                "Sensor %s not found in cache. Requesting metadata", reading.sensor_key
+            )
+            self._unknown_sensors.add(reading.sensor_key)
+            self._redis_connector.push(cnt.METADATA_REQUESTS_KEY, reading.sensor_key)
+
+        if self._parked_readings is not None and self._parked_readings.park(reading):
+            return
+
+        log.debug(
+            "Sensor %s not found in cache. Missing metadata. Skipping",
+            reading.sensor_key,
+        )
+        self._dead_letters.add(
+            MISSING_METADATA,
+            {
+                cnt.SENSOR_KEY: reading.sensor_key,
+                cnt.LAST_SHARED_VALUE: reading.value,
+                cnt.LAST_SHARED_DATETIME: reading.timestamp,
+            },
+            split_sensor_key(reading.sensor_key)[0],
+        )
+
+    def _listen_metadata_updates(self, worker: WorkerHandle):
+        """Thread waiting for the sensor keys stored and removed by the Sensor Cache.
+        It clears them from the negative cache, re-publishes their parked readings,
+        keeps the web socket subscriptions in sync and publishes the metadata changes.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
         while True:
-            sensor_data: dict = self._sensor_data_queue.get()
-            log.debug("Received new data from queue: %s", sensor_data)
+            try:
+                if self._metadata_topic is not None:
+                    # The compacted topic starts from the full state
+                    self._publish_sensor_metadata(
+                        sorted(self._redis_connector.members(cnt.KNOWN_SENSOR_KEYS))
+                    )
 
-            sensor_key: str = sensor_data.get(cnt.SENSOR_KEY)
-            if not sensor_key:
-                log.warning("Missing sensor key in data: %s. Skipping.", sensor_data)
-                continue
+                for update in self._redis_connector.listen(
+                    cnt.METADATA_UPDATES_CHANNEL
+                ):
+                    worker.beat()
+                    self._update_subscriptions(update)
+                    removed_sensor_keys = update.get(cnt.REMOVED_SENSOR_KEYS, [])
+                    if self._derived_sensors is not None:
+                        self._derived_sensors.remove(removed_sensor_keys)
+                    if self._anomaly_detector is not None:
+                        self._anomaly_detector.remove(removed_sensor_keys)
+                    self._state_throttle.forget(removed_sensor_keys)
+                    if self._metadata_topic is not None:
+                        self._publish_sensor_metadata(
+                            update.get(cnt.UPDATED_SENSOR_KEYS, []),
+                            removed_sensor_keys,
+                        )
+                    self._override_snapshot(
+                        update.get(cnt.UPDATED_SENSOR_KEYS, []) + removed_sensor_keys
+                    )
+                    for sensor_key in update.get(cnt.UPDATED_SENSOR_KEYS, []):
+                        self._unknown_sensors.discard(sensor_key)
+                        if self._parked_readings is None:
+                            continue
 
-            cached_sensor_info: dict = self._redis_connector.get(sensor_key)
-            if not cached_sensor_info:
-                log.info(
-                    "Sensor %s not found in cache. Missing metadata. Skipping",
-                    sensor_key,
+                        for reading in self._parked_readings.release(sensor_key):
+                            self._enqueue(reading)
+            except Exception as ex:
+                log.warning(
+                    "Exception while listening to metadata updates: %s. "
+                    "Listening again in 5 seconds",
+                    ex,
                 )
-                continue
+                sleep(5)
 
-            last_shared_value: float = sensor_data.get(cnt.LAST_SHARED_VALUE)
-            sensor_house: str = cached_sensor_info.get(cnt.BUILDING_NAME)
+    def _override_snapshot(self, sensor_keys: List[str]):
+        """Looks up sensors changed by the Sensor Cache in Redis, until a snapshot
+        newer than their change is mapped.
 
-            cached_sensor_info.update(
-                {
-                    cnt.LAST_SHARED_VALUE: last_shared_value,
-                    cnt.LAST_SHARED_DATETIME: datetime.now().timestamp(),
-                }
-            )
+        Args:
+            sensor_keys (List[str]): the keys of the stored or removed sensors.
+        """
 
-            topic_name = sensor_house.lower().replace(" ", "_")
+        if self._metadata_snapshot is None or not sensor_keys:
+            return
 
+        now = time()
+        with self._snapshot_overrides_lock:
+            for sensor_key in sensor_keys:
+                self._snapshot_overrides[sensor_key] = now
+
+    def _reload_metadata_snapshot(self, worker: WorkerHandle):
+        """Thread mapping the new metadata snapshots written by the Sensor Cache,
+        which replace the older ones for the lookups that follow.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        reload_interval = get_float_env(
+            "METADATA_SNAPSHOT_RELOAD_INTERVAL", cnt.METADATA_SNAPSHOT_RELOAD_INTERVAL
+        )
+
+        while True:
+            worker.beat()
+            if self._metadata_snapshot.reload():
+                created_at = self._metadata_snapshot.created_at
+                with self._snapshot_overrides_lock:
+                    self._snapshot_overrides = {
+                        sensor_key: changed_at
+                        for sensor_key, changed_at in self._snapshot_overrides.items()
+                        if changed_at >= created_at
+                    }
+                self._metrics.set_gauge(
+                    "metadata_snapshot_version", self._metadata_snapshot.version
+                )
+            sleep(reload_interval)
+
+    def _get_sensor_metadata(self, sensor_key: str) -> Optional[SensorMetadata]:
+        """Looks up the metadata of a sensor in the snapshot mapped from the
+        Sensor Cache on the same host, falling back to Redis.
+
+        Args:
+            sensor_key (str): the sensor key.
+
+        Returns:
+            Optional[SensorMetadata]: the sensor metadata, None if the sensor is unknown.
+        """
+
+        if (
+            self._metadata_snapshot is not None
+            and sensor_key not in self._snapshot_overrides
+        ):
+            sensor_info = self._metadata_snapshot.get(sensor_key)
+            if sensor_info is not None:
+                return SensorMetadata.from_dict(sensor_info)
+            self._metrics.increment("metadata_snapshot_misses")
+
+        return self._redis_connector.get_sensor_metadata(sensor_key)
+
+    def _publish_rollups(self, rollup_records: List[Tuple[str, dict]]):
+        """Publishes the rollup records of closed windows to their rollup topics.
+
+        Args:
+            rollup_records (List[Tuple[str, dict]]): the topic and record of each sensor.
+        """
+
+        if not rollup_records:
+            return
+
+        for topic_name, rollup_record in rollup_records:
             try:
-                producer.produce(
+                self._producer.produce(
                     topic=topic_name,
-                    value=json.dumps(cached_sensor_info),
+                    key=rollup_record[cnt.SENSOR_KEY],
+                    value=json.dumps(rollup_record),
                     callback=self._delivery_report,
                 )
             except Exception as ex:
-                log.error("Got an exception while publishing to kafka: %s", ex)
+                log.error("Got an exception while publishing rollups: %s", ex)
+
+        self._producer.poll(0)
+        log.debug("Published %d rollup records", len(rollup_records))
+
+    def _detect_anomalies(self, worker: WorkerHandle):
+        """Thread checking the published readings for anomalies, off the publish path,
+        and publishing the anomaly events to the alerts topic.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        next_stuck_sweep = monotonic() + cnt.ANOMALY_STUCK_SWEEP_INTERVAL
+
+        while True:
+            worker.beat()
+            if monotonic() >= next_stuck_sweep:
+                # Sensors pushing on change go quiet when stuck
+                self._publish_anomalies(self._anomaly_detector.sweep_stuck(time()))
+                next_stuck_sweep = monotonic() + cnt.ANOMALY_STUCK_SWEEP_INTERVAL
+
+            try:
+                reading, sensor_metadata = self._anomaly_queue.get(timeout=1)
+            except Empty:
+                continue
+
+            self._publish_anomalies(
+                self._anomaly_detector.check(reading, sensor_metadata)
+            )
+
+    def _publish_anomalies(self, events: List[dict]):
+        """Publishes anomaly events to the alerts topic.
+
+        Args:
+            events (List[dict]): the anomaly events.
+        """
+
+        for event in events:
+            self._metrics.increment(f"anomalies_{event['anomaly']}")
+            try:
+                self._produce(
+                    self._alerts_topic, json.dumps(event).encode("utf-8"), None
+                )
+            except Exception as ex:
+                log.error("Got an exception while publishing an alert: %s", ex)
+
+    def _close_rollup_windows(self, worker: WorkerHandle):
+        """Thread that closes the rollup windows once they have ended,
+        even if no reading arrives afterwards.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        while True:
+            sleep(1)
+            worker.beat()
+            self._publish_rollups(self._rollup_aggregator.close_expired(time()))
+
+    def _produce(
+        self,
+        topic_name: str,
+        payload: Optional[bytes],
+        headers: Headers,
+        key: Optional[str] = None,
+    ):
+        """Hands a message over to the producer without waiting for its delivery,
+        so that the profile's linger and batch settings can take effect.
+        Delivery reports are served on every call.
+
+        Args:
+            topic_name (str): the topic of the message.
+            payload (Optional[bytes]): the message payload, None for a tombstone.
+            headers (Headers): the message headers.
+            key (Optional[str]): the message key, e.g. of compacted topics.
+        """
+
+        try:
+            self._producer.produce(
+                topic=topic_name,
+                key=key,
+                value=payload,
+                headers=headers,
+                callback=self._delivery_report,
+            )
+        except BufferError:
+            # The local queue is full: wait for some deliveries and try again
+            log.warning("Kafka producer queue is full. Waiting for deliveries")
+            self._producer.poll(1)
+            self._producer.produce(
+                topic=topic_name,
+                key=key,
+                value=payload,
+                headers=headers,
+                callback=self._delivery_report,
+            )
+
+        self._producer.poll(0)
+
+    def _publish_state(self, sensor_key: str, state: dict):
+        """Publishes the latest reading of a sensor to the compacted state topic,
+        keyed by sensor, so that consumers can bootstrap the current state.
+
+        Args:
+            sensor_key (str): the sensor key.
+            state (dict): the latest reading, without metadata.
+        """
+
+        try:
+            payload, headers = self._serialise(self._state_topic, state)
+            self._produce(self._state_topic, payload, headers, key=sensor_key)
+        except Exception as ex:
+            log.error("Got an exception while publishing a sensor state: %s", ex)
+            return
+
+        self._metrics.increment("sensor_states_published")
+
+    def _release_states(self):
+        """Publishes the states held back by the minimum interval once it has elapsed."""
+
+        if self._state_topic is None:
+            return
+
+        for sensor_key, state in self._state_throttle.release(monotonic()):
+            self._publish_state(sensor_key, state)
+
+    def _publish_sensor_metadata(
+        self, sensor_keys: List[str], removed_sensor_keys: List[str] = ()
+    ):
+        """Publishes the metadata of sensors to the compacted metadata topic, keyed by
+        sensor, and tombstones for the removed sensors.
+        In cluster mode, each replica publishes the sensors of its own shards.
+
+        Args:
+            sensor_keys (List[str]): the keys of the stored or updated sensors.
+            removed_sensor_keys (List[str]): the keys of the removed sensors.
+        """
+
+        sensor_keys = [
+            sensor_key for sensor_key in sensor_keys if self._handles(sensor_key)
+        ]
+        for start in range(0, len(sensor_keys), cnt.WARM_UP_BATCH_SIZE):
+            batch = sensor_keys[start : start + cnt.WARM_UP_BATCH_SIZE]
+            for sensor_key, sensor_info in zip(
+                batch, self._redis_connector.get_many(batch)
+            ):
+                if sensor_info:
+                    self._produce(
+                        self._metadata_topic,
+                        json.dumps(sensor_info).encode("utf-8"),
+                        None,
+                        key=sensor_key,
+                    )
+
+        for sensor_key in removed_sensor_keys:
+            if self._handles(sensor_key):
+                self._produce(self._metadata_topic, None, None, key=sensor_key)
+
+    def _publish_dead_letters(self):
+        """Publishes the buffered rejected records to the dead-letter topic when
+        a batch is due, one message per batch.
+        """
+
+        if not self._dead_letters.is_due():
+            return
+
+        for dead_letter_batch in self._dead_letters.drain():
+            try:
+                payload = json.dumps(dead_letter_batch, default=str).encode("utf-8")
+                self._produce(self._dead_letter_topic, payload, None)
+            except Exception as ex:
+                log.error("Got an exception while publishing dead letters: %s", ex)
+                self._metrics.increment("dead_letters_dropped", len(dead_letter_batch))
                 continue
 
-            producer.flush()
+            self._metrics.increment("dead_letters_published", len(dead_letter_batch))
+
+    def _publish_reading(
+        self,
+        reading: Reading,
+        sensor_metadata: SensorMetadata,
+        debug_enabled: bool = False,
+    ) -> bool:
+        """Publishes a reading enriched with its metadata to the topic of its building,
+        then updates its latest value, rollups and state.
+
+        Args:
+            reading (Reading): the sensor reading.
+            sensor_metadata (SensorMetadata): the metadata of the sensor.
+            debug_enabled (bool): whether to log the published message.
+
+        Returns:
+            bool: whether the reading has been published.
+        """
+
+        topic_name, sensor_data = self._process_queue_message(reading, sensor_metadata)
+        if not topic_name:
+            return False
+
+        try:
+            payload, headers = self._serialise(topic_name, sensor_data)
+            self._produce(topic_name, payload, headers)
+        except Exception as ex:
+            log.error("Got an exception while publishing to kafka: %s", ex)
+            return False
+
+        self._latest_value_store.update(sensor_metadata.building_name, reading)
+        if self._rollup_aggregator is not None:
+            self._publish_rollups(self._rollup_aggregator.add(topic_name, reading))
+        if self._state_topic is not None:
+            state = reading.to_dict()
+            if self._state_throttle.offer(reading.sensor_key, state, monotonic()):
+                self._publish_state(reading.sensor_key, state)
+        if debug_enabled:
             log.debug(
                 "Data published successfully to topic %s: %s",
                 topic_name,
-                cached_sensor_info,
+                sensor_data,
             )
 
-    def _publish_sensor_data(self):
-        """Creates an iterator that iterates when exceptions are raised.
-        It starts processing the internal queue and publishes data to Kafka topics.
+        return True
+
+    def _publish_derived_readings(
+        self,
+        reading: Reading,
+        sensor_metadata: SensorMetadata,
+        debug_enabled: bool = False,
+    ):
+        """Publishes the readings of the derived sensors a reading is an input of.
+
+        Args:
+            reading (Reading): the published sensor reading.
+            sensor_metadata (SensorMetadata): the metadata of the sensor.
+            debug_enabled (bool): whether to log the published messages.
         """
 
-        max_retries = 3
-        retry_delay = 5
+        for derived_reading, derived_metadata in self._derived_sensors.add(
+            reading, sensor_metadata
+        ):
+            if self._publish_reading(derived_reading, derived_metadata, debug_enabled):
+                self._metrics.increment("derived_readings")
+
+    def _process_queue(self, worker: WorkerHandle):
+        """Wait for sensor messages from the internal queue,
+        processes them and publish them to a Kafka topic.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
 
-        for attempt in range(max_retries):
+        while True:
+            worker.beat()
+            self._publish_dead_letters()
+            self._release_states()
             try:
-                self._process_queue()
-            except Exception as ex:
-                log.error("Raised exception in publish_sensor_data %s", ex)
-                log.debug(
-                    "Attempting to reconnect in %ds (attempt n. %d)",
-                    retry_delay,
-                    attempt,
+                reading: Reading = self._sensor_data_queue.get(timeout=1)
+            except Empty:
+                # Serve the delivery reports while idle
+                self._producer.poll(0)
+                continue
+            # Checked once per reading, so that disabled DEBUG costs nothing
+            debug_enabled = log.isEnabledFor(logging.DEBUG)
+            if debug_enabled:
+                log.debug("Received new data from queue: %s", reading)
+
+            sensor_key: str = reading.sensor_key
+            if not sensor_key:
+                log.warning("Missing sensor key in data: %s. Skipping.", reading)
+                continue
+
+            if sensor_key in self._unknown_sensors:
+                self._handle_unknown_sensor(reading, negative_cache_hit=True)
+                continue
+
+            sensor_metadata = self._get_sensor_metadata(sensor_key)
+            if not sensor_metadata:
+                self._handle_unknown_sensor(reading, negative_cache_hit=False)
+                continue
+
+            if not self._publish_reading(reading, sensor_metadata, debug_enabled):
+                continue
+
+            if self._anomaly_queue is not None:
+                try:
+                    self._anomaly_queue.put_nowait((reading, sensor_metadata))
+                except Full:
+                    self._metrics.increment("anomaly_checks_dropped")
+
+            if self._derived_sensors is not None:
+                self._publish_derived_readings(reading, sensor_metadata, debug_enabled)
+
+    def _report_metrics(self, worker: WorkerHandle):
+        """Thread that periodically reports the metrics of the publisher.
+
+        Args:
+            worker (WorkerHandle): the handle to report progress to the supervisor.
+        """
+
+        metrics_report_interval = get_int_env(
+            "METRICS_REPORT_INTERVAL", cnt.METRICS_REPORT_INTERVAL
+        )
+
+        while True:
+            worker.beat()
+            self._metrics.set_gauge(
+                "publish_queue_size", self._sensor_data_queue.qsize()
+            )
+            if self._anomaly_queue is not None:
+                self._metrics.set_gauge(
+                    "anomaly_queue_size", self._anomaly_queue.qsize()
+                )
+            if self._rollup_aggregator is not None:
+                self._metrics.set_gauge(
+                    "rollup_late_readings", self._rollup_aggregator.late_readings
+                )
+            if self._parked_readings is not None:
+                self._metrics.set_gauge("parked_sensors", len(self._parked_readings))
+                self._metrics.set_gauge(
+                    "parked_readings_dropped", self._parked_readings.dropped
                 )
-                sleep(retry_delay)
+            if self._shard_coordinator is not None:
+                self._metrics.set_gauge(
+                    "cluster_owned_shards", len(self._shard_coordinator.owned_shards)
+                )
+                self._metrics.set_gauge(
+                    "cluster_replicas", self._shard_coordinator.replica_count
+                )
+            self._metrics.report(self._redis_connector)
+            sleep(metrics_report_interval)
 
     def start(self):
-        """Start the publish_sensor_data thread that publishes messages to Kafka.
-        Additionally starts the receive the sensor data from web socket.
+        """Starts the worker threads that receive sensor data from the web socket
+        and publish it to Kafka, and supervises them forever.
         """
 
-        Thread(target=self._publish_sensor_data, name="publish_sensor_data").start()
-        self._receive_sensor_data()
+        supervisor = Supervisor("sensor_publisher", self._redis_connector)
+        if self._shard_coordinator is not None:
+            # Claims the shards before the first subscription
+            self._shard_coordinator.refresh()
+            supervisor.add_worker("cluster_leases", self._shard_coordinator.run)
+        supervisor.add_worker(
+            "publish_sensor_data",
+            self._process_queue,
+            stall_timeout=self._worker_stall_timeout,
+        )
+        # Every source streams concurrently into the same publish queue
+        for source in self._sources:
+            supervisor.add_worker(
+                f"receive_sensor_data:{source.name}",
+                partial(self._receive_sensor_data, source),
+            )
+        supervisor.add_worker(
+            "write_latest_values",
+            self._latest_value_store.run,
+            stall_timeout=self._worker_stall_timeout,
+        )
+        if self._rollup_aggregator is not None:
+            supervisor.add_worker(
+                "close_rollup_windows",
+                self._close_rollup_windows,
+                stall_timeout=self._worker_stall_timeout,
+            )
+        if self._anomaly_detector is not None:
+            supervisor.add_worker(
+                "detect_anomalies",
+                self._detect_anomalies,
+                stall_timeout=self._worker_stall_timeout,
+            )
+        if self._metadata_snapshot is not None:
+            supervisor.add_worker(
+                "reload_metadata_snapshot", self._reload_metadata_snapshot
+            )
+        supervisor.add_worker("listen_metadata_updates", self._listen_metadata_updates)
+        supervisor.add_worker("report_metrics", self._report_metrics)
+        supervisor.run()
@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import constants as cnt
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+log = logging.getLogger(__name__)
+
+Headers = Optional[List[Tuple[str, bytes]]]
+
+JSON_FORMAT = "json"
+MSGPACK_FORMAT = "msgpack"
+MSGPACK_COMPACT_FORMAT = "msgpack-compact"
+
+SCHEMA_ID_HEADER = "schema_id"
+CONTENT_TYPE_HEADER = "content-type"
+MSGPACK_CONTENT_TYPE = b"application/x-msgpack"
+
+# Fields of the readings published to the building topics, in wire order,
+# before their range was added
+READING_FIELDS_V1 = [
+    cnt.SENSOR_KEY,
+    cnt.SENSOR_NAME,
+    cnt.BUILDING_NAME,
+    cnt.ROOM_NAME,
+    cnt.FLOOR_NAME,
+    cnt.SERVICE_TYPE,
+    cnt.OBJECT_NAME,
+    cnt.MEASUREMENT_TYPE,
+    cnt.UNIT_OF_MEASURE,
+    cnt.LAST_SHARED_VALUE,
+    cnt.LAST_SHARED_DATETIME,
+]
+# Fields of the readings published to the building topics, in wire order
+READING_FIELDS = READING_FIELDS_V1 + [cnt.MIN_VALUE, cnt.MAX_VALUE]
+# Fields of the compact readings, whose metadata is looked up by sensor key
+COMPACT_READING_FIELDS = [
+    cnt.SENSOR_KEY,
+    cnt.LAST_SHARED_VALUE,
+    cnt.LAST_SHARED_DATETIME,
+]
+# Schemas of the msgpack payload formats, in registration order. Schemas are only
+# ever appended, so that their ids don't change: the last schema of a format
+# is the one in use, the earlier ones stay registered for the older messages
+MSGPACK_SCHEMAS = [
+    (MSGPACK_FORMAT, "sensor_reading", READING_FIELDS_V1),
+    (MSGPACK_COMPACT_FORMAT, "sensor_reading_compact", COMPACT_READING_FIELDS),
+    (MSGPACK_FORMAT, "sensor_reading", READING_FIELDS),
+]
+
+
+class FileSchemaRegistry:
+    def __init__(self, path: str):
+        """Local, file-based stand-in of a schema registry.
+        Schemas are lists of field names identified by an integer id,
+        which is sent in the headers of each message so that consumers
+        can decode positional payloads.
+
+        Args:
+            path (str): the JSON file storing the schemas.
+        """
+
+        self._path = path
+        self._schemas: Dict[int, dict] = {}
+        self._lock = Lock()
+
+        if os.path.exists(path):
+            with open(path, "r") as schemas_file:
+                self._schemas = {
+                    int(schema_id): schema
+                    for schema_id, schema in json.load(schemas_file).items()
+                }
+
+    def register(self, name: str, fields: List[str]) -> int:
+        """Registers a schema, unless an identical one is already registered.
+
+        Args:
+            name (str): the schema name.
+            fields (List[str]): the field names, in wire order.
+
+        Returns:
+            int: the schema id.
+        """
+
+        schema = {"name": name, "fields": list(fields)}
+
+        with self._lock:
+            for schema_id, registered_schema in self._schemas.items():
+                if registered_schema == schema:
+                    return schema_id
+
+            schema_id = max(self._schemas, default=0) + 1
+            self._schemas[schema_id] = schema
+
+            # Write to a temporary file first, so that readers never see a partial file
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            temporary_path = f"{self._path}.tmp"
+            with open(temporary_path, "w") as schemas_file:
+                json.dump(self._schemas, schemas_file, indent=2)
+            os.replace(temporary_path, self._path)
+
+        log.info("Registered schema %d: %s", schema_id, schema)
+        return schema_id
+
+    def get(self, schema_id: int) -> Optional[dict]:
+        """Returns a registered schema.
+
+        Args:
+            schema_id (int): the schema id.
+
+        Returns:
+            Optional[dict]: the schema name and fields, None if it's not registered.
+        """
+
+        return self._schemas.get(schema_id)
+
+
+class JsonSerialiser:
+    """Serialises records as JSON objects, as expected by the existing consumers."""
+
+    def serialise(self, record: dict) -> Tuple[bytes, Headers]:
+        return json.dumps(record).encode("utf-8"), None
+
+
+class MsgpackSerialiser:
+    def __init__(self, registry: FileSchemaRegistry, name: str, fields: List[str]):
+        """Serialises records as msgpack arrays of their values in schema order,
+        so that field names are not repeated on every message.
+
+        Args:
+            registry (FileSchemaRegistry): the registry of the schema.
+            name (str): the schema name.
+            fields (List[str]): the field names, in wire order.
+        """
+
+        if msgpack is None:
+            raise ImportError(
+                "The 'msgpack' package is needed by the msgpack payload formats"
+            )
+
+        self._fields = fields
+        self._schema_id = registry.register(name, fields)
+        self._headers = [
+            (SCHEMA_ID_HEADER, str(self._schema_id).encode("utf-8")),
+            (CONTENT_TYPE_HEADER, MSGPACK_CONTENT_TYPE),
+        ]
+
+    def serialise(self, record: dict) -> Tuple[bytes, Headers]:
+        return (
+            msgpack.packb([record.get(field) for field in self._fields]),
+            self._headers,
+        )
+
+
+def decode_msgpack(registry: FileSchemaRegistry, payload: bytes, headers) -> dict:
+    """Decodes a msgpack payload back into a record, e.g. on the consumer side.
+
+    Args:
+        registry (FileSchemaRegistry): the registry of the schema.
+        payload (bytes): the message payload.
+        headers (List[Tuple[str, bytes]]): the message headers.
+
+    Returns:
+        dict: the record, keyed by the schema field names.
+    """
+
+    schema_id = int(dict(headers)[SCHEMA_ID_HEADER])
+    schema = registry.get(schema_id)
+    if schema is None:
+        raise KeyError(f"Unknown schema id {schema_id}")
+
+    return dict(zip(schema["fields"], msgpack.unpackb(payload)))
+
+
+def create_serialisers(registry_path: str, payload_formats: List[str]) -> Dict:
+    """Creates the serialisers of the given payload formats.
+
+    Args:
+        registry_path (str): the JSON file of the local schema registry.
+        payload_formats (List[str]): the payload formats in use.
+
+    Returns:
+        Dict: the serialisers, by payload format.
+
+    Raises:
+        ValueError: if a payload format is unknown.
+        ImportError: if a payload format needs a missing package.
+    """
+
+    serialisers = {JSON_FORMAT: JsonSerialiser()}
+
+    msgpack_formats = set(payload_formats) - {JSON_FORMAT}
+    unknown_formats = msgpack_formats.difference(
+        payload_format for payload_format, _, _ in MSGPACK_SCHEMAS
+    )
+    if unknown_formats:
+        raise ValueError(f"Unknown payload format '{sorted(unknown_formats)[0]}'")
+    if not msgpack_formats:
+        return serialisers
+
+    registry = FileSchemaRegistry(registry_path)
+    # All the schemas are registered in the same order, whatever the formats in use,
+    # so that a registry gets the same schema ids in every deployment
+    for payload_format, schema_name, fields in MSGPACK_SCHEMAS:
+        serialiser = MsgpackSerialiser(registry, schema_name, fields)
+        if payload_format in msgpack_formats:
+            serialisers[payload_format] = serialiser
+
+    return serialisers
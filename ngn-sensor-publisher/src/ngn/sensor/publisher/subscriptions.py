@@ -0,0 +1,172 @@
+import json
+import logging
+from threading import RLock
+from typing import Iterable, List, Optional, Set
+
+import constants as cnt
+from websocket import WebSocket, WebSocketException
+
+log = logging.getLogger(__name__)
+
+
+def subscription_payloads(
+    sensor_keys: Iterable[str],
+    chunk_size: int = cnt.SUBSCRIPTION_CHUNK_SIZE,
+    message_type: str = "subscribe",
+) -> List[dict]:
+    """Builds the messages (un)subscribing from a list of sensor keys,
+    with at most 'chunk_size' keys each.
+
+    Args:
+        sensor_keys (Iterable[str]): the Gira sensor keys, e.g. ['CO@9_4_81'].
+        chunk_size (int): the maximum number of keys in a message.
+        message_type (str): 'subscribe' or 'unsubscribe'.
+
+    Returns:
+        List[dict]: the messages to send to the web socket.
+    """
+
+    sensor_keys = sorted(sensor_keys)
+    chunk_size = max(1, chunk_size)
+
+    return [
+        {
+            "type": message_type,
+            "param": {
+                "keys": sensor_keys[start : start + chunk_size],
+                "context": cnt.SUBSCRIPTION_CONTEXT,
+            },
+        }
+        for start in range(0, len(sensor_keys), chunk_size)
+    ]
+
+
+class SensorSubscriptions:
+    def __init__(
+        self,
+        chunk_size: int = cnt.SUBSCRIPTION_CHUNK_SIZE,
+        wildcard_fallback: bool = True,
+    ):
+        """Keeps the web socket of a Gira Home Server subscribed to the sensors
+        known to the Sensor Cache only, instead of all of them.
+        Falls back to the wildcard subscription while no sensor is known.
+
+        Args:
+            chunk_size (int): the maximum number of keys in a subscription message.
+            wildcard_fallback (bool): whether to subscribe to all sensors
+                while no sensor is known.
+        """
+
+        self.chunk_size = chunk_size
+        self.wildcard_fallback = wildcard_fallback
+        self.sensor_keys: Set[str] = set()
+        self.wildcard = False
+        self._connection: Optional[WebSocket] = None
+        self._lock = RLock()
+
+    def connected(self, connection: WebSocket, sensor_keys: Iterable[str]):
+        """Subscribes a new connection to the given sensors.
+
+        Args:
+            connection (WebSocket): the web socket connection.
+            sensor_keys (Iterable[str]): the Gira keys of the known sensors.
+        """
+
+        with self._lock:
+            self._connection = connection
+            self.sensor_keys = set(sensor_keys)
+            self.wildcard = self.wildcard_fallback and not self.sensor_keys
+            if self.wildcard:
+                self._send([cnt.INITIAL_SUBSCRIPTION_PAYLOAD])
+            else:
+                self._send(subscription_payloads(self.sensor_keys, self.chunk_size))
+
+        log.info(
+            "WebSocket subscribed to %s",
+            "all sensors" if self.wildcard else f"{len(self.sensor_keys)} sensors",
+        )
+
+    def disconnected(self):
+        """Forgets the connection, the next one subscribes again from scratch."""
+
+        with self._lock:
+            self._connection = None
+
+    def add(self, sensor_keys: Iterable[str]):
+        """Subscribes to sensors newly stored by the Sensor Cache.
+        The first ones replace the wildcard subscription.
+
+        Args:
+            sensor_keys (Iterable[str]): the Gira sensor keys.
+        """
+
+        with self._lock:
+            new_sensor_keys = set(sensor_keys).difference(self.sensor_keys)
+            if not new_sensor_keys:
+                return
+
+            self.sensor_keys.update(new_sensor_keys)
+            if self._connection is None:
+                return
+
+            # Subscribing before unsubscribing the wildcard never leaves a gap
+            self._send(subscription_payloads(new_sensor_keys, self.chunk_size))
+            if self.wildcard:
+                self._send(
+                    subscription_payloads(
+                        [cnt.WILDCARD_SUBSCRIPTION_KEY], message_type="unsubscribe"
+                    )
+                )
+                self.wildcard = False
+
+    def remove(self, sensor_keys: Iterable[str]):
+        """Unsubscribes from sensors removed from the Sensor Cache.
+
+        Args:
+            sensor_keys (Iterable[str]): the Gira sensor keys.
+        """
+
+        with self._lock:
+            removed_sensor_keys = self.sensor_keys.intersection(sensor_keys)
+            if not removed_sensor_keys:
+                return
+
+            self.sensor_keys.difference_update(removed_sensor_keys)
+            if self._connection is None or self.wildcard:
+                return
+
+            self._send(
+                subscription_payloads(
+                    removed_sensor_keys, self.chunk_size, message_type="unsubscribe"
+                )
+            )
+
+    def sync(self, sensor_keys: Iterable[str]):
+        """Subscribes to exactly the given sensors, e.g. after the shards
+        owned by this replica have changed.
+
+        Args:
+            sensor_keys (Iterable[str]): the Gira sensor keys.
+        """
+
+        sensor_keys = set(sensor_keys)
+        with self._lock:
+            self.add(sensor_keys)
+            self.remove(self.sensor_keys - sensor_keys)
+
+    def _send(self, payloads: List[dict]):
+        """Sends messages to the connection, if any. A failed send is left to the
+        receiving thread, which reconnects and subscribes again.
+
+        Args:
+            payloads (List[dict]): the messages to send.
+        """
+
+        if self._connection is None:
+            return
+
+        try:
+            for payload in payloads:
+                self._connection.send(json.dumps(payload))
+        except (OSError, WebSocketException) as ex:
+            log.warning("Failed to update WebSocket subscriptions: %s", ex)
@@ -0,0 +1,153 @@
+import logging
+from collections import deque
+from threading import Lock
+from time import monotonic
+from typing import Deque, Dict, List
+
+from sensor_types import Reading
+
+log = logging.getLogger(__name__)
+
+
+class NegativeCache:
+    def __init__(self, ttl: float, max_size: int = 100000):
+        """Remembers for a short time the sensor keys missing from the cache,
+        so that readings of unknown sensors don't hit Redis on every message.
+
+        Args:
+            ttl (float): seconds after which a missing sensor key is looked up again.
+            max_size (int): maximum number of sensor keys to remember.
+        """
+
+        self._ttl = ttl
+        self._max_size = max_size
+        self._expiries: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def __contains__(self, sensor_key: str) -> bool:
+        with self._lock:
+            expiry = self._expiries.get(sensor_key)
+            if expiry is None:
+                return False
+
+            if expiry <= monotonic():
+                del self._expiries[sensor_key]
+                return False
+
+            return True
+
+    def __len__(self) -> int:
+        return len(self._expiries)
+
+    def add(self, sensor_key: str):
+        """Remembers a sensor key as missing for the configured TTL.
+
+        Args:
+            sensor_key (str): the missing sensor key.
+        """
+
+        now = monotonic()
+
+        with self._lock:
+            self._expiries.pop(sensor_key, None)
+            self._expiries[sensor_key] = now + self._ttl
+
+            if len(self._expiries) > self._max_size:
+                # Entries are in insertion order, so expired ones come first
+                for expired_key in list(self._expiries):
+                    if len(self._expiries) <= self._max_size:
+                        break
+                    if self._expiries[expired_key] > now:
+                        log.warning(
+                            "Negative cache full. Forgetting sensor %s", expired_key
+                        )
+                    del self._expiries[expired_key]
+
+    def discard(self, sensor_key: str):
+        """Forgets a missing sensor key, e.g. because its metadata has been stored.
+
+        Args:
+            sensor_key (str): the sensor key.
+        """
+
+        with self._lock:
+            self._expiries.pop(sensor_key, None)
+
+
+class ParkedReadings:
+    def __init__(self, max_per_sensor: int, max_sensors: int = 10000, ttl: float = 60):
+        """Keeps the latest readings of sensors whose metadata is not cached yet,
+        so that they can be published once the metadata arrives.
+        Sensors whose metadata doesn't arrive within the TTL are dropped,
+        so that they don't hold their slot forever.
+
+        Args:
+            max_per_sensor (int): maximum number of readings kept per sensor.
+            max_sensors (int): maximum number of sensors with parked readings.
+            ttl (float): seconds after the first parked reading of a sensor
+                after which its readings are dropped.
+        """
+
+        self._max_per_sensor = max_per_sensor
+        self._max_sensors = max_sensors
+        self._ttl = ttl
+        self._readings: Dict[str, Deque[Reading]] = {}
+        # Monotonic time each sensor was parked at, oldest first
+        self._parked_at: Dict[str, float] = {}
+        self._lock = Lock()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._readings)
+
+    def park(self, reading: Reading) -> bool:
+        """Parks a reading until the metadata of its sensor arrives.
+        Only the latest readings of each sensor are kept.
+
+        Args:
+            reading (Reading): the reading to park.
+
+        Returns:
+            bool: whether or not the reading has been parked.
+        """
+
+        now = monotonic()
+
+        with self._lock:
+            # Entries are in parking order, so expired ones come first
+            while self._parked_at:
+                expired_key, parked_at = next(iter(self._parked_at.items()))
+                if parked_at + self._ttl > now:
+                    break
+                log.debug("Metadata of sensor %s never arrived", expired_key)
+                del self._parked_at[expired_key]
+                self.dropped += len(self._readings.pop(expired_key))
+
+            readings = self._readings.get(reading.sensor_key)
+            if readings is None:
+                if len(self._readings) >= self._max_sensors:
+                    return False
+
+                readings = deque(maxlen=self._max_per_sensor)
+                self._readings[reading.sensor_key] = readings
+                self._parked_at[reading.sensor_key] = now
+
+            readings.append(reading)
+
+        return True
+
+    def release(self, sensor_key: str) -> List[Reading]:
+        """Releases the readings parked for a sensor.
+
+        Args:
+            sensor_key (str): the sensor key.
+
+        Returns:
+            List[Reading]: the parked readings, oldest first.
+        """
+
+        with self._lock:
+            self._parked_at.pop(sensor_key, None)
+            readings = self._readings.pop(sensor_key, None)
+
+        return list(readings) if readings else []
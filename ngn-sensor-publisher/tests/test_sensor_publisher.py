@@ -1,7 +1,34 @@
+import json
 from datetime import datetime
+from queue import Queue
+from types import SimpleNamespace
 
 import pytest
+from anomalies import OUT_OF_RANGE, SPIKE, STUCK, AnomalyDetector
+from cluster import ShardCoordinator
+from compacted_topics import KeyedThrottle
+from connection_gaps import GapTracker
+from dead_letters import DeadLetterBuffer
+from derived_sensors import DerivedSensorEngine, parse_derived_sensor
+from kafka_profiles import KAFKA_PRODUCER_PROFILES, producer_settings
+from latest_value_store import LatestValueStore
+from metrics import MetricsRegistry
 from ngn.sensor.publisher.sensor_publisher import SensorPublisher
+from rollups import RollupAggregator, RollupWindow, parse_window
+from sensor_types import Reading, SensorMetadata
+from serialisers import (
+    JSON_FORMAT,
+    MSGPACK_COMPACT_FORMAT,
+    MSGPACK_FORMAT,
+    READING_FIELDS,
+    SCHEMA_ID_HEADER,
+    FileSchemaRegistry,
+    create_serialisers,
+    decode_msgpack,
+)
+from sources import Source
+from subscriptions import SensorSubscriptions, subscription_payloads
+from unknown_sensors import NegativeCache, ParkedReadings
 
 SENSOR_KEY = "sensor_key"
 LAST_SHARED_VALUE = "last_shared_value"
@@ -13,6 +40,7 @@ SERVICE_TYPE = "service_type"
 OBJECT_NAME = "object_name"
 MEASUREMENT_TYPE = "measurement_type"
 LAST_SHARED_DATETIME = "last_shared_datetime"
+MAX_VALUE = "max_value"
 
 
 @pytest.mark.parametrize(
@@ -74,8 +102,8 @@ def test_process_websocket_msg(msg_dict: dict, exp_value: dict):
 
         sensor_data = sensor_publisher._sensor_data_queue.get(block=False)
 
-        assert sensor_data.get(SENSOR_KEY) == exp_value.get(SENSOR_KEY)
-        assert sensor_data.get(LAST_SHARED_VALUE) == exp_value.get(LAST_SHARED_VALUE)
+        assert sensor_data.sensor_key == exp_value.get(SENSOR_KEY)
+        assert sensor_data.value == exp_value.get(LAST_SHARED_VALUE)
 
 
 @pytest.mark.parametrize(
@@ -173,7 +201,7 @@ def test_process_queue_message(
 ):
     sensor_publisher = SensorPublisher()
     topic_name, cached_sensor_info = sensor_publisher._process_queue_message(
-        sensor_data, cached_sensor_info
+        Reading.from_dict(sensor_data), SensorMetadata.from_dict(cached_sensor_info)
     )
 
     print(cached_sensor_info)
@@ -183,3 +211,747 @@ def test_process_queue_message(
         assert topic_name == exp_topic_name
         assert cached_sensor_info.get(LAST_SHARED_VALUE)
         assert cached_sensor_info.get(LAST_SHARED_DATETIME)
+
+
+def test_negative_cache_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("unknown_sensors.monotonic", lambda: now[0])
+
+    negative_cache = NegativeCache(ttl=30, max_size=2)
+    negative_cache.add("CO@1_0_1")
+    assert "CO@1_0_1" in negative_cache
+
+    now[0] += 31
+    assert "CO@1_0_1" not in negative_cache
+
+    negative_cache.add("CO@1_0_2")
+    negative_cache.discard("CO@1_0_2")
+    assert "CO@1_0_2" not in negative_cache
+
+    for sensor_key in ("CO@1_0_3", "CO@1_0_4", "CO@1_0_5"):
+        negative_cache.add(sensor_key)
+    assert len(negative_cache) == 2
+    assert "CO@1_0_3" not in negative_cache
+
+
+def test_parked_readings():
+    parked_readings = ParkedReadings(max_per_sensor=2, max_sensors=1)
+
+    for value in (1.0, 2.0, 3.0):
+        assert parked_readings.park(Reading("CO@1_0_1", value))
+    assert not parked_readings.park(Reading("CO@1_0_2", 4.0))
+
+    assert [reading.value for reading in parked_readings.release("CO@1_0_1")] == [
+        2.0,
+        3.0,
+    ]
+    assert parked_readings.release("CO@1_0_1") == []
+
+
+def test_parked_readings_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("unknown_sensors.monotonic", lambda: now[0])
+    parked_readings = ParkedReadings(max_per_sensor=2, max_sensors=1, ttl=60)
+
+    assert parked_readings.park(Reading("CO@1_0_1", 1.0))
+    assert parked_readings.park(Reading("CO@1_0_1", 2.0))
+    now[0] += 30
+    assert not parked_readings.park(Reading("CO@1_0_2", 3.0))
+
+    # The sensor whose metadata never arrived frees its slot
+    now[0] += 30
+    assert parked_readings.park(Reading("CO@1_0_2", 4.0))
+    assert parked_readings.dropped == 2
+    assert parked_readings.release("CO@1_0_1") == []
+    assert [reading.value for reading in parked_readings.release("CO@1_0_2")] == [4.0]
+
+
+class HashStore:
+    def __init__(self, available: bool = True):
+        self.available = available
+        self.hashes = {}
+
+    def store_hashes(self, mappings: dict) -> bool:
+        if not self.available:
+            return False
+
+        for key, mapping in mappings.items():
+            self.hashes.setdefault(key, {}).update(mapping)
+        return True
+
+
+def test_latest_value_store_coalescing():
+    hash_store = HashStore(available=False)
+    latest_value_store = LatestValueStore(hash_store, flush_interval=0.25)
+
+    latest_value_store.update("House 3", Reading("CO@3_0_1", 1.0, 10.0))
+    latest_value_store.update("House 3", Reading("CO@3_0_1", 2.0, 11.0))
+    latest_value_store.update("House 1", Reading("CO@1_0_1", 3.0, 12.0))
+
+    # Readings are kept until they are written
+    assert latest_value_store.flush() == 0
+    hash_store.available = True
+
+    assert latest_value_store.flush() == 2
+    assert hash_store.hashes == {
+        "sensor_state:House 3": {"CO@3_0_1": "[2.0, 11.0]"},
+        "sensor_state:House 1": {"CO@1_0_1": "[3.0, 12.0]"},
+    }
+    assert latest_value_store.flush() == 0
+
+
+@pytest.mark.parametrize(
+    "window_name, exp_window_size",
+    [("30s", 30), ("1m", 60), ("15m", 900), ("1h", 3600), ("1d", None), ("m", None)],
+)
+def test_parse_window(window_name: str, exp_window_size: int):
+    if exp_window_size:
+        assert parse_window(window_name) == exp_window_size
+    else:
+        with pytest.raises(ValueError):
+            parse_window(window_name)
+
+
+def test_rollup_window():
+    rollup_window = RollupWindow("1m")
+
+    for value, timestamp in ((2.0, 60.0), (4.0, 70.0), (3.0, 119.0)):
+        assert not rollup_window.add("house_1", Reading("CO@1_0_1", value, timestamp))
+    assert not rollup_window.close_expired(119.5)
+
+    # A reading of the next window closes the current one
+    closed_records = rollup_window.add("house_1", Reading("CO@1_0_1", 5.0, 121.0))
+    assert closed_records == [
+        (
+            "house_1_rollup_1m",
+            {
+                SENSOR_KEY: "CO@1_0_1",
+                "window": "1m",
+                "window_start": 60.0,
+                "window_end": 120.0,
+                "count": 3,
+                "min": 2.0,
+                "max": 4.0,
+                "mean": 3.0,
+                "last": 3.0,
+            },
+        )
+    ]
+
+    # A late reading doesn't skew the open window
+    assert not rollup_window.add("house_1", Reading("CO@1_0_1", 100.0, 119.5))
+    assert rollup_window.late_readings == 1
+
+    closed_records = rollup_window.close_expired(300.0)
+    assert [record.get("count") for _, record in closed_records] == [1]
+    assert [record.get("max") for _, record in closed_records] == [5.0]
+    assert not rollup_window.close_expired(301.0)
+
+
+def test_rollup_aggregator_window_names():
+    rollup_aggregator = RollupAggregator("1m, 15m".split(","))
+
+    assert rollup_aggregator.window_names == ["1m", "15m"]
+    closed_records = rollup_aggregator.add("house_1", Reading("CO@1_0_1", 1.0, 60.0))
+    closed_records += rollup_aggregator.close_expired(1800.0)
+    assert [topic_name for topic_name, _ in closed_records] == [
+        "house_1_rollup_1m",
+        "house_1_rollup_15m",
+    ]
+
+
+def test_file_schema_registry(tmp_path):
+    registry_path = str(tmp_path / "schemas.json")
+    registry = FileSchemaRegistry(registry_path)
+
+    schema_id = registry.register("sensor_reading", READING_FIELDS)
+    assert registry.register("sensor_reading", READING_FIELDS) == schema_id
+    assert registry.register("sensor_reading_compact", READING_FIELDS[:1]) != schema_id
+
+    # Schemas survive a restart
+    assert FileSchemaRegistry(registry_path).get(schema_id) == {
+        "name": "sensor_reading",
+        "fields": READING_FIELDS,
+    }
+
+
+@pytest.mark.parametrize(
+    "payload_format, exp_schema_id",
+    [(MSGPACK_FORMAT, b"3"), (MSGPACK_COMPACT_FORMAT, b"2")],
+)
+def test_msgpack_serialiser(tmp_path, payload_format: str, exp_schema_id: bytes):
+    pytest.importorskip("msgpack")
+
+    registry_path = str(tmp_path / "schemas.json")
+    serialisers = create_serialisers(registry_path, [payload_format])
+    sensor_data = Reading("CO@9_4_81", 34.62, 1700000000.0).to_dict(
+        SensorMetadata(
+            "CO@9_4_81",
+            "House 9_Floor2_Bed1_Other_Humidity",
+            "House 9",
+            min_value=0,
+            max_value=100,
+        )
+    )
+
+    json_payload, json_headers = serialisers[JSON_FORMAT].serialise(sensor_data)
+    payload, headers = serialisers[payload_format].serialise(sensor_data)
+
+    assert json_headers is None
+    assert len(payload) < len(json_payload)
+    # Schema ids don't depend on the formats in use, superseded schemas keep theirs
+    assert dict(headers)[SCHEMA_ID_HEADER] == exp_schema_id
+
+    record = decode_msgpack(FileSchemaRegistry(registry_path), payload, headers)
+    assert record.get(SENSOR_KEY) == "CO@9_4_81"
+    assert record.get(LAST_SHARED_VALUE) == 34.62
+    assert record.items() <= sensor_data.items()
+    if payload_format == MSGPACK_FORMAT:
+        assert record[MAX_VALUE] == 100
+
+
+def test_unknown_payload_format(tmp_path):
+    with pytest.raises(ValueError):
+        create_serialisers(str(tmp_path / "schemas.json"), ["avro"])
+
+
+def test_payload_formats_of_json_topics(monkeypatch, tmp_path):
+    monkeypatch.setenv("SCHEMA_REGISTRY_PATH", str(tmp_path / "schemas.json"))
+    sensor_publisher = SensorPublisher()
+    sensor_publisher._alerts_topic = "alerts"
+
+    monkeypatch.setenv("KAFKA_TOPIC_PAYLOAD_FORMATS", "house_1:json,alerts:json")
+    sensor_publisher._initialise_payload_formats()
+
+    # Alerts are not readings, a msgpack schema can't encode them
+    monkeypatch.setenv("KAFKA_TOPIC_PAYLOAD_FORMATS", "alerts:msgpack")
+    with pytest.raises(SystemExit):
+        sensor_publisher._initialise_payload_formats()
+
+
+@pytest.mark.parametrize("profile_name", list(KAFKA_PRODUCER_PROFILES))
+def test_producer_settings(profile_name: str):
+    settings = producer_settings(profile_name, "linger.ms=20, compression.type=zstd")
+    assert settings["linger.ms"] == "20"
+    assert settings["compression.type"] == "zstd"
+    assert settings["acks"] == KAFKA_PRODUCER_PROFILES[profile_name]["acks"]
+
+    assert producer_settings("", "acks=all") == {"acks": "all"}
+
+
+@pytest.mark.parametrize(
+    "profile_name, overrides", [("fastest", ""), ("durable", "linger.ms")]
+)
+def test_bad_producer_settings(profile_name: str, overrides: str):
+    with pytest.raises(ValueError):
+        producer_settings(profile_name, overrides)
+
+
+def test_full_publish_queue_drops_oldest_reading():
+    sensor_publisher = SensorPublisher()
+    sensor_publisher._sensor_data_queue = Queue(maxsize=2)
+
+    for value in (1.0, 2.0, 3.0):
+        sensor_publisher._enqueue(Reading("CO@9_4_81", value))
+
+    assert [
+        sensor_publisher._sensor_data_queue.get_nowait().value for _ in range(2)
+    ] == [2.0, 3.0]
+    assert sensor_publisher._metrics.snapshot() == {"readings_dropped": 1}
+
+
+def test_gap_tracker():
+    gap_tracker = GapTracker()
+    assert gap_tracker.connected(now=100.0) is None
+
+    for _ in range(50):
+        gap_tracker.message()
+    gap_tracker.disconnected(now=110.0)
+    # Only the first disconnection of a gap counts
+    gap_tracker.disconnected(now=111.0)
+
+    assert gap_tracker.connected(now=114.0) == {
+        "disconnected_at": 110.0,
+        "reconnected_at": 114.0,
+        "gap_seconds": 4.0,
+        "estimated_missed_messages": 20,
+    }
+
+
+def test_process_queue_message_of_other_source():
+    sensor_metadata = SensorMetadata(
+        sensor_key="site_b:CO@9_4_81",
+        sensor_name="House 1_Floor1_Kitchen_Heating_Temp",
+        building_name="House 1",
+    )
+    topic_name, sensor_data = SensorPublisher()._process_queue_message(
+        Reading("site_b:CO@9_4_81", 21.5), sensor_metadata
+    )
+
+    assert topic_name == "site_b_house_1"
+    assert sensor_data[SENSOR_KEY] == "site_b:CO@9_4_81"
+
+
+def test_expected_topic_names():
+    sensor_publisher = SensorPublisher()
+    sensor_publisher._sources = [
+        Source(source_name, "wss://gira", "https://gira", "user", "password")
+        for source_name in ("default", "site_b")
+    ]
+    sensor_publisher._rollup_aggregator = RollupAggregator(["1m"])
+    sensor_publisher._dead_letter_topic = "dead_letters"
+
+    topic_names = sensor_publisher._expected_topic_names()
+
+    assert len(topic_names) == 2 * 2 * 10 + 1
+    assert topic_names == sorted(topic_names)
+    assert {
+        "house_1",
+        "house_10_rollup_1m",
+        "site_b_house_9",
+        "site_b_house_9_rollup_1m",
+        "dead_letters",
+    } <= set(topic_names)
+
+
+class FakeProducer:
+    topics = {}
+
+    def __init__(self, conf: dict):
+        self.listed_topics = []
+
+    def list_topics(self, topic: str = None, timeout: float = -1):
+        self.listed_topics.append(topic)
+        return SimpleNamespace(
+            topics={
+                topic_name: topic_metadata
+                for topic_name, topic_metadata in self.topics.items()
+                if topic in (None, topic_name)
+            }
+        )
+
+
+def test_initialise_producer(monkeypatch):
+    monkeypatch.setattr("ngn.sensor.publisher.sensor_publisher.Producer", FakeProducer)
+    monkeypatch.setattr(
+        FakeProducer,
+        "topics",
+        {
+            "house_1": SimpleNamespace(error=None),
+            "house_2": SimpleNamespace(error="UNKNOWN_TOPIC_OR_PART"),
+        },
+    )
+    sensor_publisher = SensorPublisher()
+    sensor_publisher._sources = [
+        Source("default", "wss://gira", "https://gira", "user", "password")
+    ]
+
+    # Only the existing topics are asked for by name, which could create them
+    sensor_publisher._initialise_producer()
+    assert sensor_publisher._producer.listed_topics == [None, "house_1"]
+
+    with pytest.raises(SystemExit):
+        sensor_publisher._initialise_producer(verify_topics=True)
+
+
+def test_subscription_payloads():
+    payloads = subscription_payloads(
+        ["CO@9_4_83", "CO@9_4_81", "CO@9_4_82"], chunk_size=2
+    )
+
+    assert [payload["type"] for payload in payloads] == ["subscribe", "subscribe"]
+    assert [payload["param"]["keys"] for payload in payloads] == [
+        ["CO@9_4_81", "CO@9_4_82"],
+        ["CO@9_4_83"],
+    ]
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, payload: str):
+        self.sent.append(json.loads(payload))
+
+
+def test_sensor_subscriptions():
+    subscriptions = SensorSubscriptions(chunk_size=10)
+    connection = FakeWebSocket()
+
+    # No known sensors yet, subscribes to all of them
+    subscriptions.connected(connection, [])
+    assert connection.sent.pop()["param"]["keys"] == ["CO@*"]
+
+    # The first known sensors replace the wildcard
+    subscriptions.add(["CO@9_4_81"])
+    assert [
+        (payload["type"], payload["param"]["keys"]) for payload in connection.sent
+    ] == [
+        ("subscribe", ["CO@9_4_81"]),
+        ("unsubscribe", ["CO@*"]),
+    ]
+
+    connection.sent.clear()
+    subscriptions.add(["CO@9_4_81", "CO@9_4_82"])
+    subscriptions.remove(["CO@9_4_81", "CO@9_4_99"])
+    assert [
+        (payload["type"], payload["param"]["keys"]) for payload in connection.sent
+    ] == [
+        ("subscribe", ["CO@9_4_82"]),
+        ("unsubscribe", ["CO@9_4_81"]),
+    ]
+
+    # Changes while disconnected are applied on the next connection
+    subscriptions.disconnected()
+    subscriptions.add(["CO@9_4_83"])
+    connection = FakeWebSocket()
+    subscriptions.connected(connection, subscriptions.sensor_keys)
+    assert connection.sent[0]["param"]["keys"] == ["CO@9_4_82", "CO@9_4_83"]
+
+
+def test_dead_letter_buffer():
+    metrics = MetricsRegistry("test")
+    dead_letters = DeadLetterBuffer(
+        metrics, batch_size=2, flush_interval=60, rate_limit=3
+    )
+
+    dead_letters.add("missing_value", {"n": 1})
+    assert not dead_letters.is_due()
+    for n in range(2, 6):
+        dead_letters.add("missing_value", {"n": n})
+    # The other sources have their own rate cap
+    dead_letters.add("missing_metadata", {"n": 6}, source_name="site_b")
+
+    assert dead_letters.is_due()
+    batches = dead_letters.drain()
+    assert [[record["payload"]["n"] for record in batch] for batch in batches] == [
+        [1, 2],
+        [3, 6],
+    ]
+    assert batches[1][1]["reason"] == "missing_metadata"
+    assert batches[1][1]["source"] == "site_b"
+    assert not dead_letters.is_due()
+    assert metrics.snapshot() == {
+        "dead_letters_missing_value": 5,
+        "dead_letters_missing_metadata": 1,
+        "dead_letters_rate_limited": 2,
+    }
+
+
+def test_process_websocket_msg_rejections():
+    sensor_publisher = SensorPublisher()
+    sensor_publisher._dead_letters = DeadLetterBuffer(
+        sensor_publisher._metrics, rate_limit=0
+    )
+    non_numeric_msg = {
+        "data": {"value": "on"},
+        "type": "push",
+        "subscription": {"key": "CO@9_4_81"},
+    }
+
+    sensor_publisher._process_websocket_msg(non_numeric_msg, "site_b:")
+    # Subscription responses and other non-push frames are not readings
+    sensor_publisher._process_websocket_msg({"type": "response", "code": 0})
+    sensor_publisher._process_websocket_msg(
+        {**non_numeric_msg, "type": "event"}, "site_b:"
+    )
+
+    assert sensor_publisher._sensor_data_queue.empty()
+    (record,) = sensor_publisher._dead_letters.drain()[0]
+    assert record["reason"] == "non_numeric_value"
+    assert record["source"] == "site_b"
+    assert record["payload"] == non_numeric_msg
+
+
+class FakeLeaseConnector:
+    def __init__(self):
+        self.leases = {}
+        self.members = {}
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return self.leases.setdefault(key, owner) == owner
+
+    def renew_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return self.leases.get(key) == owner
+
+    def release_lease(self, key: str, owner: str) -> bool:
+        if self.leases.get(key) != owner:
+            return False
+        del self.leases[key]
+        return True
+
+    def claim_leases(self, keys: list, owner: str, ttl: float) -> list:
+        return [
+            self.renew_lease(key, owner, ttl) or self.acquire_lease(key, owner, ttl)
+            for key in keys
+        ]
+
+    def release_leases(self, keys: list, owner: str):
+        for key in keys:
+            self.release_lease(key, owner)
+
+    def heartbeat(self, key: str, member: str, ttl: float) -> list:
+        members = self.members.setdefault(key, set())
+        members.add(member)
+        return sorted(members)
+
+
+def test_shard_coordinator_rebalance():
+    lease_connector = FakeLeaseConnector()
+    replica_a, replica_b = (
+        ShardCoordinator(lease_connector, replica_id, "test", shard_count=16)
+        for replica_id in ("replica_a", "replica_b")
+    )
+
+    assert replica_a.refresh()
+    assert replica_a.owned_shards == set(range(16))
+
+    # The shards assigned to the new replica are held until released
+    assert not replica_b.refresh()
+    assert not replica_b.owned_shards
+    assert replica_a.refresh()
+    assert replica_b.refresh()
+
+    assert replica_a.owned_shards | replica_b.owned_shards == set(range(16))
+    assert not replica_a.owned_shards & replica_b.owned_shards
+    assert replica_b.owned_shards == replica_b.assigned_shards(
+        ["replica_a", "replica_b"]
+    )
+    assert replica_a.owns("CO@9_4_81") != replica_b.owns("CO@9_4_81")
+
+    # The shards of a dead replica are taken over once its leases expire
+    lease_connector.leases = {
+        key: owner
+        for key, owner in lease_connector.leases.items()
+        if owner != "replica_b"
+    }
+    lease_connector.members["cluster:test:replicas"].discard("replica_b")
+    assert replica_a.refresh()
+    assert replica_a.owned_shards == set(range(16))
+
+
+def test_sensor_subscriptions_sync():
+    subscriptions = SensorSubscriptions(chunk_size=10, wildcard_fallback=False)
+    connection = FakeWebSocket()
+
+    # No known sensors of the owned shards, nothing to subscribe to
+    subscriptions.connected(connection, [])
+    assert not connection.sent
+
+    subscriptions.add(["CO@9_4_81", "CO@9_4_82"])
+    connection.sent.clear()
+    subscriptions.sync(["CO@9_4_82", "CO@9_4_83"])
+    assert [
+        (payload["type"], payload["param"]["keys"]) for payload in connection.sent
+    ] == [
+        ("subscribe", ["CO@9_4_83"]),
+        ("unsubscribe", ["CO@9_4_81"]),
+    ]
+    assert subscriptions.sensor_keys == {"CO@9_4_82", "CO@9_4_83"}
+
+
+def test_derived_sensors():
+    room_temperature, house_current = (
+        parse_derived_sensor(definition)
+        for definition in (
+            {
+                "sensor_key": "DERIVED@house_1_kitchen_temp",
+                "function": "mean",
+                "select": {
+                    "building_name": "House 1",
+                    "room_name": "Kitchen",
+                    "measurement_type": "Temp",
+                },
+            },
+            {
+                "sensor_key": "DERIVED@house_1_current",
+                "function": "sum",
+                "sensor_keys": ["CO@1_0_1", "CO@1_0_2"],
+                "metadata": {"building_name": "House 1"},
+            },
+        )
+    )
+    assert room_temperature.sensor_metadata.room_name == "Kitchen"
+    assert room_temperature.sensor_metadata.service_type == "Derived"
+
+    engine = DerivedSensorEngine([room_temperature, house_current])
+    kitchen = SensorMetadata(
+        sensor_key="CO@9_4_81",
+        sensor_name="House 1_Floor1_Kitchen_Heating_Temp",
+        building_name="House 1",
+        room_name="Kitchen",
+        measurement_type="Temp",
+    )
+    other_kitchen = kitchen.replace(sensor_key="site_b:CO@9_4_81")
+
+    derived_readings = engine.add(Reading("CO@9_4_81", 20.0, 1.0), kitchen)
+    assert [
+        (reading.sensor_key, reading.value, reading.timestamp)
+        for reading, _ in derived_readings
+    ] == [("DERIVED@house_1_kitchen_temp", 20.0, 1.0)]
+
+    # Only the sensors of the same source are selected
+    assert not engine.add(Reading("site_b:CO@9_4_81", 30.0), other_kitchen)
+
+    second_kitchen = kitchen.replace(sensor_key="CO@9_4_82")
+    [(reading, _)] = engine.add(Reading("CO@9_4_82", 21.0), second_kitchen)
+    assert reading.value == 20.5
+    # An unchanged value is not published again
+    assert not engine.add(Reading("CO@9_4_82", 21.0), second_kitchen)
+
+    current = SensorMetadata("CO@1_0_1", "House 1_Electric_Current", "House 1")
+    engine.add(Reading("CO@1_0_1", 1.5), current)
+    [(reading, _)] = engine.add(
+        Reading("CO@1_0_2", 2.0), current.replace(sensor_key="CO@1_0_2")
+    )
+    assert reading.value == 3.5
+
+    # Removed sensors no longer count
+    engine.remove(["CO@9_4_82"])
+    [(reading, _)] = engine.add(Reading("CO@9_4_81", 22.0), kitchen)
+    assert reading.value == 22.0
+
+    with pytest.raises(ValueError):
+        parse_derived_sensor({"sensor_key": "DERIVED@bad", "function": "mean"})
+    # Without a single building, the derived sensor would have no topic
+    for selection in (
+        {"sensor_keys": ["CO@1_0_1"]},
+        {"select": {"building_name": ["House 1", "House 2"]}},
+    ):
+        with pytest.raises(ValueError):
+            parse_derived_sensor({"sensor_key": "DERIVED@bad", **selection})
+    # Badly typed definitions are rejected too, instead of crashing the parsing
+    for selection in (
+        {"select": {"building_name": "House 1", "floor_name": 1}},
+        {"select": [{"building_name": "House 1"}]},
+        {"sensor_keys": "CO@1_0_1", "metadata": {"building_name": "House 1"}},
+        {"sensor_keys": ["CO@1_0_1"], "metadata": ["House 1"]},
+    ):
+        with pytest.raises(ValueError):
+            parse_derived_sensor({"sensor_key": "DERIVED@bad", **selection})
+    with pytest.raises(ValueError):
+        parse_derived_sensor(["DERIVED@bad"])
+
+
+class RecordingProducer:
+    def __init__(self):
+        self.messages = []
+
+    def produce(self, topic: str, key, value: bytes, headers, callback):
+        self.messages.append((topic, json.loads(value)))
+
+    def poll(self, timeout: float):
+        return 0
+
+
+def test_publish_derived_readings(tmp_path):
+    sensor_publisher = SensorPublisher()
+    sensor_publisher._producer = RecordingProducer()
+    sensor_publisher._serialisers = create_serialisers(
+        str(tmp_path / "schemas.json"), []
+    )
+    sensor_publisher._latest_value_store = LatestValueStore(
+        HashStore(), flush_interval=1
+    )
+    sensor_publisher._derived_sensors = DerivedSensorEngine(
+        [
+            parse_derived_sensor(
+                {
+                    "sensor_key": "DERIVED@house_1_current",
+                    "function": "sum",
+                    "sensor_keys": ["CO@1_0_1", "CO@1_0_2"],
+                    "metadata": {"building_name": "House 1"},
+                }
+            )
+        ]
+    )
+    current = SensorMetadata("CO@1_0_1", "House 1_Electric_Current", "House 1")
+
+    for reading, sensor_metadata in (
+        (Reading("CO@1_0_1", 1.5, 1.0), current),
+        (Reading("CO@1_0_2", 2.0, 2.0), current.replace(sensor_key="CO@1_0_2")),
+    ):
+        assert sensor_publisher._publish_reading(reading, sensor_metadata)
+        sensor_publisher._publish_derived_readings(reading, sensor_metadata)
+
+    derived_messages = [
+        (topic_name, message[SENSOR_KEY], message[LAST_SHARED_VALUE])
+        for topic_name, message in sensor_publisher._producer.messages
+        if message[SENSOR_KEY].startswith("DERIVED@")
+    ]
+    assert derived_messages == [
+        ("house_1", "DERIVED@house_1_current", 1.5),
+        ("house_1", "DERIVED@house_1_current", 3.5),
+    ]
+    assert sensor_publisher._metrics.snapshot()["derived_readings"] == 2
+
+
+def test_anomaly_detector():
+    detector = AnomalyDetector(
+        alpha=0.1, warmup_readings=5, z_score=4, stuck_seconds=60
+    )
+    sensor_metadata = SensorMetadata(
+        "CO@9_4_81", "House 1_Floor1_Kitchen_Heating_Temp", "House 1", max_value=40
+    )
+
+    def check(value: float, timestamp: float) -> list:
+        return [
+            event["anomaly"]
+            for event in detector.check(
+                Reading("CO@9_4_81", value, timestamp), sensor_metadata
+            )
+        ]
+
+    for second in range(10):
+        assert check(20 + second % 2 * 0.5, second) == []
+
+    assert check(35, 10) == [SPIKE]
+    # Out of range values are reported once, until back in range
+    assert check(45, 11) == [OUT_OF_RANGE, SPIKE]
+    assert check(45, 12) == []
+    assert check(20, 13) == []
+    assert check(41, 14) == [OUT_OF_RANGE]
+    assert check(20, 15) == []
+
+    # Stuck values are reported once, until the value changes
+    assert check(20, 74) == []
+    assert check(20, 75) == [STUCK]
+    assert check(20, 80) == []
+    assert check(20.5, 81) == []
+    assert len(detector) == 1
+
+    # A sensor that stopped sending readings is found stuck by the sweep
+    assert detector.sweep_stuck(140) == []
+    [event] = detector.sweep_stuck(141)
+    assert event["anomaly"] == STUCK
+    assert event[LAST_SHARED_VALUE] == 20.5
+    assert event["unchanged_seconds"] == 60
+    assert detector.sweep_stuck(200) == []
+    assert check(20.5, 201) == []
+
+    # A removed sensor is never swept, and its slot is reused
+    detector.remove(["CO@9_4_81"])
+    assert len(detector) == 0
+    assert detector.sweep_stuck(1000) == []
+    detector.check(Reading("CO@9_4_82", 20, 1000), sensor_metadata)
+    assert len(detector) == 1
+    assert len(detector._sensors_metadata) == 1
+
+
+def test_keyed_throttle():
+    throttle = KeyedThrottle(min_interval=1.0)
+
+    assert throttle.offer("CO@9_4_81", {"value": 1}, now=0.0)
+    assert throttle.offer("CO@9_4_82", {"value": 1}, now=0.1)
+    # Held back, only the latest record of a key is kept
+    assert not throttle.offer("CO@9_4_81", {"value": 2}, now=0.5)
+    assert not throttle.offer("CO@9_4_81", {"value": 3}, now=0.6)
+    assert len(throttle) == 1
+
+    assert throttle.release(now=0.7) == []
+    assert throttle.release(now=1.0) == [("CO@9_4_81", {"value": 3})]
+    assert not throttle.offer("CO@9_4_81", {"value": 4}, now=1.5)
+
+    throttle.forget(["CO@9_4_81"])
+    assert len(throttle) == 0
+    assert throttle.offer("CO@9_4_81", {"value": 5}, now=1.6)